@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Device Context Prompt Size Benchmark
+Estimated prompt tokens of a device-control request for homes of 10, 100 and
+1000 devices: every device as indented JSON with its full spec (previous
+behaviour) versus the relevance-ranked, token-budgeted compact context.
+Uses a temporary SQLite database; no LLM calls are made.
+"""
+import sys
+import os
+import json
+import statistics
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Disable OpenTelemetry for tests
+os.environ['OTEL_TRACES_EXPORTER'] = 'none'
+os.environ['OTEL_METRICS_EXPORTER'] = 'none'
+os.environ['OTEL_LOGS_EXPORTER'] = 'none'
+os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark-key')
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark-key')
+
+from src.core.context_manager import SystemContext
+from src.core.device_catalog import DeviceCatalog, DeviceSpecIndex
+from src.core.device_controller import DeviceController
+from src.models.database import dispose_shared_database_managers
+from src.utils.config import Config, DatabaseConfig
+from src.utils.token_budget import estimate_tokens
+
+
+HOME_SIZES = (10, 100, 1000)
+ROOMS = ["客厅", "卧室", "厨房", "书房", "浴室", "餐厅", "儿童房", "阳台"]
+DEVICE_TYPES = [
+    ("dimmable_light", "调光灯", ["turn_on", "turn_off", "set_brightness", "set_color"], {"status": "off", "brightness": 60}),
+    ("curtain", "窗帘", ["open_curtain", "close_curtain", "set_position"], {"status": "off", "targetPosition": 0}),
+    ("air_conditioner", "空调", ["turn_on", "turn_off", "set_temperature"], {"status": "off", "temperature": 26}),
+    ("speaker", "音响", ["turn_on", "turn_off", "set_volume"], {"status": "off", "volume": 30}),
+    ("tv", "电视", ["turn_on", "turn_off", "set_volume"], {"status": "off"}),
+]
+SPECS = {
+    "devices": {
+        "dimmable_light": {
+            "device_type_id": "57D56F4D-3302-41F7-AB34-5365AA180E81",
+            "category": "light",
+            "parameters": {
+                "brightness": {"type": "int", "min": 0, "max": 100, "description": "亮度百分比"},
+                "hue": {"type": "int", "min": 0, "max": 360, "description": "色相"},
+                "saturation": {"type": "int", "min": 0, "max": 100, "description": "饱和度"},
+            },
+            "supported_commands": ["turn_on", "turn_off", "set_brightness", "set_hue", "set_saturation", "set_color"],
+        },
+        "curtain": {
+            "device_type_id": "2FB9EE1F-1C21-4D0B-9383-9B65F64DBF0E",
+            "category": "curtain",
+            "parameters": {"targetPosition": {"type": "int", "min": 0, "max": 100, "description": "0=关闭, 100=完全打开"}},
+            "supported_commands": ["open_curtain", "close_curtain", "set_position"],
+        },
+    }
+}
+REQUESTS = [
+    ("打开客厅的调光灯", {"involves_hardware": True, "device": "lights", "action": "turn_on"}),
+    ("把卧室窗帘关上", {"involves_hardware": True, "device": "curtains", "action": "close_curtain"}),
+    ("有点热", {"involves_hardware": True, "device": "air_conditioner", "action": "turn_on"}),
+]
+
+
+def synthetic_devices(count):
+    devices = []
+    for i in range(count):
+        device_type, label, actions, state = DEVICE_TYPES[i % len(DEVICE_TYPES)]
+        room = ROOMS[(i // len(DEVICE_TYPES)) % len(ROOMS)]
+        devices.append({
+            "id": f"{device_type}_{i:04d}",
+            "name": f"{room}{label}{i // (len(DEVICE_TYPES) * len(ROOMS)) + 1}",
+            "device_type": device_type,
+            "room": room,
+            "supported_actions": actions,
+            "current_state": dict(state),
+        })
+    return devices
+
+
+def measure_home(controller, size, workdir):
+    controller.config.database = DatabaseConfig(url=f"sqlite:///{os.path.join(workdir, f'home_{size}.db')}")
+    controller.db_service = type(controller.db_service)(controller.config)
+    controller.db_service.bulk_create_devices(synthetic_devices(size))
+    catalog = DeviceCatalog(controller.db_service, DeviceSpecIndex(SPECS))
+    snapshot = catalog.snapshot()
+    full_json = json.dumps(snapshot.devices, ensure_ascii=False, indent=2)
+
+    system = controller.config.system
+    results = []
+    for user_input, intent in REQUESTS:
+        context = SystemContext(user_input=user_input, last_device_action={"device": "tv_0004"})
+        full_prompt = controller._build_device_prompt(intent, context, full_json)
+
+        start = time.perf_counter()
+        selection = snapshot.select_context(
+            user_input, intent, ["tv_0004"],
+            token_budget=system.device_context_token_budget,
+            max_devices=system.device_context_max_devices
+        )
+        select_ms = (time.perf_counter() - start) * 1000
+        compact_prompt = controller._build_device_prompt(intent, context, selection.text)
+        results.append((
+            estimate_tokens(controller.system_prompt + full_prompt),
+            estimate_tokens(controller.system_prompt + compact_prompt),
+            len(selection.device_ids),
+            select_ms
+        ))
+    return results
+
+
+def main():
+    print("=" * 60)
+    print("Device context prompt size benchmark")
+    print("=" * 60)
+
+    config = Config()
+    controller = DeviceController(config)
+    print(f"Token budget: {config.system.device_context_token_budget}, "
+          f"max devices: {config.system.device_context_max_devices}")
+    print("Token counts are estimates (CJK ~1 token/char, other text ~4 chars/token)")
+    print("-" * 60)
+    print(f"{'Devices':>8} {'Full JSON':>12} {'Compact':>10} {'Listed':>8} {'Select ms':>10} {'Saved':>8}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            for size in HOME_SIZES:
+                results = measure_home(controller, size, workdir)
+                full = statistics.mean(r[0] for r in results)
+                compact = statistics.mean(r[1] for r in results)
+                listed = statistics.mean(r[2] for r in results)
+                select_ms = statistics.mean(r[3] for r in results)
+                print(f"{size:>8} {full:>12.0f} {compact:>10.0f} {listed:>8.0f} {select_ms:>10.2f} "
+                      f"{(1 - compact / full) * 100:>7.1f}%")
+        finally:
+            dispose_shared_database_managers()
+
+    print("-" * 60)
+    print("Values are means over the sample requests; prompt tokens include the")
+    print("system prompt (instructions, JSON answer schema) shared by both variants.")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
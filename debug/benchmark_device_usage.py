@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Device Usage Analytics Benchmark
+get_device_usage_stats for a busy home (20 devices, 90 days of history)
+holding 250,000 and then 1,000,000 device interactions: loading every row
+and grouping in Python (previous behaviour) versus SQL GROUP BY versus the
+hourly per-device rollup table, whose size depends on hours x devices rather
+than on the number of interactions. Uses temporary SQLite databases.
+"""
+import sys
+import os
+import argparse
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Disable OpenTelemetry for tests
+os.environ['OTEL_TRACES_EXPORTER'] = 'none'
+os.environ['OTEL_METRICS_EXPORTER'] = 'none'
+os.environ['OTEL_LOGS_EXPORTER'] = 'none'
+os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark-key')
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark-key')
+
+from src.utils.config import Config, DatabaseConfig
+from src.models.database import DeviceInteraction, dispose_shared_database_managers
+from src.services.database_service import DatabaseService
+
+
+USERS = 4
+DEVICES = 20
+HISTORY_DAYS = 90
+ACTIONS = ["turn_on", "turn_off", "set_brightness", "set_temperature"]
+CHUNK = 50000
+HISTORY_SIZES = (250_000, 1_000_000)
+CASES = [
+    ("one device, 7 days", {"device_id": "device_3", "days": 7}),
+    ("one device, 90 days", {"device_id": "device_3", "days": 90}),
+    ("all devices, 90 days", {"days": 90}),
+    ("one user, 30 days", {"user_id": "user_2", "days": 30}),
+]
+
+
+def populate(db_service, rows):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    for offset in range(0, rows, CHUNK):
+        chunk = [
+            {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "user_id": f"user_{rng.randrange(USERS)}",
+                "device_id": f"device_{rng.randrange(DEVICES)}",
+                "action": rng.choice(ACTIONS),
+                "timestamp": now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400)),
+                "success": rng.random() > 0.05,
+            }
+            for _ in range(min(CHUNK, rows - offset))
+        ]
+        with db_service.db_manager.engine.begin() as conn:
+            conn.execute(DeviceInteraction.__table__.insert(), chunk)
+    print(f"Inserted {rows:,} device interactions in {time.perf_counter() - start:.1f}s")
+
+
+def run(config, workdir, rows):
+    config.database = DatabaseConfig(url=f"sqlite:///{os.path.join(workdir, f'usage_{rows}.db')}")
+    db_service = DatabaseService(config)
+    populate(db_service, rows)
+
+    start = time.perf_counter()
+    rollup_rows = db_service.refresh_device_usage_rollup()
+    print(f"Initial rollup: {rollup_rows:,} hourly rows in {time.perf_counter() - start:.1f}s")
+    refresh_ms = timed(db_service.refresh_device_usage_rollup, 3)
+    print(f"Incremental refresh (no new rows): {refresh_ms:.1f} ms")
+    print(f"{'Query':<24} {'Python ms':>10} {'GROUP BY ms':>12} {'Rollup ms':>10}")
+
+    for name, kwargs in CASES:
+        python_ms = timed(lambda: python_grouping(db_service, **kwargs), 1)
+        sql_ms = timed(lambda: db_service.get_device_usage_stats(use_rollup=False, **kwargs), 3)
+        rollup_ms = timed(lambda: db_service.get_device_usage_stats(use_rollup=True, **kwargs), 3)
+        print(f"{name:<24} {python_ms:>10.1f} {sql_ms:>12.1f} {rollup_ms:>10.1f}")
+
+
+def python_grouping(db_service, user_id=None, device_id=None, days=7):
+    """The previous implementation: every row in the window is loaded and grouped in a dict"""
+    session = db_service.get_session()
+    try:
+        query = session.query(DeviceInteraction).filter(
+            DeviceInteraction.timestamp >= datetime.utcnow() - timedelta(days=days)
+        )
+        if user_id:
+            query = query.filter_by(user_id=user_id)
+        if device_id:
+            query = query.filter_by(device_id=device_id)
+        stats = {}
+        for interaction in query.all():
+            stat = stats.setdefault((interaction.device_id, interaction.action), [0, 0, None])
+            stat[0] += 1
+            stat[1] += 1 if interaction.success else 0
+            stat[2] = max(stat[2] or interaction.timestamp, interaction.timestamp)
+        return stats
+    finally:
+        session.close()
+
+
+def timed(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Device usage analytics benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(HISTORY_SIZES),
+                        help="History sizes (device interactions) to generate")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Device usage analytics benchmark")
+    print("=" * 60)
+
+    config = Config()
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            for rows in args.rows:
+                print("-" * 60)
+                run(config, workdir, rows)
+        finally:
+            dispose_shared_database_managers()
+
+    print("-" * 60)
+    print("Rollup times include the incremental refresh done on every read;")
+    print("per-user queries have no rollup and always use GROUP BY.")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
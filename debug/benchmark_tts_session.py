@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+TTS HTTP Session Pool Benchmark
+Measures per-call latency of AgoraTTSService against a local stand-in for the
+OpenAI speech endpoint: a fresh aiohttp.ClientSession per call (previous
+behaviour) versus the pooled keep-alive session. No external API calls are made.
+"""
+import sys
+import os
+import asyncio
+import statistics
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Disable OpenTelemetry for tests
+os.environ['OTEL_TRACES_EXPORTER'] = 'none'
+os.environ['OTEL_METRICS_EXPORTER'] = 'none'
+os.environ['OTEL_LOGS_EXPORTER'] = 'none'
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark-key')
+
+import aiohttp
+from aiohttp import web
+
+from src.utils.config import Config
+from src.services.agora_tts_service import AgoraTTSService, close_shared_tts_sessions
+
+
+ITERATIONS = 200
+FAKE_AUDIO = b"\xff\xfb" + b"\x00" * 16 * 1024  # ~16KB "mp3"
+
+
+async def start_stand_in_server():
+    """Local HTTP server answering /v1/audio/speech with fixed audio bytes"""
+    async def speech(request):
+        await request.json()
+        return web.Response(body=FAKE_AUDIO, content_type="audio/mpeg")
+
+    app = web.Application()
+    app.router.add_post("/v1/audio/speech", speech)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def post_with_fresh_session(service, payload):
+    """Previous behaviour: one ClientSession (and connection) per synthesis"""
+    async with aiohttp.ClientSession() as session:
+        async with session.post(
+            f"{service.base_url}/v1/audio/speech",
+            json=payload,
+            headers=service._openai_headers(),
+            timeout=aiohttp.ClientTimeout(total=60),
+        ) as response:
+            return await response.read()
+
+
+async def measure(call):
+    latencies = []
+    for i in range(ITERATIONS):
+        start = time.perf_counter()
+        audio = await call(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert audio == FAKE_AUDIO
+    return latencies
+
+
+def report(label, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{label:<22} mean {statistics.mean(latencies):6.2f} ms   "
+          f"median {statistics.median(latencies):6.2f} ms   p95 {p95:6.2f} ms")
+
+
+async def main():
+    print("=" * 60)
+    print("TTS HTTP session pool benchmark")
+    print("=" * 60)
+
+    runner, base_url = await start_stand_in_server()
+    config = Config()
+    config.tts.provider = "openai"
+    config.tts.enabled = True
+    config.openai_tts.base_url = base_url
+    service = AgoraTTSService(config)
+    print(f"Stand-in server: {base_url}, iterations: {ITERATIONS}")
+
+    def payload(i):
+        return service._build_openai_payload(f"第{i}句，测试语音。", None, "mp3")
+
+    try:
+        fresh = await measure(lambda i: post_with_fresh_session(service, payload(i)))
+        pooled = await measure(lambda i: service._post_openai_tts(payload(i)))
+    finally:
+        await close_shared_tts_sessions()
+        await runner.cleanup()
+
+    print("-" * 60)
+    report("Fresh session per call", fresh)
+    report("Pooled keep-alive", pooled)
+    print(f"Speedup (mean):         {statistics.mean(fresh) / statistics.mean(pooled):6.2f}x")
+    print("Note: plain HTTP on loopback; real TLS handshakes widen the gap.")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+"""Composite indexes for the hot query patterns
+
+Tables are created by the application (Base.metadata.create_all), which
+creates these indexes on new databases but never adds indexes to existing
+tables. This revision adds them to databases created before they were
+declared; indexes that already exist and tables that do not exist yet are
+skipped.
+
+Revision ID: 0001_hot_path_indexes
+Revises:
+Create Date: 2026-10-16 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_hot_path_indexes'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('idx_message_conversation_time', 'messages', ['conversation_id', 'timestamp']),
+    ('idx_conversation_user_activity', 'conversations', ['user_id', 'is_active', 'last_activity']),
+    ('idx_conversation_active_activity', 'conversations', ['is_active', 'last_activity']),
+    ('idx_device_interaction_time', 'device_interactions', ['timestamp']),
+    ('idx_device_interaction_user_time', 'device_interactions', ['user_id', 'timestamp']),
+    ('idx_device_interaction_device_time', 'device_interactions', ['device_id', 'timestamp']),
+    ('idx_user_memory_user_importance', 'user_memories', ['user_id', 'importance_score']),
+    ('idx_user_memory_user_type_importance', 'user_memories', ['user_id', 'memory_type', 'importance_score']),
+]
+
+
+def _existing_tables() -> set:
+    # Offline (--sql) output cannot inspect the database; assume every table exists
+    if context.is_offline_mode():
+        return {table for _, table, _ in INDEXES}
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = _existing_tables()
+    for name, table, columns in INDEXES:
+        if table in tables:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    tables = _existing_tables()
+    for name, table, _ in reversed(INDEXES):
+        if table in tables:
+            op.drop_index(name, table_name=table, if_exists=True)
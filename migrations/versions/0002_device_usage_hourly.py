@@ -0,0 +1,57 @@
+"""Hourly device usage rollup table
+
+device_usage_hourly holds per hour/device/action interaction counts,
+kept up to date by DatabaseService.refresh_device_usage_rollup. Skipped when
+the application has already created the table.
+
+Revision ID: 0002_device_usage_hourly
+Revises: 0001_hot_path_indexes
+Create Date: 2026-10-16 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_device_usage_hourly'
+down_revision: Union[str, Sequence[str], None] = '0001_hot_path_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('idx_device_usage_device_hour', 'device_usage_hourly', ['device_id', 'hour']),
+]
+
+
+def _table_exists() -> bool:
+    # Offline (--sql) output cannot inspect the database; assume a fresh schema
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table('device_usage_hourly')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _table_exists():
+        return
+    op.create_table(
+        'device_usage_hourly',
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('device_id', sa.String(), nullable=False),
+        sa.Column('action', sa.String(length=100), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('success_count', sa.Integer(), nullable=False),
+        sa.Column('last_used', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('hour', 'device_id', 'action'),
+    )
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('device_usage_hourly')
@@ -2,11 +2,14 @@
 RESTful API for the Smart Home AI Assistant
 """
 import asyncio
+import json
 import time
-from typing import Dict, List, Optional
+import uuid
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 from fastapi import FastAPI, HTTPException, Depends, Query, Body
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -14,10 +17,25 @@ from pydantic import BaseModel, Field
 import uvicorn
 
 from ..utils.config import load_config, Config
+from ..utils.llm_client import close_shared_llm_clients
+from ..utils.llm_cache import get_llm_cache_stats
+from ..utils.prompt_registry import get_prompt_stats
+from ..services.agora_tts_service import close_shared_tts_sessions
+from ..services.audio_upload_service import (
+    close_shared_audio_uploaders,
+    get_audio_upload_stats,
+    get_shared_audio_uploader,
+)
+from ..utils.tts_cache import get_tts_cache_stats
 from ..workflows import create_ai_system
 from ..workflows.langraph_workflow import LangGraphHomeAISystem
 from ..services.database_service import DatabaseService
-from ..models.database import User, Conversation, Device
+from ..services.async_database_service import AsyncDatabaseService
+from ..services.user_profile_cache import get_user_cache_stats
+from ..services.write_behind import close_shared_write_behind_queues, get_write_behind_stats
+from ..models.database import (
+    User, Conversation, Device, dispose_shared_database_managers, dispose_shared_async_database_managers
+)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -25,13 +43,28 @@ app = FastAPI(
     description="智能陪伴家居控制系统 API",
     version="1.0.0"
 )
-# Serve cached audio files under /cached_audio
+# Serve cached audio files under /cached_audio (the directory audio_cache writes to)
 import os
-from pathlib import Path
-_REPO_ROOT = Path(__file__).resolve().parents[3]
-_CACHED_AUDIO_DIR = _REPO_ROOT / "cached_audio"
+from ..utils.audio_cache import (
+    CACHE_DIR as _CACHED_AUDIO_DIR,
+    get_audio_cache_manager,
+    get_audio_cache_stats,
+    touch_cached_audio,
+)
 _CACHED_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
-app.mount("/cached_audio", StaticFiles(directory=str(_CACHED_AUDIO_DIR)), name="cached_audio")
+
+
+class _TrackedStaticFiles(StaticFiles):
+    """StaticFiles that records reads, so cache eviction is least-recently-used"""
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            touch_cached_audio(path)
+        return response
+
+
+app.mount("/cached_audio", _TrackedStaticFiles(directory=str(_CACHED_AUDIO_DIR)), name="cached_audio")
 
 # CORS configuration
 app.add_middleware(
@@ -49,6 +82,7 @@ security = HTTPBearer(auto_error=False)
 config: Config = None
 ai_system: LangGraphHomeAISystem = None  # Using LangGraph with optimized response generation
 db_service: DatabaseService = None
+async_db: AsyncDatabaseService = None  # Non-blocking queries for request handlers
 
 # Pydantic models for API
 class UserCreateRequest(BaseModel):
@@ -60,6 +94,7 @@ class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=2000)
     user_id: str = Field(..., min_length=1)
     conversation_id: Optional[str] = None
+    include_audio: bool = False  # Also return the reply audio inline as base64
 
 class ChatResponse(BaseModel):
     response: str
@@ -69,6 +104,9 @@ class ChatResponse(BaseModel):
     message_count: int
     processing_time_ms: float
     timestamp: datetime
+    audio_url: Optional[str] = None
+    audio_upload_id: Optional[str] = None  # Poll /audio/uploads/{id} for the cloud URL
+    audio: Optional[Dict[str, Any]] = None  # Only when include_audio was requested
 
 class DeviceControlRequest(BaseModel):
     device_id: str = Field(..., min_length=1)
@@ -168,12 +206,17 @@ class UserDeviceImportRequest(BaseModel):
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup():
-    global config, ai_system, db_service
+    global config, ai_system, db_service, async_db
     try:
         config = load_config()
         # Use LangGraph with optimized response generation (50% faster)
         ai_system = await create_ai_system(config, use_langgraph=True)
         db_service = ai_system.db_service
+        async_db = ai_system.async_db
+        # Finished cloud uploads are pushed to the owner's websocket
+        get_shared_audio_uploader(config).add_listener(_publish_audio_upload)
+        if config.audio_cache.enabled:
+            await get_audio_cache_manager(config.audio_cache).start()
         print("🚀 API server started successfully")
         print("   🔗 LangGraph workflow with optimized response generation")
         print("   ⚡ ~50% faster with single API call for intent+response")
@@ -183,6 +226,16 @@ async def startup():
 
 @app.on_event("shutdown")
 async def shutdown():
+    if ai_system is not None and hasattr(ai_system, "close"):
+        await ai_system.close()
+    await close_shared_llm_clients()
+    await close_shared_tts_sessions()
+    await close_shared_audio_uploaders()
+    await get_audio_cache_manager().stop()
+    # Pending write-behind writes need the engines, so flush them first
+    await close_shared_write_behind_queues()
+    await dispose_shared_async_database_managers()
+    dispose_shared_database_managers()
     print("👋 API server shutting down")
 
 # Dependency functions
@@ -395,6 +448,7 @@ async def import_users_json(request: UserJsonImportRequest):
                     results["errors"].append(f"处理用户 {user_data.get('id', 'unknown')} 时出错: {str(e)}")
             
             session.commit()
+            db_service.invalidate_user()
             
         except Exception as e:
             session.rollback()
@@ -604,6 +658,7 @@ async def import_devices_json(request: DeviceJsonImportRequest):
                     results["errors"].append(f"处理设备 {device_data.get('id', 'unknown')} 时出错: {str(e)}")
             
             session.commit()
+            db_service.invalidate_devices()
             
         except Exception as e:
             session.rollback()
@@ -939,7 +994,8 @@ async def chat(request: ChatRequest):
         result = await ai_system.process_message(
             user_input=request.message,
             user_id=request.user_id,
-            session_id=request.conversation_id
+            session_id=request.conversation_id,
+            include_audio=request.include_audio
         )
         
         processing_time = (time.time() - start_time) * 1000
@@ -952,32 +1008,84 @@ async def chat(request: ChatRequest):
             response_text = str(result)
             session_id = request.conversation_id
         
-        # Get familiarity score from database
-        familiarity_score = db_service.get_user_familiarity(request.user_id)
-        
-        # Get or create conversation
-        conversation = db_service.get_or_create_conversation(
-            user_id=request.user_id,
-            conversation_id=session_id
-        )
-        
-        # Get message count
-        messages = db_service.get_conversation_history(conversation.id, limit=1000)
-        message_count = len(messages)
+        # The workflow reports conversation metadata; query only if it could not
+        conversation_id = result.get("conversation_id") if isinstance(result, dict) else None
+        if conversation_id:
+            message_count = result.get("message_count", 0)
+            familiarity_score = result.get("familiarity_score")
+        else:
+            turn_info = await async_db.record_conversation_turn(
+                user_id=request.user_id,
+                conversation_id=session_id
+            )
+            conversation_id = turn_info.conversation_id
+            message_count = turn_info.message_count
+            familiarity_score = turn_info.familiarity_score
         
         return ChatResponse(
             response=response_text,
-            conversation_id=conversation.id,
+            conversation_id=conversation_id,
             user_id=request.user_id,
             familiarity_score=familiarity_score,
             message_count=message_count,
             processing_time_ms=processing_time,
-            timestamp=datetime.utcnow()
+            timestamp=datetime.utcnow(),
+            audio_url=result.get("audio_url") if isinstance(result, dict) else None,
+            audio_upload_id=result.get("audio_upload_id") if isinstance(result, dict) else None,
+            audio=result.get("audio") if isinstance(result, dict) else None
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"处理消息失败: {str(e)}")
 
+async def _stream_chat_events(message: str, user_id: str, conversation_id: Optional[str]):
+    """Yield workflow events, falling back to one response+done pair for non-streaming systems"""
+    session_id = conversation_id or str(uuid.uuid4())
+    if hasattr(ai_system, "process_message_stream"):
+        async for event in ai_system.process_message_stream(
+            user_input=message,
+            user_id=user_id,
+            session_id=session_id
+        ):
+            yield event
+        return
+
+    result = await ai_system.process_message(
+        user_input=message,
+        user_id=user_id,
+        session_id=session_id
+    )
+    response_text = result.get("response", "No response") if isinstance(result, dict) else str(result)
+    yield {"type": "response", "response": response_text, "session_id": session_id}
+    yield {"type": "done", "response": response_text, "session_id": session_id}
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream a chat turn as Server-Sent Events.
+
+    Character-response tokens are sent as they are generated (event: token).
+    With pipelined TTS each finished sentence's audio is sent in order as
+    event: audio; device results, audio URL and the final payload follow.
+    """
+    async def event_source():
+        start_time = time.time()
+        try:
+            async for event in _stream_chat_events(request.message, request.user_id, request.conversation_id):
+                event_type = event.pop("type", "message")
+                if event_type == "done":
+                    event["processing_time_ms"] = (time.time() - start_time) * 1000
+                payload = json.dumps(event, ensure_ascii=False, default=str)
+                yield f"event: {event_type}\ndata: {payload}\n\n"
+        except Exception as e:
+            payload = json.dumps({"error": f"处理消息失败: {str(e)}"}, ensure_ascii=False)
+            yield f"event: error\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str):
     """Get conversation history"""
@@ -1163,7 +1271,7 @@ async def control_device(request: DeviceControlRequest):
     """Control a device"""
     try:
         # Check user familiarity
-        familiarity = db_service.get_user_familiarity(request.user_id)
+        familiarity = await async_db.get_user_familiarity(request.user_id)
         if familiarity < config.system.min_familiarity_for_hardware:
             return DeviceControlResponse(
                 success=False,
@@ -1194,7 +1302,7 @@ async def control_device(request: DeviceControlRequest):
         )
         
         # Get updated device state
-        device = db_service.get_device(request.device_id)
+        device = await async_db.get_device(request.device_id)
         device_state = device.current_state if device else None
         
         return DeviceControlResponse(
@@ -1213,7 +1321,7 @@ async def control_device(request: DeviceControlRequest):
 async def save_user_memory(user_id: str, memory_data: UserMemoryRequest):
     """Save a user memory"""
     try:
-        memory = db_service.save_user_memory(
+        memory = await async_db.save_user_memory(
             user_id=user_id,
             content=memory_data.content,
             memory_type=memory_data.memory_type,
@@ -1238,7 +1346,7 @@ async def search_user_memories(
 ):
     """Search user memories"""
     try:
-        memories = db_service.search_user_memories(
+        memories = await async_db.search_user_memories(
             user_id=user_id,
             query=query,
             limit=limit,
@@ -1305,6 +1413,14 @@ async def cleanup_expired_conversations():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"清理失败: {str(e)}")
 
+@app.get("/audio/uploads/{upload_id}")
+async def get_audio_upload(upload_id: str):
+    """Status of a background cloud upload (cloud_url is set once status is "done")"""
+    upload = get_shared_audio_uploader(config).get_status(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="上传任务不存在")
+    return upload.to_dict()
+
 @app.get("/admin/status")
 async def get_admin_status():
     """Get admin status information"""
@@ -1315,6 +1431,16 @@ async def get_admin_status():
         return {
             "system_statistics": system_stats,
             "active_conversations": active_conversations,
+            "database_pool": db_service.get_pool_status(),
+            "llm_cache": get_llm_cache_stats(),
+            "prompts": get_prompt_stats(),
+            "tts_cache": get_tts_cache_stats(),
+            "audio_cache": get_audio_cache_stats(),
+            "audio_uploads": get_audio_upload_stats(),
+            "async_database": async_db.get_stats() if async_db else None,
+            "write_behind": get_write_behind_stats(),
+            "user_cache": get_user_cache_stats(),
+            "checkpointer": ai_system.get_checkpoint_stats() if hasattr(ai_system, "get_checkpoint_stats") else None,
             "workflow": "LangGraph with optimized response generation",
             "optimized": True,
             "api_calls_per_request": 1,
@@ -1349,6 +1475,18 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+async def _publish_audio_upload(upload):
+    """Send a finished upload's status to its user's websocket, if connected"""
+    websocket = manager.active_connections.get(upload.user_id) if upload.user_id else None
+    if websocket is None:
+        return
+    await websocket.send_json({
+        "type": "audio_upload",
+        **upload.to_dict(),
+        "conversation_id": upload.session_id,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
 @app.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
     """WebSocket endpoint for real-time chat"""
@@ -1360,12 +1498,22 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
             message = data.get("message", "")
             conversation_id = data.get("conversation_id")
             
-            if message:
+            if message and data.get("stream"):
+                # Streaming mode: forward tokens, then device/audio/done events
+                conv_id = conversation_id or str(uuid.uuid4())
+                async for event in _stream_chat_events(message, user_id, conv_id):
+                    await websocket.send_json({
+                        **event,
+                        "conversation_id": conv_id,
+                        "timestamp": datetime.utcnow().isoformat()
+                    })
+            elif message:
                 # Process message using LangGraph
                 result = await ai_system.process_message(
                     user_input=message,
                     user_id=user_id,
-                    session_id=conversation_id
+                    session_id=conversation_id,
+                    include_audio=bool(data.get("include_audio"))
                 )
                 
                 # Extract response
@@ -1377,11 +1525,14 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                     conv_id = conversation_id
                 
                 # Send response back
-                await websocket.send_json({
+                reply = {
                     "response": response,
                     "conversation_id": conv_id,
                     "timestamp": datetime.utcnow().isoformat()
-                })
+                }
+                if isinstance(result, dict) and result.get("audio"):
+                    reply["audio"] = result["audio"]
+                await websocket.send_json(reply)
                 
     except WebSocketDisconnect:
         manager.disconnect(user_id)
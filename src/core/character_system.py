@@ -22,7 +22,8 @@ except ImportError:
 
 from ..utils.config import Config
 from ..utils.llm_client import create_llm_client
-from .context_manager import SystemContext
+from ..utils.prompt_registry import get_prompt_registry
+from .context_manager import SystemContext, history_limits
 
 
 class CharacterSystem:
@@ -35,12 +36,14 @@ class CharacterSystem:
         
         # Load character prompt
         self.character_prompt = self._load_prompt_file('prompts/character.txt')
+        self.system_template = get_prompt_registry().template(
+            "character_system", lambda: self.character_prompt
+        )
     
     def _load_prompt_file(self, filepath: str) -> str:
-        """Load prompt from file"""
+        """Load prompt from file (read once per process)"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return f.read()
+            return get_prompt_registry().load_file(filepath)
         except Exception as e:
             self.logger.warning(f"Failed to load prompt file {filepath}: {e}")
             return self._get_default_character_prompt()
@@ -59,8 +62,7 @@ class CharacterSystem:
 
         try:
             # Get conversation messages in standard format (includes current user input)
-            max_turns = self.config.system.max_conversation_turns
-            conversation_messages = context.get_conversation_messages_for_llm(max_turns=max_turns)
+            conversation_messages = context.get_conversation_messages_for_llm(**history_limits(self.config))
             
             # Build system prompt with context
             system_prompt = self._build_system_prompt(context, response_data)
@@ -104,9 +106,6 @@ class CharacterSystem:
     ) -> str:
         """Build system prompt for character based on loaded prompt file"""
         
-        # Start with the loaded character prompt from file
-        base_prompt = self.character_prompt
-        
         # Add current context information (without exposing familiarity score)
         familiarity_stage = self._get_familiarity_stage(context.familiarity_score)
         context_info = f"""
@@ -123,10 +122,8 @@ class CharacterSystem:
         if specific_context:
             context_info += f"\n{specific_context}"
         
-        # Combine base prompt with context
-        system_prompt = base_prompt + context_info
-        
-        return system_prompt
+        # Character prompt is the cached static prefix; context is the suffix
+        return self.system_template.render(context_info)
     
     def _build_context_content(
         self,
@@ -4,10 +4,39 @@ Context Manager Component
 Manages conversation context and state across all components
 """
 from typing import Dict, Any, List, Optional
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from datetime import datetime
+import asyncio
 import json
 import logging
+import threading
+import time
+
+from ..utils.token_budget import estimate_tokens
+
+
+# Rolling summary of trimmed turns: characters kept per folded message
+SUMMARY_LINE_CHARS = 60
+
+
+@dataclass
+class HistoryWindow:
+    """Conversation history that fits a prompt's token budget"""
+    messages: List[Dict[str, Any]]  # Newest last, always starts with a user turn
+    summary: Optional[str] = None  # Rolling summary of older, trimmed turns
+    tokens: int = 0  # Estimated tokens of messages + summary
+    trimmed: int = 0  # Messages left out of the window
+
+
+def history_limits(config) -> Dict[str, Any]:
+    """History window arguments from SystemConfig, shared by every prompt builder"""
+    system = config.system
+    return {
+        "max_turns": system.max_conversation_turns,
+        "token_budget": getattr(system, "conversation_context_window", None),
+        "summary_tokens": getattr(system, "conversation_summary_tokens", 0)
+    }
 
 
 @dataclass
@@ -39,8 +68,12 @@ class SystemContext:
     last_response: Optional[str] = None
     response_history: List[str] = field(default_factory=list)
     
+    # Rolling summary of turns trimmed from the LLM history window
+    history_summary_lines: List[str] = field(default_factory=list)
+    
     # Metadata
     session_id: str = ""
+    user_id: str = ""  # Authenticated user, empty for anonymous sessions
     timestamp: datetime = field(default_factory=datetime.now)
     
     def add_user_message(self, user_msg: str, max_history: int = 20):
@@ -48,7 +81,8 @@ class SystemContext:
         self.conversation_history.append({
             "role": "user",
             "content": user_msg,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "tokens": estimate_tokens(user_msg)
         })
         self.message_count += 1
         self.user_input = user_msg
@@ -62,7 +96,8 @@ class SystemContext:
         self.conversation_history.append({
             "role": "assistant", 
             "content": assistant_msg,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "tokens": estimate_tokens(assistant_msg)
         })
         self.message_count += 1
         self.last_response = assistant_msg
@@ -109,38 +144,124 @@ class SystemContext:
                     return intent["device"]
         return None
         
-    def get_conversation_context_for_llm(self, max_turns: Optional[int] = None) -> str:
-        """Get formatted conversation history for LLM (legacy string format)"""
-        if max_turns is None:
-            # Use all available history
-            recent_history = self.conversation_history
-        elif max_turns == -1:
-            # Unlimited history
-            recent_history = self.conversation_history
-        else:
-            # Limited history
-            recent_history = self.conversation_history[-(max_turns * 2):]
+    @staticmethod
+    def message_tokens(message: Dict[str, Any]) -> int:
+        """Estimated tokens of a history message (cached on the message)"""
+        tokens = message.get("tokens")
+        if tokens is None:
+            tokens = estimate_tokens(message.get("content", ""))
+            message["tokens"] = tokens
+        return tokens
+    
+    @property
+    def history_tokens(self) -> int:
+        """Running estimate of all tokens held in conversation_history"""
+        return sum(self.message_tokens(msg) for msg in self.conversation_history)
+    
+    @property
+    def history_summary(self) -> Optional[str]:
+        return "\n".join(self.history_summary_lines) if self.history_summary_lines else None
+    
+    def get_history_window(
+        self,
+        max_turns: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        summary_tokens: int = 0
+    ) -> HistoryWindow:
+        """
+        Newest-first history window within max_turns and token_budget.
+        
+        Messages are added from newest to oldest until the budget is spent
+        (the newest message is always kept). With summary_tokens > 0, that much
+        of the budget is reserved for a rolling summary into which trimmed
+        messages are folded once; the summary is cached on the context.
+        """
+        history = self.conversation_history
+        if max_turns is not None and max_turns > 0:
+            history = history[-(max_turns * 2):]
+        
+        budget = token_budget if token_budget and token_budget > 0 else None
+        if budget is not None and summary_tokens > 0:
+            budget = max(1, budget - summary_tokens)
+        
+        kept: List[Dict[str, Any]] = []
+        used = 0
+        for msg in reversed(history):
+            tokens = self.message_tokens(msg)
+            if kept and budget is not None and used + tokens > budget:
+                # Chat APIs expect the history to open with a user turn
+                while len(kept) > 1 and kept[-1]["role"] != "user":
+                    used -= self.message_tokens(kept.pop())
+                break
+            kept.append(msg)
+            used += tokens
+        kept.reverse()
+        
+        trimmed = len(self.conversation_history) - len(kept)
+        summary = None
+        if summary_tokens > 0 and budget is not None:
+            self._fold_into_summary(self.conversation_history[:trimmed], summary_tokens)
+            summary = self.history_summary
+            if summary:
+                used += estimate_tokens(summary)
+        return HistoryWindow(messages=kept, summary=summary, tokens=used, trimmed=trimmed)
+    
+    def _fold_into_summary(self, messages: List[Dict[str, Any]], max_tokens: int):
+        """Append newly trimmed messages to the rolling summary, oldest lines drop first"""
+        changed = False
+        for msg in messages:
+            if msg.get("summarized"):
+                continue
+            msg["summarized"] = True
+            content = " ".join(msg.get("content", "").split())
+            if len(content) > SUMMARY_LINE_CHARS:
+                content = content[:SUMMARY_LINE_CHARS] + "…"
+            role = "用户" if msg["role"] == "user" else "助手"
+            self.history_summary_lines.append(f"{role}: {content}")
+            changed = True
+        if changed:
+            while len(self.history_summary_lines) > 1 and estimate_tokens(self.history_summary) > max_tokens:
+                self.history_summary_lines.pop(0)
+        
+    def get_conversation_context_for_llm(
+        self,
+        max_turns: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        summary_tokens: int = 0
+    ) -> str:
+        """Get formatted conversation history for LLM (legacy string format)
+
+        max_turns None or -1 means no turn limit; token_budget trims further
+        (see get_history_window).
+        """
+        window = self.get_history_window(max_turns, token_budget, summary_tokens)
         
         formatted = []
-        for msg in recent_history:
+        if window.summary:
+            formatted.append(f"[早前对话摘要]\n{window.summary}\n[最近对话]")
+        for msg in window.messages:
             role = "用户" if msg["role"] == "user" else "助手"
             formatted.append(f"{role}: {msg['content']}")
         return "\n".join(formatted)
     
-    def get_conversation_messages_for_llm(self, max_turns: Optional[int] = None) -> List[Dict[str, str]]:
-        """Get conversation history in standard message format for LLM"""
-        if max_turns is None:
-            # Use all available history
-            recent_history = self.conversation_history
-        elif max_turns == -1:
-            # Unlimited history
-            recent_history = self.conversation_history
-        else:
-            # Limited history
-            recent_history = self.conversation_history[-(max_turns * 2):]
+    def get_conversation_messages_for_llm(
+        self,
+        max_turns: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        summary_tokens: int = 0
+    ) -> List[Dict[str, str]]:
+        """Get conversation history in standard message format for LLM
+
+        A rolling summary, if any, is prefixed to the first (user) message so
+        the user/assistant alternation is preserved.
+        """
+        window = self.get_history_window(max_turns, token_budget, summary_tokens)
         
         # Only return user and assistant messages (simplified)
-        return [{"role": msg["role"], "content": msg["content"]} for msg in recent_history]
+        messages = [{"role": msg["role"], "content": msg["content"]} for msg in window.messages]
+        if window.summary and messages:
+            messages[0]["content"] = f"[早前对话摘要]\n{window.summary}\n\n{messages[0]['content']}"
+        return messages
         
     def get_device_context_for_llm(self) -> str:
         """Get formatted device state for LLM"""
@@ -179,81 +300,312 @@ class SystemContext:
             "reference_resolution": self.reference_resolution,
             "relevant_memories": self.relevant_memories,
             "last_response": self.last_response,
+            "history_summary_lines": self.history_summary_lines,
             "session_id": self.session_id,
+            "user_id": self.user_id,
             "timestamp": self.timestamp.isoformat()
         }
 
 
 class ContextManager:
-    """Manages system context across components"""
+    """Manages per-session system contexts across components
+
+    Sessions are kept in an LRU store keyed by session_id. The store is bounded
+    by ``max_sessions`` and idle sessions expire after ``idle_timeout_minutes``.
+    When a ``db_service`` is provided, a session that is no longer in memory is
+    lazily rehydrated from its stored messages on the next access. Async callers
+    use get_context_async(), which queries through ``async_db`` when given.
+    """
     
-    def __init__(self, max_turns: int = 20):
+    def __init__(
+        self,
+        max_turns: int = 20,
+        max_sessions: int = 1000,
+        idle_timeout_minutes: int = 30,
+        db_service=None,
+        async_db=None
+    ):
         self.logger = logging.getLogger(__name__)
-        self.context = SystemContext()
         self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.idle_timeout_seconds = idle_timeout_minutes * 60
+        self.db_service = db_service
+        self.async_db = async_db
         
+        self._lock = threading.RLock()
+        self._sessions: "OrderedDict[str, SystemContext]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self.stats = {"hits": 0, "misses": 0, "rehydrated": 0, "evicted_lru": 0, "evicted_idle": 0}
+    
     def create_session(self, session_id: str) -> SystemContext:
-        """Create a new session context"""
-        self.context = SystemContext(session_id=session_id)
+        """Create a new session context, replacing any existing one with the same id"""
+        context = SystemContext(session_id=session_id)
+        with self._lock:
+            self._store(session_id, context)
         self.logger.debug(f"Created new session: {session_id}")
-        return self.context
+        return context
+    
+    def get_session(
+        self,
+        session_id: str,
+        create: bool = True,
+        user_id: Optional[str] = None
+    ) -> Optional[SystemContext]:
+        """Get the context for a session, rehydrating or creating it if needed
+
+        user_id, when known, limits rehydration to that user's conversations.
+        """
+        context = self._lookup(session_id)
+        if context is not None:
+            return context
+        # Rehydrate outside the lock so a slow query does not block other sessions
+        return self._install(session_id, self._rehydrate_session(session_id, user_id), create)
+    
+    async def get_session_async(
+        self,
+        session_id: str,
+        create: bool = True,
+        user_id: Optional[str] = None
+    ) -> Optional[SystemContext]:
+        """get_session() for the event loop: rehydration queries off the loop"""
+        context = self._lookup(session_id)
+        if context is not None:
+            return context
+        return self._install(session_id, await self._rehydrate_session_async(session_id, user_id), create)
+    
+    def _lookup(self, session_id: str) -> Optional[SystemContext]:
+        """Return a session held in memory, refreshing its LRU position"""
+        if not session_id:
+            raise ValueError("session_id is required")
+        
+        with self._lock:
+            self._evict_idle()
+            context = self._sessions.get(session_id)
+            if context is not None:
+                self._sessions.move_to_end(session_id)
+                self._last_access[session_id] = time.monotonic()
+                self.stats["hits"] += 1
+                return context
+            self.stats["misses"] += 1
+        return None
+    
+    def _install(
+        self,
+        session_id: str,
+        context: Optional[SystemContext],
+        create: bool
+    ) -> Optional[SystemContext]:
+        """Store a rehydrated (or new) context unless another caller got there first"""
+        if context is None:
+            if not create:
+                return None
+            context = SystemContext(session_id=session_id)
+            self.logger.debug(f"Created new session: {session_id}")
+        
+        with self._lock:
+            # Another caller may have populated the session meanwhile
+            existing = self._sessions.get(session_id)
+            if existing is not None:
+                context = existing
+            self._store(session_id, context)
+        return context
+    
+    def has_session(self, session_id: str) -> bool:
+        """Check whether a session is currently held in memory"""
+        with self._lock:
+            return session_id in self._sessions
+    
+    def end_session(self, session_id: str) -> bool:
+        """Drop a session from the in-memory store"""
+        with self._lock:
+            self._last_access.pop(session_id, None)
+            return self._sessions.pop(session_id, None) is not None
+    
+    def cleanup_expired_sessions(self) -> int:
+        """Evict sessions idle longer than the timeout, returns number evicted"""
+        with self._lock:
+            return self._evict_idle()
+    
+    def active_session_count(self) -> int:
+        """Number of sessions currently held in memory"""
+        with self._lock:
+            return len(self._sessions)
+    
+    def session_ids(self) -> List[str]:
+        """Ids of the sessions currently held in memory (least recently used first)"""
+        with self._lock:
+            return list(self._sessions)
         
-    def get_context(self) -> SystemContext:
-        """Get current context"""
-        return self.context
+    def get_context(self, session_id: str, user_id: Optional[str] = None) -> SystemContext:
+        """Get a session context (same as get_session)"""
+        return self.get_session(session_id, user_id=user_id)
+    
+    async def get_context_async(self, session_id: str, user_id: Optional[str] = None) -> SystemContext:
+        """Get a session context (same as get_session_async)"""
+        return await self.get_session_async(session_id, user_id=user_id)
         
-    def update_context(self, **kwargs):
-        """Update context fields"""
+    def update_context(self, session_id: str, **kwargs):
+        """Update context fields of the named session
+
+        A session evicted since it was loaded is recreated from the update
+        rather than rehydrated, so this never queries the database.
+        """
+        target = self._lookup(session_id) or self._install(session_id, None, create=True)
         for key, value in kwargs.items():
-            if hasattr(self.context, key):
+            if hasattr(target, key):
                 # Normalize timestamp back to datetime when coming from serialized dict
                 if key == "timestamp" and isinstance(value, str):
                     try:
-                        from datetime import datetime
                         value = datetime.fromisoformat(value)
                     except Exception:
                         pass
-                setattr(self.context, key, value)
+                setattr(target, key, value)
+    
+    def _store(self, session_id: str, context: SystemContext):
+        """Insert or refresh a session and enforce the LRU bound (lock held)"""
+        self._sessions[session_id] = context
+        self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = time.monotonic()
+        while self.max_sessions > 0 and len(self._sessions) > self.max_sessions:
+            evicted_id, _ = self._sessions.popitem(last=False)
+            self._last_access.pop(evicted_id, None)
+            self.stats["evicted_lru"] += 1
+            self.logger.debug(f"Evicted least recently used session: {evicted_id}")
+    
+    def _evict_idle(self) -> int:
+        """Evict sessions idle past the timeout (lock held)"""
+        if self.idle_timeout_seconds <= 0:
+            return 0
+        cutoff = time.monotonic() - self.idle_timeout_seconds
+        evicted = 0
+        # OrderedDict is in access order, so stop at the first fresh session
+        while self._sessions:
+            session_id = next(iter(self._sessions))
+            if self._last_access.get(session_id, 0) >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self._last_access.pop(session_id, None)
+            evicted += 1
+        if evicted:
+            self.stats["evicted_idle"] += evicted
+            self.logger.debug(f"Evicted {evicted} idle sessions")
+        return evicted
+    
+    def _rehydrate_session(self, session_id: str, user_id: Optional[str] = None) -> Optional[SystemContext]:
+        """Rebuild a session's conversation history from the Message table
+
+        Turns may have been recorded under a conversation id derived from the
+        session id (see DatabaseService.get_session_history).
+        """
+        if not self.db_service:
+            return None
+        try:
+            history = self.db_service.get_session_history(session_id, user_id, limit=self._rehydrate_limit())
+        except Exception as e:
+            self.logger.warning(f"Failed to rehydrate session {session_id}: {e}")
+            return None
+        return self._context_from_history(session_id, history)
+    
+    async def _rehydrate_session_async(
+        self,
+        session_id: str,
+        user_id: Optional[str] = None
+    ) -> Optional[SystemContext]:
+        """_rehydrate_session() through the async database service, or a worker thread"""
+        if not self.async_db and not self.db_service:
+            return None
+        try:
+            if self.async_db:
+                history = await self.async_db.get_session_history(session_id, user_id, limit=self._rehydrate_limit())
+            else:
+                history = await asyncio.to_thread(
+                    self.db_service.get_session_history, session_id, user_id, self._rehydrate_limit()
+                )
+        except Exception as e:
+            self.logger.warning(f"Failed to rehydrate session {session_id}: {e}")
+            return None
+        return self._context_from_history(session_id, history)
+    
+    def _rehydrate_limit(self) -> int:
+        return self.max_turns if self.max_turns and self.max_turns > 0 else 50
+    
+    def _context_from_history(self, session_id: str, history) -> Optional[SystemContext]:
+        if not history:
+            return None
+        
+        context = SystemContext(session_id=session_id)
+        for message in history:
+            timestamp = message.timestamp.isoformat() if message.timestamp else datetime.now().isoformat()
+            if message.user_input:
+                context.conversation_history.append({
+                    "role": "user",
+                    "content": message.user_input,
+                    "timestamp": timestamp
+                })
+            if message.assistant_response:
+                context.conversation_history.append({
+                    "role": "assistant",
+                    "content": message.assistant_response,
+                    "timestamp": timestamp
+                })
+                context.last_response = message.assistant_response
+            if message.intent_detected:
+                context.previous_intents.append(message.intent_detected)
+        context.previous_intents = context.previous_intents[-10:]
+        context.message_count = len(context.conversation_history)
+        
+        with self._lock:
+            self.stats["rehydrated"] += 1
+        self.logger.debug(f"Rehydrated session {session_id} with {context.message_count} messages")
+        return context
                 
-    def save_context(self, filepath: str):
-        """Save context to file (synchronous)"""
+    def save_context(self, filepath: str, session_id: str):
+        """Save a session's context to file (synchronous)"""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.context.to_dict(), f, ensure_ascii=False, indent=2)
-            self.logger.info(f"Context saved to {filepath}")
+            self._save_context_sync(filepath, self._held_session(session_id))
         except Exception as e:
             self.logger.error(f"Failed to save context: {e}")
     
-    async def save_context_async(self, filepath: str):
-        """Save context to file asynchronously"""
-        import asyncio
+    async def save_context_async(self, filepath: str, session_id: str):
+        """Save a session's context to file asynchronously"""
         try:
             # Run file I/O in a thread pool to avoid blocking
-            await asyncio.to_thread(self._save_context_sync, filepath)
+            await asyncio.to_thread(self._save_context_sync, filepath, self._held_session(session_id))
         except Exception as e:
             self.logger.error(f"Failed to save context asynchronously: {e}")
     
-    def _save_context_sync(self, filepath: str):
+    def _held_session(self, session_id: str) -> SystemContext:
+        """In-memory context of a session; saving never rehydrates"""
+        with self._lock:
+            context = self._sessions.get(session_id)
+        if context is None:
+            raise KeyError(f"Session not in memory: {session_id}")
+        return context
+    
+    def _save_context_sync(self, filepath: str, context: SystemContext):
         """Internal synchronous context save"""
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(self.context.to_dict(), f, ensure_ascii=False, indent=2)
+            json.dump(context.to_dict(), f, ensure_ascii=False, indent=2)
         self.logger.info(f"Context saved to {filepath}")
             
     def load_context(self, filepath: str) -> SystemContext:
-        """Load context from file"""
+        """Load context from file (stored as its session when it has a session_id)"""
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 
-            self.context = SystemContext()
+            context = SystemContext()
             for key, value in data.items():
-                if hasattr(self.context, key):
+                if hasattr(context, key):
                     if key == "timestamp":
                         value = datetime.fromisoformat(value)
-                    setattr(self.context, key, value)
+                    setattr(context, key, value)
+            if context.session_id:
+                with self._lock:
+                    self._store(context.session_id, context)
                     
             self.logger.info(f"Context loaded from {filepath}")
-            return self.context
+            return context
         except Exception as e:
             self.logger.error(f"Failed to load context: {e}")
             return SystemContext()
\ No newline at end of file
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Device Catalog
+In-memory view of the active devices for LLM prompts: specs indexed by name
+and device_type_id, capabilities precomputed per device type, and one compact
+prompt line per device rendered once per catalog version. Each request then
+ranks those lines by relevance and keeps as many as fit a token budget.
+The fast-path intent recognizer matches against the same snapshots.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..services.async_database_service import AsyncDatabaseService
+from ..services.database_service import DatabaseService
+from ..utils.config import Config
+from ..utils.token_budget import estimate_tokens, take_within_budget
+
+
+# Resolved from the package so the server can start from any directory
+DEVICE_SPECS_PATH = Path(__file__).resolve().parents[2] / 'config' / 'device_specifications.json'
+
+# Device type → intent category (matches the "device" values the LLM prompts use)
+TYPE_CATEGORIES = {
+    "light": "lights",
+    "lights": "lights",
+    "dimmable_light": "lights",
+    "57D56F4D-3302-41F7-AB34-5365AA180E81": "lights",
+    "curtain": "curtains",
+    "curtains": "curtains",
+    "2FB9EE1F-1C21-4D0B-9383-9B65F64DBF0E": "curtains",
+    "tv": "tv",
+    "speaker": "speaker",
+    "air_conditioner": "air_conditioner",
+}
+
+CATEGORY_KEYWORDS = {
+    "lights": ["调光灯", "灯光", "台灯", "吊灯", "电灯", "灯"],
+    "curtains": ["窗帘"],
+    "tv": ["电视机", "电视"],
+    "speaker": ["音响", "音箱", "喇叭"],
+    "air_conditioner": ["空调", "冷气"],
+}
+
+ROOM_ALIASES = {
+    "living_room": ["客厅"],
+    "bedroom": ["卧室", "房间"],
+    "kitchen": ["厨房"],
+    "study": ["书房"],
+    "bathroom": ["浴室", "卫生间"],
+    "dining_room": ["餐厅"],
+}
+
+# Capabilities for device types missing from device_specifications.json
+DIMMABLE_TYPES = ("light", "dimmable_light", "57D56F4D-3302-41F7-AB34-5365AA180E81")
+COLOR_TYPES = ("dimmable_light", "57D56F4D-3302-41F7-AB34-5365AA180E81")
+POSITION_TYPES = ("curtain", "2FB9EE1F-1C21-4D0B-9383-9B65F64DBF0E")
+
+# Capability flag -> short name used in the compact device line
+CAPABILITY_NAMES = {
+    "can_dim": "dim",
+    "has_temperature": "temperature",
+    "has_volume": "volume",
+    "has_color": "color",
+    "has_position": "position",
+}
+
+# Relevance weights for ranking devices against a request
+RECENT_DEVICE_SCORE = 8.0
+NAME_MATCH_SCORE = 6.0
+ROOM_MATCH_SCORE = 4.0
+CATEGORY_MATCH_SCORE = 3.0
+NAME_OVERLAP_SCORE = 3.0
+
+_NAME_TERM_RE = re.compile(r"[a-z0-9]{2,}|[^\x00-\x7f\s]")
+
+
+def load_device_specifications(path=DEVICE_SPECS_PATH) -> Dict[str, Any]:
+    """Load device specifications, or an empty spec set if the file is missing"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Device specifications unavailable ({path}): {e}")
+        return {"devices": {}}
+
+
+class DeviceSpecIndex:
+    """Device specs looked up by spec name or device_type_id in O(1)"""
+
+    def __init__(self, device_specs: Dict[str, Any]):
+        specs = device_specs.get("devices", {}) or {}
+        self._specs: Dict[str, Dict[str, Any]] = {}
+        for spec in specs.values():
+            type_id = spec.get("device_type_id")
+            if type_id:
+                self._specs.setdefault(type_id, spec)
+        # A direct name match wins over a device_type_id match
+        self._specs.update(specs)
+        self._capabilities: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, device_type: str) -> Optional[Dict[str, Any]]:
+        return self._specs.get(device_type)
+
+    def capabilities(self, device_type: str) -> Dict[str, Any]:
+        """Capability flags for a device type (computed once per type)"""
+        capabilities = self._capabilities.get(device_type)
+        if capabilities is None:
+            capabilities = self._compute_capabilities(device_type)
+            self._capabilities[device_type] = capabilities
+        return capabilities
+
+    def _compute_capabilities(self, device_type: str) -> Dict[str, Any]:
+        spec = self.get(device_type)
+        if spec:
+            parameters = spec.get("parameters", {})
+            return {
+                "can_dim": "brightness" in parameters,
+                "has_temperature": "temperature" in parameters,
+                "has_volume": "volume" in parameters,
+                "has_color": "hue" in parameters and "saturation" in parameters,
+                "has_position": "targetPosition" in parameters,
+                "supported_commands": spec.get("supported_commands", []),
+                "category": spec.get("category", "unknown")
+            }
+        # Fallback for devices without spec
+        return {
+            "can_dim": device_type in DIMMABLE_TYPES,
+            "has_temperature": device_type == "air_conditioner",
+            "has_volume": device_type == "speaker",
+            "has_color": device_type in COLOR_TYPES,
+            "has_position": device_type in POSITION_TYPES
+        }
+
+
+def _name_terms(text: str) -> frozenset:
+    """CJK characters and ASCII words of a device name, for fuzzy overlap"""
+    return frozenset(_NAME_TERM_RE.findall(text.lower()))
+
+
+@dataclass(frozen=True)
+class DeviceContextEntry:
+    """One device pre-rendered for prompts, with the terms it is ranked by"""
+    device_id: str
+    line: str  # Compact single-line JSON
+    tokens: int
+    name: str  # Lowercased
+    name_terms: frozenset
+    room_terms: Tuple[str, ...]
+    category: Optional[str]
+
+    def score(
+        self,
+        query: str,
+        query_terms: frozenset,
+        categories: Iterable[str],
+        recent_ids: Iterable[str]
+    ) -> float:
+        """Relevance of this device to a request (0 when nothing matches)"""
+        score = 0.0
+        if self.device_id in recent_ids:
+            score += RECENT_DEVICE_SCORE
+        if self.name and self.name in query:
+            score += NAME_MATCH_SCORE
+        elif self.name_terms:
+            overlap = len(self.name_terms & query_terms) / len(self.name_terms)
+            score += NAME_OVERLAP_SCORE * overlap
+        if any(term in query for term in self.room_terms):
+            score += ROOM_MATCH_SCORE
+        if self.category and self.category in categories:
+            score += CATEGORY_MATCH_SCORE
+        return score
+
+
+@dataclass(frozen=True)
+class DeviceContext:
+    """Devices selected for one prompt"""
+    text: str
+    device_ids: Tuple[str, ...]
+    omitted: int
+    tokens: int
+
+
+@dataclass(frozen=True)
+class DeviceCatalogSnapshot:
+    """Immutable catalog for one device version (treat `devices` as read-only)"""
+    version: int
+    devices: Dict[str, Dict[str, Any]]
+    entries: Tuple[DeviceContextEntry, ...]  # Same order as `devices`
+    built_at: float
+
+    def select_context(
+        self,
+        user_input: str,
+        intent: Optional[Dict[str, Any]] = None,
+        recent_device_ids: Iterable[str] = (),
+        token_budget: int = 1500,
+        max_devices: int = 50
+    ) -> DeviceContext:
+        """
+        Rank devices against the request and keep the best within token_budget.
+
+        Devices are ranked by recent use, name, room and type matches against
+        the user input and intent; ties keep catalog order. The top device is
+        always included so the LLM has something to resolve against.
+        """
+        intent = intent or {}
+        query = " ".join(
+            str(value) for value in (user_input, intent.get("room"), intent.get("device_name")) if value
+        ).lower()
+        query_terms = _name_terms(query)
+        categories = {
+            category for category, keywords in CATEGORY_KEYWORDS.items()
+            if any(keyword in query for keyword in keywords)
+        }
+        intent_device = intent.get("device")
+        if isinstance(intent_device, str):
+            categories.add(TYPE_CATEGORIES.get(intent_device, intent_device))
+        recent_ids = {device_id for device_id in recent_device_ids if device_id}
+
+        ranked = sorted(
+            enumerate(self.entries),
+            key=lambda item: (-item[1].score(query, query_terms, categories, recent_ids), item[0])
+        )
+        candidates = [entry for _, entry in ranked[:max(1, max_devices)]]
+        lines, tokens = take_within_budget(((entry.line, entry.tokens) for entry in candidates), token_budget)
+        selected = candidates[:len(lines)]
+
+        omitted = len(self.entries) - len(selected)
+        if omitted:
+            lines.append(f"（另有 {omitted} 个相关度较低的设备未列出）")
+        return DeviceContext(
+            text="\n".join(lines) if lines else "无可用设备",
+            device_ids=tuple(entry.device_id for entry in selected),
+            omitted=omitted,
+            tokens=tokens
+        )
+
+
+class DeviceCatalog:
+    """
+    Cached device context, rebuilt only when the devices table changes.
+
+    DatabaseService bumps a version on every device write in this process;
+    max_age_seconds bounds staleness from writes made by other processes.
+    On the request path use snapshot_async(), which queries without blocking
+    the event loop.
+    """
+
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        spec_index: DeviceSpecIndex,
+        max_age_seconds: float = 300.0,
+        async_db=None
+    ):
+        self.db_service = db_service
+        self.async_db = async_db
+        self.spec_index = spec_index
+        self.max_age_seconds = max_age_seconds
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._snapshot: Optional[DeviceCatalogSnapshot] = None
+        self.stats = {"hits": 0, "rebuilds": 0}
+
+    def _is_fresh(self, snapshot: Optional[DeviceCatalogSnapshot], version: int) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.version == version
+            and time.monotonic() - snapshot.built_at < self.max_age_seconds
+        )
+
+    def snapshot(self) -> DeviceCatalogSnapshot:
+        """Current catalog; a dictionary lookup unless a device write happened"""
+        version = self.db_service.device_version
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, version):
+            self.stats["hits"] += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if not self._is_fresh(snapshot, version):
+                # Version is read before the query, so a concurrent write
+                # leaves this snapshot stale and triggers another rebuild
+                snapshot = self._build(version, self.db_service.get_all_devices(active_only=True))
+                self._snapshot = snapshot
+                self.stats["rebuilds"] += 1
+            else:
+                self.stats["hits"] += 1
+        return snapshot
+
+    async def snapshot_async(self) -> DeviceCatalogSnapshot:
+        """snapshot() for the event loop: the devices query runs on the async service or a worker thread"""
+        version = self.db_service.device_version
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, version):
+            self.stats["hits"] += 1
+            return snapshot
+
+        if self.async_db is not None:
+            devices = await self.async_db.get_all_devices(active_only=True)
+        else:
+            devices = await asyncio.to_thread(self.db_service.get_all_devices, active_only=True)
+        snapshot = self._build(version, devices)
+        with self._lock:
+            # Keep a newer snapshot built concurrently
+            if self._snapshot is None or self._snapshot.version <= version:
+                self._snapshot = snapshot
+            self.stats["rebuilds"] += 1
+        return snapshot
+
+    def _build(self, version: int, device_rows) -> DeviceCatalogSnapshot:
+        devices = {}
+        entries = []
+        for device in device_rows:
+            info = {
+                "name": device.name,
+                "type": device.device_type,
+                "room": device.room,
+                "current_state": device.current_state,
+                "supported_actions": device.supported_actions,
+                "capabilities": self.spec_index.capabilities(device.device_type),
+                "spec": self.spec_index.get(device.device_type)
+            }
+            devices[device.id] = info
+            entries.append(self._build_entry(device.id, info))
+        self.logger.debug(f"Device catalog v{version} rebuilt: {len(devices)} devices")
+        return DeviceCatalogSnapshot(
+            version=version,
+            devices=devices,
+            entries=tuple(entries),
+            built_at=time.monotonic()
+        )
+
+    @staticmethod
+    def _build_entry(device_id: str, info: Dict[str, Any]) -> DeviceContextEntry:
+        """Compact prompt line: commands and capability names instead of the full spec"""
+        spec = info["spec"] or {}
+        capabilities = info["capabilities"]
+        commands: List[str] = []
+        for command in list(info["supported_actions"] or []) + list(capabilities.get("supported_commands", [])):
+            if command not in commands:
+                commands.append(command)
+        compact = {
+            "id": device_id,
+            "name": info["name"],
+            "type": info["type"],
+            "room": info["room"],
+            "state": info["current_state"] or {},
+            "commands": commands,
+            "caps": [short for flag, short in CAPABILITY_NAMES.items() if capabilities.get(flag)]
+        }
+        if spec.get("parameters"):
+            compact["params"] = sorted(spec["parameters"])
+        line = json.dumps(compact, ensure_ascii=False, separators=(",", ":"))
+
+        room = info["room"] or ""
+        room_terms = [room] + ROOM_ALIASES.get(room, []) if room else []
+        name = (info["name"] or "").lower()
+        return DeviceContextEntry(
+            device_id=device_id,
+            line=line,
+            tokens=estimate_tokens(line),
+            name=name,
+            name_terms=_name_terms(name) - _name_terms(" ".join(room_terms)),
+            room_terms=tuple(term.lower() for term in room_terms),
+            category=TYPE_CATEGORIES.get(info["type"]) or TYPE_CATEGORIES.get(spec.get("category", ""))
+        )
+
+    def invalidate(self):
+        """Force a rebuild on the next snapshot()"""
+        self._snapshot = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            **self.stats,
+            "version": snapshot.version if snapshot else None,
+            "devices": len(snapshot.devices) if snapshot else 0,
+            "context_tokens": sum(entry.tokens for entry in snapshot.entries) if snapshot else 0
+        }
+
+
+# One catalog per database, shared by the device controller and the fast path
+_CATALOGS: Dict[str, DeviceCatalog] = {}
+_CATALOGS_LOCK = threading.Lock()
+
+
+def get_shared_device_catalog(config: Config) -> DeviceCatalog:
+    """Return the process-wide device catalog for this config's database"""
+    key = config.database.url
+    with _CATALOGS_LOCK:
+        catalog = _CATALOGS.get(key)
+        if catalog is None:
+            db_service = DatabaseService(config)
+            catalog = _CATALOGS[key] = DeviceCatalog(
+                db_service,
+                DeviceSpecIndex(load_device_specifications()),
+                max_age_seconds=getattr(config.system, "device_catalog_max_age_seconds", 300.0),
+                async_db=AsyncDatabaseService(config, db_service)
+            )
+        return catalog
@@ -23,8 +23,49 @@ except ImportError:
 
 from ..utils.config import Config
 from ..utils.llm_client import create_llm_client
+from ..utils.prompt_registry import get_prompt_registry
 from ..services.database_service import DatabaseService
-from .context_manager import SystemContext
+from ..services.async_database_service import AsyncDatabaseService
+from .context_manager import SystemContext, history_limits
+from .device_catalog import get_shared_device_catalog
+from .fast_intent import recognize_fast_intent
+
+
+# Static task instructions, compiled once with prompts/device_controller.txt
+# into the cacheable system prompt; the per-request prompt carries only state
+DEVICE_TASK_INSTRUCTIONS = """
+
+任务说明:
+1. 如果意图涉及设备控制(involves_hardware=true)，确定具体设备和操作
+2. 如果有指代词(它、那个等)，从上下文推断具体设备
+3. 如果是状态查询，返回相关设备的当前状态
+4. 理解隐含意图，如"好热"可能意味着要开空调或调低温度
+5. 考虑用户熟悉度，熟悉度低时操作需要更保守
+
+返回JSON格式:
+{
+    "action_type": "control/query/none",  // 操作类型
+    "device_id": "具体设备ID",  // 目标设备
+    "device_name": "设备名称",
+    "command": "具体命令",  // 如turn_on, turn_off, set_brightness, set_hue, set_saturation, set_color, set_position, open_curtain, close_curtain等
+    "parameters": {  // 命令参数
+        "brightness": number,  // 亮度 0-100
+        "hue": number,  // 色值 0-360 (红0/橙30/黄60/绿120/青180/蓝240/紫270/品红300/紫红330)
+        "saturation": number,  // 饱和度 0-100
+        "temperature": number,  // 温度 16-30
+        "volume": number,  // 音量 0-100
+        "targetPosition": number,  // 窗帘位置 0-100 (0=关闭, 100=完全打开)
+        "position": number  // 通用位置参数
+    },
+    "query_devices": ["device_id1", "device_id2"],  // 查询的设备列表
+    "reasoning": "决策理由",  // 解释为什么这样操作
+    "confidence": 0.0-1.0,  // 置信度
+    "message": "给用户的反馈消息",
+    "requires_confirmation": boolean  // 是否需要用户确认
+}
+
+只返回JSON，不要其他文字。
+"""
 
 
 class DeviceController:
@@ -34,37 +75,30 @@ class DeviceController:
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.db_service = DatabaseService(config)
+        self.async_db = AsyncDatabaseService(config, self.db_service)
         self.llm_client = create_llm_client(config)
         
-        # Load system prompt
-        self.system_prompt = self._load_prompt_file('prompts/device_controller.txt')
+        # Load system prompt (file + static task instructions, compiled once)
+        self.system_prompt = get_prompt_registry().template(
+            "device_controller",
+            lambda: self._load_prompt_file('prompts/device_controller.txt') + DEVICE_TASK_INSTRUCTIONS
+        ).render()
 
-        # Load device specifications from config
-        self.device_specs = self._load_device_specifications()
+        # Device specifications and the cached device catalog (shared with the fast path)
+        self.device_catalog = get_shared_device_catalog(config)
+        self.spec_index = self.device_catalog.spec_index
         
         # Load familiarity requirements from config
         self.familiarity_requirements = self._load_familiarity_requirements()
     
     def _load_prompt_file(self, filepath: str) -> str:
-        """Load prompt from file"""
+        """Load prompt from file (read once per process)"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return f.read()
+            return get_prompt_registry().load_file(filepath)
         except Exception as e:
             self.logger.warning(f"Failed to load prompt file {filepath}: {e}")
             return "你是智能家居设备控制系统，处理设备操作请求。"
 
-    def _load_device_specifications(self) -> Dict[str, Any]:
-        """Load device specifications from config file"""
-        try:
-            with open('config/device_specifications.json', 'r', encoding='utf-8') as f:
-                specs = json.load(f)
-                self.logger.info(f"Loaded device specifications: {len(specs.get('devices', {}))} device types")
-                return specs
-        except Exception as e:
-            self.logger.warning(f"Failed to load device specifications: {e}")
-            return {"devices": {}, "command_output_format": {}}
-    
     def _load_familiarity_requirements(self) -> Dict[str, Any]:
         """Load familiarity requirements from config file"""
         try:
@@ -99,19 +133,8 @@ class DeviceController:
             }
     
     def _get_device_spec(self, device_type: str) -> Optional[Dict[str, Any]]:
-        """Get device specification by device type"""
-        devices = self.device_specs.get("devices", {})
-        
-        # Try direct match first
-        if device_type in devices:
-            return devices[device_type]
-        
-        # Try to match by device_type_id
-        for device_name, spec in devices.items():
-            if spec.get("device_type_id") == device_type:
-                return spec
-        
-        return None
+        """Get device specification by device type (name or device_type_id)"""
+        return self.spec_index.get(device_type)
     
     @observe(as_type="generation", name="device_controller")
     async def process_device_intent(
@@ -121,28 +144,18 @@ class DeviceController:
     ) -> Dict[str, Any]:
         """Process device intent using LLM with full context"""
         
-        # Get all available devices for context
-        all_devices = self._get_device_context()
-        
-        # Build comprehensive prompt with context
-        device_prompt = self._build_device_prompt(
-            intent=intent,
-            context=context,
-            devices=all_devices
-        )
-        
         try:
-            # Use LLM to understand and process the request
-            messages = [{"role": "user", "content": device_prompt}]
-            
-            response_text = await self.llm_client.generate(
-                system_prompt=self.system_prompt,
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.3
-            )
+            # Fast path: rule-recognized commands need no LLM round trip
+            fast_command = intent.get("device_command") if intent.get("fast_path") else None
+            if fast_command is None:
+                fast_match = await recognize_fast_intent(self.config, context.user_input)
+                if fast_match:
+                    fast_command = fast_match.to_device_command()
             
-            result = self._parse_json_response(response_text)
+            if fast_command is not None:
+                result = dict(fast_command)
+            else:
+                result = await self._resolve_device_command(intent, context)
             
             # Execute the action if it's a control command
             if result.get("action_type") == "control":
@@ -179,17 +192,55 @@ class DeviceController:
                 "message": "设备控制处理失败"
             }
     
+    async def _resolve_device_command(
+        self,
+        intent: Dict[str, Any],
+        context: SystemContext
+    ) -> Dict[str, Any]:
+        """Ask the LLM to turn an intent into a concrete device command"""
+        # Cached catalog: device lines are rendered once per device version,
+        # then only the most relevant ones that fit the token budget are sent
+        device_context = (await self.device_catalog.snapshot_async()).select_context(
+            user_input=context.user_input,
+            intent=intent,
+            recent_device_ids=[(context.last_device_action or {}).get("device")],
+            token_budget=getattr(self.config.system, "device_context_token_budget", 1500),
+            max_devices=getattr(self.config.system, "device_context_max_devices", 50)
+        )
+        self.logger.debug(
+            f"Device context: {len(device_context.device_ids)} devices, "
+            f"~{device_context.tokens} tokens, {device_context.omitted} omitted"
+        )
+        
+        # Build comprehensive prompt with context
+        device_prompt = self._build_device_prompt(
+            intent=intent,
+            context=context,
+            devices_context=device_context.text
+        )
+        
+        # Use LLM to understand and process the request
+        messages = [{"role": "user", "content": device_prompt}]
+        
+        response_text = await self.llm_client.generate(
+            system_prompt=self.system_prompt,
+            messages=messages,
+            max_tokens=1000,
+            temperature=0.3
+        )
+        
+        return self._parse_json_response(response_text)
+    
     def _build_device_prompt(
         self,
         intent: Dict[str, Any],
         context: SystemContext,
-        devices: Dict[str, Any]
+        devices_context: str
     ) -> str:
-        """Build comprehensive prompt for device control"""
+        """Build the per-request part of the device prompt (instructions live in the system prompt)"""
         
         # Get conversation history
-        max_turns = self.config.system.max_conversation_turns
-        conv_history = context.get_conversation_context_for_llm(max_turns=max_turns)
+        conv_history = context.get_conversation_context_for_llm(**history_limits(self.config))
         
         # Get current device states
         device_states = context.get_device_context_for_llm()
@@ -207,91 +258,22 @@ class DeviceController:
 
 {device_states}
 
-可用设备列表:
-{json.dumps(devices, ensure_ascii=False, indent=2)}
+可用设备列表 (每行一个设备，按相关度排序):
+{devices_context}
 
 上次设备操作:
 {json.dumps(context.last_device_action, ensure_ascii=False) if context.last_device_action else "无"}
 
 用户熟悉度: {context.familiarity_score}/100
 
-任务说明:
-1. 如果意图涉及设备控制(involves_hardware=true)，确定具体设备和操作
-2. 如果有指代词(它、那个等)，从上下文推断具体设备
-3. 如果是状态查询，返回相关设备的当前状态
-4. 理解隐含意图，如"好热"可能意味着要开空调或调低温度
-5. 考虑用户熟悉度，熟悉度低时操作需要更保守
-
-返回JSON格式:
-{{
-    "action_type": "control/query/none",  // 操作类型
-    "device_id": "具体设备ID",  // 目标设备
-    "device_name": "设备名称",
-    "command": "具体命令",  // 如turn_on, turn_off, set_brightness, set_hue, set_saturation, set_color, set_position, open_curtain, close_curtain等
-    "parameters": {{  // 命令参数
-        "brightness": number,  // 亮度 0-100
-        "hue": number,  // 色值 0-360 (红0/橙30/黄60/绿120/青180/蓝240/紫270/品红300/紫红330)
-        "saturation": number,  // 饱和度 0-100
-        "temperature": number,  // 温度 16-30
-        "volume": number,  // 音量 0-100
-        "targetPosition": number,  // 窗帘位置 0-100 (0=关闭, 100=完全打开)
-        "position": number  // 通用位置参数
-    }},
-    "query_devices": ["device_id1", "device_id2"],  // 查询的设备列表
-    "reasoning": "决策理由",  // 解释为什么这样操作
-    "confidence": 0.0-1.0,  // 置信度
-    "message": "给用户的反馈消息",
-    "requires_confirmation": boolean  // 是否需要用户确认
-}}
-
-只返回JSON，不要其他文字。
+按系统提示中的任务说明处理，只返回JSON。
 """
         
         return prompt
     
     def _get_device_context(self) -> Dict[str, Any]:
-        """Get all device information for context"""
-        devices = self.db_service.get_all_devices(active_only=True)
-        device_context = {}
-        
-        for device in devices:
-            # Get device spec from configuration
-            device_spec = self._get_device_spec(device.device_type)
-            
-            # Build capabilities based on spec
-            capabilities = {}
-            if device_spec:
-                parameters = device_spec.get("parameters", {})
-                capabilities = {
-                    "can_dim": "brightness" in parameters,
-                    "has_temperature": "temperature" in parameters,
-                    "has_volume": "volume" in parameters,
-                    "has_color": "hue" in parameters and "saturation" in parameters,
-                    "has_position": "targetPosition" in parameters,
-                    "supported_commands": device_spec.get("supported_commands", []),
-                    "category": device_spec.get("category", "unknown")
-                }
-            else:
-                # Fallback for devices without spec
-                capabilities = {
-                    "can_dim": device.device_type in ["light", "dimmable_light", "57D56F4D-3302-41F7-AB34-5365AA180E81"],
-                    "has_temperature": device.device_type == "air_conditioner",
-                    "has_volume": device.device_type == "speaker",
-                    "has_color": device.device_type in ["dimmable_light", "57D56F4D-3302-41F7-AB34-5365AA180E81"],
-                    "has_position": device.device_type in ["curtain", "2FB9EE1F-1C21-4D0B-9383-9B65F64DBF0E"]
-                }
-            
-            device_context[device.id] = {
-                "name": device.name,
-                "type": device.device_type,
-                "room": device.room,
-                "current_state": device.current_state,
-                "supported_actions": device.supported_actions,
-                "capabilities": capabilities,
-                "spec": device_spec  # Include full spec for reference
-            }
-        
-        return device_context
+        """Get all device information for context (cached; read-only)"""
+        return self.device_catalog.snapshot().devices
     
     def _parse_json_response(self, response_text: str) -> Dict[str, Any]:
         """Parse JSON from LLM response"""
@@ -329,7 +311,7 @@ class DeviceController:
             }
         
         # Get device from database
-        db_device = self.db_service.get_device(device_id)
+        db_device = await self.async_db.get_device(device_id)
         if not db_device:
             return {
                 "success": False,
@@ -415,18 +397,20 @@ class DeviceController:
                     new_state[key] = value
             
             # Save to database
-            self.db_service.update_device_state(device_id, new_state)
+            await self.async_db.update_device_state(device_id, new_state)
             
-            # Log the interaction
-            self.db_service.log_device_interaction(
-                user_id=context.session_id,
-                device_id=device_id,
-                action=command,
-                parameters=parameters,
-                result={"new_state": new_state},
-                success=True,
-                conversation_id=context.session_id
-            )
+            # Log the interaction (users.id is a foreign key: anonymous turns are not logged)
+            if context and context.user_id:
+                await self.async_db.queue_write(
+                    "device_interaction",
+                    user_id=context.user_id,
+                    device_id=device_id,
+                    action=command,
+                    parameters=parameters,
+                    result={"new_state": new_state},
+                    success=True,
+                    conversation_id=context.session_id
+                )
             
             # Build standard device control JSON output
             control_output = {
@@ -436,7 +420,7 @@ class DeviceController:
                 "command": command,
                 "parameters": new_state,  # All current parameters
                 "timestamp": datetime.now().isoformat(),
-                "user_id": context.session_id if context else None,
+                "user_id": (context.user_id or None) if context else None,
                 "familiarity_score": context.familiarity_score if context else None
             }
             
@@ -454,16 +438,18 @@ class DeviceController:
             self.logger.error(f"Execute control error: {e}")
             
             # Log failed interaction
-            self.db_service.log_device_interaction(
-                user_id=context.session_id,
-                device_id=device_id,
-                action=command,
-                parameters=parameters,
-                result={"error": str(e)},
-                success=False,
-                conversation_id=context.session_id,
-                error_message=str(e)
-            )
+            if context and context.user_id:
+                await self.async_db.queue_write(
+                    "device_interaction",
+                    user_id=context.user_id,
+                    device_id=device_id,
+                    action=command,
+                    parameters=parameters,
+                    result={"error": str(e)},
+                    success=False,
+                    conversation_id=context.session_id,
+                    error_message=str(e)
+                )
             
             return {
                 "success": False,
@@ -481,12 +467,12 @@ class DeviceController:
         
         if not query_devices:
             # Query all devices if none specified
-            devices = self.db_service.get_all_devices(active_only=True)
+            devices = await self.async_db.get_all_devices(active_only=True)
             query_devices = [d.id for d in devices]
         
         status_info = {}
         for device_id in query_devices:
-            db_device = self.db_service.get_device(device_id)
+            db_device = await self.async_db.get_device(device_id)
             if db_device:
                 status_info[device_id] = {
                     "name": db_device.name,
@@ -647,7 +633,7 @@ class DeviceController:
         """Check if user has sufficient familiarity for device control"""
         
         # Get device info
-        db_device = self.db_service.get_device(device_id)
+        db_device = await self.async_db.get_device(device_id)
         if not db_device:
             return {
                 "allowed": False,
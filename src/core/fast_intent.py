@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Fast-Path Intent Recognizer
+Rule-based recognition of simple device commands ("打开客厅灯", "关窗帘", "音量调到30")
+matched against the shared device catalog, so the most frequent requests can
+skip the LLM entirely
+"""
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.config import Config
+from .device_catalog import (
+    CATEGORY_KEYWORDS, DeviceCatalog, DeviceCatalogSnapshot, DeviceContextEntry, get_shared_device_catalog
+)
+
+
+# Parameter keyword → (parameter name, set command, categories it implies)
+PARAMETER_KEYWORDS = [
+    ("亮度", "brightness", "set_brightness", ["lights"]),
+    ("音量", "volume", "set_volume", ["speaker", "tv"]),
+    ("声音", "volume", "set_volume", ["speaker", "tv"]),
+    ("温度", "temperature", "set_temperature", ["air_conditioner"]),
+    ("位置", "targetPosition", "set_position", ["curtains"]),
+]
+
+# Default parameter for "调到N" when no keyword names one
+DEFAULT_SET_PARAMETER = {
+    "lights": ("brightness", "set_brightness"),
+    "speaker": ("volume", "set_volume"),
+    "tv": ("volume", "set_volume"),
+    "air_conditioner": ("temperature", "set_temperature"),
+    "curtains": ("targetPosition", "set_position"),
+}
+
+PARAMETER_RANGES = {
+    "brightness": (0, 100),
+    "volume": (0, 100),
+    "targetPosition": (0, 100),
+    "temperature": (16, 30),
+}
+
+ON_VERBS = ["打开", "开启", "拉开", "开"]
+OFF_VERBS = ["关闭", "关掉", "关上", "拉上", "合上", "关"]
+SET_VERBS = ["设置为", "设置成", "调整到", "调节到", "调到", "调成", "调为", "调至", "设为", "设成", "开到", "到"]
+
+# Words that carry no meaning for the command itself
+FILLER_PATTERN = re.compile(r'请|帮我|帮忙|麻烦|给我|把|将|的|一下|一点|吧|呀|啊|啦|了|嘛|哦|呢|好吗|可以吗|谢谢|%|度')
+PUNCTUATION_PATTERN = re.compile(r'[\s，。！？、,.!?~…：:；;"\'“”]+')
+NUMBER_PATTERN = re.compile(r'(\d{1,3})')
+REFERENCE_WORDS = ("它", "那个", "这个", "刚才")
+
+
+@dataclass
+class FastIntentMatch:
+    """A device command recognized without the LLM"""
+    device_id: str
+    device_name: str
+    category: str
+    command: str
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    confidence: float = 0.0
+    matched_by: str = ""
+
+    def to_device_command(self) -> Dict[str, Any]:
+        """Same shape as the DeviceController LLM result"""
+        return {
+            "action_type": "control",
+            "device_id": self.device_id,
+            "device_name": self.device_name,
+            "command": self.command,
+            "parameters": dict(self.parameters),
+            "confidence": self.confidence,
+            "reasoning": f"fast-path rule match ({self.matched_by})",
+            "requires_confirmation": False
+        }
+
+    def to_intent(self) -> Dict[str, Any]:
+        """Same shape as the IntentAnalyzer / UnifiedResponder intent, plus the device command"""
+        return {
+            "involves_hardware": True,
+            "device": self.category,
+            "action": self.command,
+            "parameters": dict(self.parameters),
+            "confidence": self.confidence,
+            "fast_path": True,
+            "device_command": self.to_device_command()
+        }
+
+
+@dataclass
+class _DeviceEntry:
+    device_id: str
+    name: str  # lowercased for matching
+    display_name: str
+    category: Optional[str]
+    room_aliases: List[str]
+    commands: List[str]
+
+
+class FastIntentRecognizer:
+    """Recognizes simple single-device commands with rules instead of an LLM call
+
+    Devices come from the shared DeviceCatalog, so the fast path and the
+    device controller see the same version-invalidated snapshot.
+    """
+
+    def __init__(self, catalog: DeviceCatalog):
+        self.catalog = catalog
+        self.logger = logging.getLogger(__name__)
+        # Match entries and the catalog snapshot they were built from
+        self._entries: Tuple[Optional[DeviceCatalogSnapshot], List[_DeviceEntry]] = (None, [])
+
+    # Device snapshot ------------------------------------------------------
+
+    @staticmethod
+    def _build_entry(context_entry: DeviceContextEntry, info: Dict[str, Any]) -> _DeviceEntry:
+        commands = list(info["supported_actions"] or []) + list(info["capabilities"].get("supported_commands", []))
+        return _DeviceEntry(
+            device_id=context_entry.device_id,
+            name=context_entry.name,
+            display_name=info["name"] or context_entry.device_id,
+            category=context_entry.category,
+            room_aliases=list(context_entry.room_terms),
+            commands=commands
+        )
+
+    def _entries_for(self, snapshot: DeviceCatalogSnapshot) -> List[_DeviceEntry]:
+        """Match entries for a catalog snapshot (built once per snapshot)"""
+        built_for, entries = self._entries
+        if built_for is not snapshot:
+            entries = [self._build_entry(entry, snapshot.devices[entry.device_id]) for entry in snapshot.entries]
+            self._entries = (snapshot, entries)
+        return entries
+
+    def _get_devices(self) -> List[_DeviceEntry]:
+        try:
+            return self._entries_for(self.catalog.snapshot())
+        except Exception as e:
+            self.logger.warning(f"Fast intent device refresh failed: {e}")
+            return self._entries[1]
+
+    # Recognition ------------------------------------------------------------
+
+    @staticmethod
+    def _take(text: str, words: List[str]) -> Tuple[Optional[str], str]:
+        """Remove the first (longest-listed-first) word found in text"""
+        for word in words:
+            if word and word in text:
+                return word, text.replace(word, " ", 1)
+        return None, text
+
+    async def recognize_async(self, user_input: str) -> Optional[FastIntentMatch]:
+        """recognize() for the request path: the catalog reloads without blocking the loop"""
+        try:
+            devices = self._entries_for(await self.catalog.snapshot_async())
+        except Exception as e:
+            self.logger.warning(f"Fast intent device refresh failed: {e}")
+            devices = self._entries[1]
+        return self._match(user_input, devices)
+
+    def recognize(self, user_input: str) -> Optional[FastIntentMatch]:
+        """Return a match for a simple device command, or None to defer to the LLM"""
+        return self._match(user_input, self._get_devices())
+
+    def _match(self, user_input: str, devices: List[_DeviceEntry]) -> Optional[FastIntentMatch]:
+        text = PUNCTUATION_PATTERN.sub("", (user_input or "").lower())
+        if not text or len(text) > 24 or any(word in text for word in REFERENCE_WORDS):
+            return None
+        if not devices:
+            return None
+
+        remainder = text
+        candidates: List[_DeviceEntry] = []
+        matched_by = ""
+
+        # 1. Device by name (longest first so "客厅灯" wins over "灯")
+        for entry in sorted(devices, key=lambda d: len(d.name), reverse=True):
+            if entry.name and entry.name in remainder:
+                candidates = [entry]
+                remainder = remainder.replace(entry.name, " ", 1)
+                matched_by = "name"
+                break
+
+        # 2. Room / device type keywords
+        room = None
+        category = None
+        if not candidates:
+            for entry in devices:
+                found, rest = self._take(remainder, entry.room_aliases)
+                if found:
+                    room, remainder = found, rest
+                    break
+            for cat, keywords in CATEGORY_KEYWORDS.items():
+                found, rest = self._take(remainder, keywords)
+                if found:
+                    category, remainder = cat, rest
+                    break
+
+        # 3. Parameter keyword and value
+        param_name = set_command = None
+        implied_categories: List[str] = []
+        for keyword, name, command, cats in PARAMETER_KEYWORDS:
+            if keyword in remainder:
+                remainder = remainder.replace(keyword, " ", 1)
+                param_name, set_command, implied_categories = name, command, cats
+                break
+        number_match = NUMBER_PATTERN.search(remainder)
+        value = int(number_match.group(1)) if number_match else None
+        if number_match:
+            remainder = remainder[:number_match.start()] + " " + remainder[number_match.end():]
+
+        if not candidates:
+            # An explicit type keyword wins; otherwise the parameter implies the
+            # type, preferring the first listed category that has a device
+            # (e.g. "音量" → speaker before tv)
+            categories = [category] if category else implied_categories
+            for cat in categories:
+                candidates = [
+                    entry for entry in devices
+                    if entry.category == cat and (room is None or room in entry.room_aliases)
+                ]
+                if candidates:
+                    break
+            if not candidates:
+                return None
+            if category:
+                matched_by = "room+type" if room else "type"
+            else:
+                matched_by = "parameter"
+
+        target = candidates[0]
+        if not target.category:
+            return None
+
+        # 4. Verb → command
+        if value is not None:
+            verb, remainder = self._take(remainder, SET_VERBS)
+            if not param_name:
+                param_name, set_command = DEFAULT_SET_PARAMETER.get(target.category, (None, None))
+            if not param_name:
+                return None
+            low, high = PARAMETER_RANGES.get(param_name, (0, 100))
+            if not low <= value <= high:
+                return None
+            command = set_command
+            parameters = {param_name: value}
+        else:
+            verb, remainder = self._take(remainder, OFF_VERBS)
+            if verb:
+                command = "close_curtain" if target.category == "curtains" else "turn_off"
+            else:
+                verb, remainder = self._take(remainder, ON_VERBS)
+                if not verb:
+                    return None
+                command = "open_curtain" if target.category == "curtains" else "turn_on"
+            parameters = {}
+
+        if target.commands and command not in target.commands:
+            # Curtains that only expose set_position
+            if command in ("open_curtain", "close_curtain") and "set_position" in target.commands:
+                parameters = {"targetPosition": 100 if command == "open_curtain" else 0}
+                command = "set_position"
+            else:
+                return None
+
+        # 5. Confidence: unique target and nothing left unexplained
+        confidence = {"name": 0.97, "room+type": 0.95, "type": 0.92, "parameter": 0.9}.get(matched_by, 0.9)
+        if len(candidates) > 1:
+            confidence = 0.5
+        leftover = FILLER_PATTERN.sub("", remainder).strip()
+        if leftover:
+            confidence *= 0.6
+
+        return FastIntentMatch(
+            device_id=target.device_id,
+            device_name=target.display_name,
+            category=target.category,
+            command=command,
+            parameters=parameters,
+            confidence=round(confidence, 3),
+            matched_by=matched_by
+        )
+
+
+def render_fast_reply(
+    match: FastIntentMatch,
+    familiarity_score: int,
+    allowed: bool,
+    succeeded: bool = True
+) -> str:
+    """In-character reply for a fast-path command, without an LLM call
+
+    Render it after the command ran: ``succeeded`` picks the failure template.
+    """
+    if not allowed:
+        if familiarity_score < 30:
+            return "......不行。"
+        return "......现在还不行。"
+    if not succeeded:
+        if familiarity_score < 60:
+            return "......没成功。"
+        return f"......{match.device_name}没有反应。没弄好。"
+    if familiarity_score < 60:
+        return "......好。"
+    done = {
+        "turn_on": "打开了",
+        "turn_off": "关掉了",
+        "open_curtain": "拉开了",
+        "close_curtain": "拉上了",
+    }.get(match.command, "调好了")
+    return f"......嗯。{match.device_name}，{done}。"
+
+
+# One recognizer per database, on the shared device catalog
+_RECOGNIZERS: Dict[str, FastIntentRecognizer] = {}
+_RECOGNIZERS_LOCK = threading.Lock()
+
+
+def get_fast_intent_recognizer(config: Config) -> FastIntentRecognizer:
+    """Return the process-wide recognizer for this config's database"""
+    key = config.database.url
+    with _RECOGNIZERS_LOCK:
+        recognizer = _RECOGNIZERS.get(key)
+        if recognizer is None:
+            recognizer = _RECOGNIZERS[key] = FastIntentRecognizer(get_shared_device_catalog(config))
+        return recognizer
+
+
+async def recognize_fast_intent(config: Config, user_input: str) -> Optional[FastIntentMatch]:
+    """Confident fast-path match for user_input, or None when disabled/unsure"""
+    system = config.system
+    if not getattr(system, "fast_intent_enabled", False):
+        return None
+    try:
+        match = await get_fast_intent_recognizer(config).recognize_async(user_input)
+    except Exception as e:
+        logging.getLogger(__name__).debug(f"Fast intent recognition unavailable: {e}")
+        return None
+    if match and match.confidence >= getattr(system, "fast_intent_min_confidence", 0.9):
+        return match
+    return None
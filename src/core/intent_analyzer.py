@@ -22,7 +22,9 @@ except ImportError:
 
 from ..utils.config import Config
 from ..utils.llm_client import create_llm_client
-from .context_manager import SystemContext
+from ..utils.prompt_registry import get_prompt_registry
+from .context_manager import SystemContext, history_limits
+from .fast_intent import recognize_fast_intent
 
 
 class IntentAnalyzer:
@@ -37,10 +39,9 @@ class IntentAnalyzer:
         self.system_prompt = self._load_prompt_file('prompts/intent_analyzer.txt')
     
     def _load_prompt_file(self, filepath: str) -> str:
-        """Load prompt from file"""
+        """Load prompt from file (read once per process)"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return f.read()
+            return get_prompt_registry().load_file(filepath)
         except Exception as e:
             self.logger.warning(f"Failed to load prompt file {filepath}: {e}")
             return "你是一个智能意图分析系统，理解用户输入并返回JSON格式结果。"
@@ -53,9 +54,16 @@ class IntentAnalyzer:
     ) -> Dict[str, Any]:
         """Analyze user intent using LLM with optimized context"""
 
+        # Fast path: simple device commands are recognized by rules, no LLM call
+        fast_match = await recognize_fast_intent(self.config, user_input)
+        if fast_match:
+            intent_json = fast_match.to_intent()
+            context.add_intent(intent_json)
+            self.logger.debug(f"Fast-path intent: {fast_match.device_id} -> {fast_match.command}")
+            return intent_json
+
         # Include recent conversation for context
-        max_turns = self.config.system.max_conversation_turns
-        conversation_context = context.get_conversation_context_for_llm(max_turns=max_turns)
+        conversation_context = context.get_conversation_context_for_llm(**history_limits(self.config))
 
         # Enhanced prompt with better context understanding
         analysis_prompt = f"""
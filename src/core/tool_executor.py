@@ -25,6 +25,7 @@ from .intent_analyzer import IntentAnalyzer
 from .device_controller import DeviceController
 from ..services.agora_tts_service import AgoraTTSService
 from ..services.database_service import DatabaseService
+from ..utils.audio_handle import AudioHandle
 
 
 class ToolExecutor:
@@ -142,22 +143,43 @@ class ToolExecutor:
             voice_choice = voice or self.tts_default_voice
             resolved_voice = self.agora_tts._resolve_voice(voice_choice)  # noqa: SLF001 - using service helper
 
-            # Call TTS service
-            audio_base64 = await self.agora_tts.text_to_speech(
-                text,
-                voice=resolved_voice,
-                audio_format=self.tts_format
-            )
+            # Audio travels as a handle (cached file or raw bytes); base64 is
+            # only produced later if a client asks for inline audio
+            extension = self.agora_tts._file_extension(self.agora_tts._output_format(self.tts_format))  # noqa: SLF001
+            audio_handle = None
+            cache_hit = None
+            if self.agora_tts.audio_cache:
+                cached_audio = await self.agora_tts.synthesize_to_cache(
+                    text,
+                    voice=resolved_voice,
+                    audio_format=self.tts_format
+                )
+                if cached_audio:
+                    audio_handle = AudioHandle.from_file(cached_audio.path, cached_audio.url, extension)
+                    cache_hit = cached_audio.cache_hit
+            else:
+                # Call TTS service
+                audio_bytes = await self.agora_tts.synthesize_speech(
+                    text,
+                    voice=resolved_voice,
+                    audio_format=self.tts_format
+                )
+                if audio_bytes:
+                    audio_handle = AudioHandle.from_bytes(audio_bytes, extension)
 
-            if audio_base64:
+            if audio_handle:
                 result = {
                     "success": True,
-                    "audio_data": audio_base64,
+                    "audio_data": audio_handle,
+                    "audio_path": audio_handle.path,
+                    "audio_url": audio_handle.url,
                     "text": text,
                     "voice": resolved_voice,
-                    "format": f"base64_{self.tts_format or 'mp3'}",
+                    "format": extension,
                     "timestamp": datetime.now().isoformat()
                 }
+                if cache_hit is not None:
+                    result["cache_hit"] = cache_hit
             else:
                 result = {
                     "success": False,
@@ -167,7 +189,10 @@ class ToolExecutor:
                     "timestamp": datetime.now().isoformat()
                 }
 
-            self.logger.info(f"{provider_label} TTS result: {'success' if result['success'] else 'failed'}")
+            self.logger.info(
+                f"{provider_label} TTS result: {'success' if result['success'] else 'failed'}"
+                f"{' (cache hit)' if result.get('cache_hit') else ''}"
+            )
             return result
 
         except Exception as e:
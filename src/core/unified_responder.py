@@ -8,7 +8,7 @@ import asyncio
 import json
 import logging
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 
 try:
     from langfuse import observe
@@ -22,7 +22,44 @@ except ImportError:
 
 from ..utils.config import Config
 from ..utils.llm_client import create_llm_client
-from .context_manager import SystemContext
+from ..utils.prompt_registry import get_prompt_registry
+from ..utils.incremental_json import IncrementalJSONParser, DELTA, VALUE
+from .context_manager import SystemContext, history_limits
+
+
+# Static part of the unified system prompt, appended to prompts/character.txt
+UNIFIED_RESPONSE_RULES = """
+
+重要提醒：
+1. 你的回应态度和是否执行设备控制完全取决于熟悉度分数
+2. 低熟悉度(<30): 对陌生人保持距离，拒绝大部分设备控制
+3. 中等熟悉度(30-60): 对认识的人选择性执行基础请求
+4. 高熟悉度(>60): 对信任的人愿意执行大部分合理请求
+
+输出格式要求：
+你需要返回JSON格式，包含两部分：
+1. intent: 意图分析结果
+2. response: 你的角色回复
+
+JSON格式:
+{
+    "intent": {
+        "involves_hardware": true/false,
+        "device": "lights/tv/air_conditioner/speaker/curtains/null",
+        "action": "turn_on/turn_off/set_brightness/etc/null",
+        "parameters": {},
+        "confidence": 0.0-1.0,
+        "familiarity_check": "passed"/"insufficient"/"not_required"
+    },
+    "response": "你以凌波丽身份的回复文本"
+}
+
+关键规则：
+- 如果用户请求设备控制，根据熟悉度决定是否执行
+- 熟悉度不足时，在response中礼貌拒绝，intent.familiarity_check设为"insufficient"
+- 熟悉度充足时，在response中简洁确认，intent.familiarity_check设为"passed"
+- 普通对话时，intent.involves_hardware设为false，intent.familiarity_check设为"not_required"
+"""
 
 
 class UnifiedResponder:
@@ -35,12 +72,14 @@ class UnifiedResponder:
         
         # Load prompts
         self.character_prompt = self._load_prompt_file('prompts/character.txt')
+        self.system_template = get_prompt_registry().template(
+            "unified_responder", lambda: self.character_prompt + UNIFIED_RESPONSE_RULES
+        )
     
     def _load_prompt_file(self, filepath: str) -> str:
-        """Load prompt from file"""
+        """Load prompt from file (read once per process)"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return f.read()
+            return get_prompt_registry().load_file(filepath)
         except Exception as e:
             self.logger.warning(f"Failed to load prompt file {filepath}: {e}")
             return "你是凌波丽，一个简洁内敛的AI助手。"
@@ -63,10 +102,8 @@ class UnifiedResponder:
         
         familiarity_stage = self._get_familiarity_stage(context.familiarity_score)
         
-        # Base character prompt
-        base_prompt = self.character_prompt
-        
-        # Add current context
+        # Static character prompt + rules come first (compiled once, cacheable);
+        # only the current state is formatted per request
         context_info = f"""
 
 当前状态：
@@ -74,39 +111,9 @@ class UnifiedResponder:
 - 熟悉度分数: {context.familiarity_score}/100 (这决定了你是否愿意执行设备控制)
 - 对话氛围: {context.conversation_tone}
 {f"- 环境状态: {device_states}" if device_states else ""}
-
-重要提醒：
-1. 你的回应态度和是否执行设备控制完全取决于熟悉度分数
-2. 低熟悉度(<30): 对陌生人保持距离，拒绝大部分设备控制
-3. 中等熟悉度(30-60): 对认识的人选择性执行基础请求
-4. 高熟悉度(>60): 对信任的人愿意执行大部分合理请求
-
-输出格式要求：
-你需要返回JSON格式，包含两部分：
-1. intent: 意图分析结果
-2. response: 你的角色回复
-
-JSON格式:
-{{
-    "intent": {{
-        "involves_hardware": true/false,
-        "device": "lights/tv/air_conditioner/speaker/curtains/null",
-        "action": "turn_on/turn_off/set_brightness/etc/null",
-        "parameters": {{}},
-        "confidence": 0.0-1.0,
-        "familiarity_check": "passed"/"insufficient"/"not_required"
-    }},
-    "response": "你以凌波丽身份的回复文本"
-}}
-
-关键规则：
-- 如果用户请求设备控制，根据熟悉度决定是否执行
-- 熟悉度不足时，在response中礼貌拒绝，intent.familiarity_check设为"insufficient"
-- 熟悉度充足时，在response中简洁确认，intent.familiarity_check设为"passed"
-- 普通对话时，intent.involves_hardware设为false，intent.familiarity_check设为"not_required"
 """
         
-        return base_prompt + context_info
+        return self.system_template.render(context_info)
     
     def _build_user_prompt(
         self,
@@ -116,8 +123,7 @@ JSON格式:
         """Build user prompt with conversation context"""
         
         # Get recent conversation
-        max_turns = self.config.system.max_conversation_turns
-        conversation_context = context.get_conversation_context_for_llm(max_turns=max_turns)
+        conversation_context = context.get_conversation_context_for_llm(**history_limits(self.config))
         
         prompt_parts = []
         
@@ -160,19 +166,7 @@ JSON格式:
         """
         
         try:
-            # Get device context
-            device_states = context.get_device_context_for_llm()
-            
-            # Build prompts
-            system_prompt = self._build_unified_system_prompt(context, device_states)
-            user_prompt = self._build_user_prompt(user_input, context)
-            
-            # Single LLM call with full conversation history
-            history_messages = context.get_conversation_messages_for_llm(
-                max_turns=self.config.system.max_conversation_turns
-            )
-            # Append current turn user message at the end
-            messages = history_messages + [{"role": "user", "content": user_prompt}]
+            system_prompt, messages = self._build_llm_request(user_input, context)
             
             self.logger.info(f"🚀 Unified processing (1 API call) - Familiarity: {context.familiarity_score}/100")
             
@@ -183,70 +177,139 @@ JSON格式:
                 temperature=0.4  # Balanced for both analysis and creativity
             )
             
-            # Parse JSON response
-            try:
-                # Extract JSON from response
-                if response_text.startswith('{') and response_text.endswith('}'):
-                    result = json.loads(response_text)
-                else:
-                    # Find JSON block
-                    json_match = re.search(r'\{[\s\S]*\}', response_text, re.DOTALL)
-                    if json_match:
-                        json_text = json_match.group()
-                        # Clean up common JSON issues
-                        json_text = re.sub(r',(\s*[}\]])', r'\1', json_text)
-                        result = json.loads(json_text)
-                    else:
-                        raise ValueError("No valid JSON found in response")
-                
-                # Validate result structure
-                if "intent" not in result or "response" not in result:
-                    raise ValueError("Missing required fields: intent or response")
-                
-                # Add intent to context
-                context.add_intent(result["intent"])
-                
-                # Log success
-                self.logger.info(f"✅ Unified response generated - Hardware: {result['intent'].get('involves_hardware')}, Familiarity: {result['intent'].get('familiarity_check')}")
-                
-                return {
-                    "intent": result["intent"],
-                    "response": result["response"],
-                    "success": True
-                }
-                
-            except (json.JSONDecodeError, ValueError) as e:
-                self.logger.error(f"JSON parsing failed: {e}, response: {response_text}")
-                
-                # Fallback: try to extract intent and response separately
-                intent = self._extract_intent_fallback(response_text, context)
-                response = self._extract_response_fallback(response_text, context)
-                
-                return {
-                    "intent": intent,
-                    "response": response,
-                    "success": True,
-                    "warning": "Used fallback parsing"
-                }
+            return self._parse_unified_response(response_text, context)
         
         except Exception as e:
             self.logger.error(f"Unified responder error: {e}")
+            return self._error_result(e, context)
+    
+    async def stream_and_respond(
+        self,
+        user_input: str,
+        context: SystemContext
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_and_respond.
+        The output is parsed incrementally, so callers see:
+          {"type": "intent", "intent": {...}} as soon as the intent object closes
+          {"type": "token", "text": ...} for each piece of the character reply
+          {"type": "result", ...} last, with the same fields process_and_respond returns
+        """
+        response_text = ""
+        try:
+            system_prompt, messages = self._build_llm_request(user_input, context)
+            
+            self.logger.info(f"🚀 Unified streaming (1 API call) - Familiarity: {context.familiarity_score}/100")
+            
+            parser = IncrementalJSONParser()
+            chunks = []
+            async for chunk in self.llm_client.generate_stream(
+                system_prompt=system_prompt,
+                messages=messages,
+                max_tokens=self.config.gemini.max_tokens,
+                temperature=0.4
+            ):
+                chunks.append(chunk)
+                for kind, key, value in parser.feed(chunk):
+                    if key == "response" and kind == DELTA:
+                        yield {"type": "token", "text": value}
+                    elif key == "intent" and kind == VALUE and isinstance(value, dict):
+                        yield {"type": "intent", "intent": value}
+            response_text = ''.join(chunks)
+            
+            result = self._parse_unified_response(response_text, context)
+        except Exception as e:
+            self.logger.error(f"Unified responder streaming error: {e}")
+            result = self._error_result(e, context)
+        
+        yield {"type": "result", **result}
+    
+    def _error_result(self, error: Exception, context: SystemContext) -> Dict[str, Any]:
+        """Result dict for a failed unified call, with an in-character reply"""
+        error_response = self._get_error_response(error, context)
+        
+        return {
+            "intent": {
+                "involves_hardware": False,
+                "device": None,
+                "action": None,
+                "parameters": {},
+                "confidence": 0.0,
+                "familiarity_check": "not_required"
+            },
+            "response": error_response,
+            "success": False,
+            "error": str(error)
+        }
+    
+    def _build_llm_request(
+        self,
+        user_input: str,
+        context: SystemContext
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """Build the system prompt and message list for the unified call"""
+        # Get device context
+        device_states = context.get_device_context_for_llm()
+        
+        # Build prompts
+        system_prompt = self._build_unified_system_prompt(context, device_states)
+        user_prompt = self._build_user_prompt(user_input, context)
+        
+        # Single LLM call with full conversation history
+        history_messages = context.get_conversation_messages_for_llm(**history_limits(self.config))
+        # Append current turn user message at the end
+        messages = history_messages + [{"role": "user", "content": user_prompt}]
+        return system_prompt, messages
+    
+    def _parse_unified_response(
+        self,
+        response_text: str,
+        context: SystemContext
+    ) -> Dict[str, Any]:
+        """Parse the model's JSON output into intent/response, with fallback extraction"""
+        try:
+            # Extract JSON from response
+            if response_text.startswith('{') and response_text.endswith('}'):
+                result = json.loads(response_text)
+            else:
+                # Find JSON block
+                json_match = re.search(r'\{[\s\S]*\}', response_text, re.DOTALL)
+                if json_match:
+                    json_text = json_match.group()
+                    # Clean up common JSON issues
+                    json_text = re.sub(r',(\s*[}\]])', r'\1', json_text)
+                    result = json.loads(json_text)
+                else:
+                    raise ValueError("No valid JSON found in response")
+            
+            # Validate result structure
+            if "intent" not in result or "response" not in result:
+                raise ValueError("Missing required fields: intent or response")
+            
+            # Add intent to context
+            context.add_intent(result["intent"])
+            
+            # Log success
+            self.logger.info(f"✅ Unified response generated - Hardware: {result['intent'].get('involves_hardware')}, Familiarity: {result['intent'].get('familiarity_check')}")
+            
+            return {
+                "intent": result["intent"],
+                "response": result["response"],
+                "success": True
+            }
+            
+        except (json.JSONDecodeError, ValueError) as e:
+            self.logger.error(f"JSON parsing failed: {e}, response: {response_text}")
             
-            # Return error response in character
-            error_response = self._get_error_response(e, context)
+            # Fallback: try to extract intent and response separately
+            intent = self._extract_intent_fallback(response_text, context)
+            response = self._extract_response_fallback(response_text, context)
             
             return {
-                "intent": {
-                    "involves_hardware": False,
-                    "device": None,
-                    "action": None,
-                    "parameters": {},
-                    "confidence": 0.0,
-                    "familiarity_check": "not_required"
-                },
-                "response": error_response,
-                "success": False,
-                "error": str(e)
+                "intent": intent,
+                "response": response,
+                "success": True,
+                "warning": "Used fallback parsing"
             }
     
     def _extract_intent_fallback(
@@ -1,11 +1,17 @@
 """
 Database models for the Smart Home AI Assistant
 """
+import asyncio
+import importlib.util
+import threading
+import time
 import uuid
+import weakref
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 from dataclasses import dataclass, field
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Text, JSON, Boolean, ForeignKey, Float, Index
+from sqlalchemy import create_engine, event, Column, String, Integer, DateTime, Text, JSON, Boolean, ForeignKey, Float, Index
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -199,6 +205,12 @@ class Conversation(Base):
     user = relationship("User", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     
+    # Recent conversations per user; expiry sweep over active conversations
+    __table_args__ = (
+        Index('idx_conversation_user_activity', 'user_id', 'is_active', 'last_activity'),
+        Index('idx_conversation_active_activity', 'is_active', 'last_activity'),
+    )
+    
     @property
     def is_expired(self, timeout_minutes: int = 30) -> bool:
         """Check if conversation has expired"""
@@ -251,6 +263,11 @@ class Message(Base):
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
     
+    # Conversation history: filter by conversation, newest first
+    __table_args__ = (
+        Index('idx_message_conversation_time', 'conversation_id', 'timestamp'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -293,6 +310,12 @@ class UserMemory(Base):
     # Relationships
     user = relationship("User", back_populates="memories")
     
+    # Memory search/preferences: per user (and type), most important first
+    __table_args__ = (
+        Index('idx_user_memory_user_importance', 'user_id', 'importance_score'),
+        Index('idx_user_memory_user_type_importance', 'user_id', 'memory_type', 'importance_score'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -436,6 +459,13 @@ class DeviceInteraction(Base):
     user = relationship("User", back_populates="device_interactions")
     device = relationship("Device", back_populates="interactions")
     
+    # Usage statistics: time window, optionally narrowed to a user or device
+    __table_args__ = (
+        Index('idx_device_interaction_time', 'timestamp'),
+        Index('idx_device_interaction_user_time', 'user_id', 'timestamp'),
+        Index('idx_device_interaction_device_time', 'device_id', 'timestamp'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -449,6 +479,23 @@ class DeviceInteraction(Base):
             'error_message': self.error_message
         }
 
+class DeviceUsageHourly(Base):
+    """Hourly per-device interaction counts (rollup of device_interactions for analytics)"""
+    __tablename__ = 'device_usage_hourly'
+    
+    hour = Column(DateTime, primary_key=True)  # Start of the UTC hour
+    device_id = Column(String, primary_key=True)
+    action = Column(String(100), primary_key=True)
+    
+    count = Column(Integer, default=0, nullable=False)
+    success_count = Column(Integer, default=0, nullable=False)
+    last_used = Column(DateTime)
+    
+    # Per-device dashboards over a time window
+    __table_args__ = (
+        Index('idx_device_usage_device_hour', 'device_id', 'hour'),
+    )
+
 class SystemSettings(Base):
     """System-wide configuration settings"""
     __tablename__ = 'system_settings'
@@ -467,17 +514,119 @@ class SystemSettings(Base):
         }
 
 # Database connection and session management
+@dataclass
+class PoolMetrics:
+    """Cumulative connection pool counters for one engine"""
+    checkouts: int = 0
+    checkins: int = 0
+    connects: int = 0
+    wait_time_total_ms: float = 0.0
+    wait_time_max_ms: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    
+    def record_wait(self, elapsed_ms: float):
+        with self._lock:
+            self.wait_time_total_ms += elapsed_ms
+            self.wait_time_max_ms = max(self.wait_time_max_ms, elapsed_ms)
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+    
+    metrics: Optional[PoolMetrics] = None
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_wait((time.perf_counter() - start) * 1000)
+    
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _is_memory_sqlite(database_url: str) -> bool:
+    """In-memory SQLite uses a per-thread/static pool that takes no size options"""
+    if not database_url.startswith("sqlite"):
+        return False
+    return database_url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in database_url
+
+
 class DatabaseManager:
     """Database connection and session management"""
     
-    def __init__(self, database_url: str):
+    def __init__(self, database_url: str, echo: bool = False, pool_size: int = 5,
+                 max_overflow: int = 10, pool_pre_ping: bool = True):
         self.database_url = database_url
-        self.engine = create_engine(database_url, pool_pre_ping=True)
+        self.metrics = PoolMetrics()
+        self._tables_created = False
+        self._tables_lock = threading.Lock()
+        
+        engine_kwargs: Dict[str, Any] = {"echo": echo, "pool_pre_ping": pool_pre_ping}
+        if not _is_memory_sqlite(database_url):
+            engine_kwargs.update(
+                poolclass=MeteredQueuePool,
+                pool_size=pool_size,
+                max_overflow=max_overflow
+            )
+        self.engine = create_engine(database_url, **engine_kwargs)
+        if isinstance(self.engine.pool, MeteredQueuePool):
+            self.engine.pool.metrics = self.metrics
+        self._register_pool_events()
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
     
+    def _register_pool_events(self):
+        metrics = self.metrics
+        
+        @event.listens_for(self.engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            metrics.connects += 1
+        
+        @event.listens_for(self.engine, "checkout")
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            metrics.checkouts += 1
+        
+        @event.listens_for(self.engine, "checkin")
+        def _on_checkin(dbapi_connection, connection_record):
+            metrics.checkins += 1
+    
+    def pool_status(self) -> Dict[str, Any]:
+        """Current pool occupancy plus cumulative checkout/wait counters"""
+        pool = self.engine.pool
+        status: Dict[str, Any] = {
+            "pool_class": type(pool).__name__,
+            "checkouts": self.metrics.checkouts,
+            "checkins": self.metrics.checkins,
+            "connects": self.metrics.connects,
+            "wait_time_total_ms": round(self.metrics.wait_time_total_ms, 3),
+            "wait_time_max_ms": round(self.metrics.wait_time_max_ms, 3),
+        }
+        if isinstance(pool, QueuePool):
+            status.update(
+                pool_size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(0, pool.overflow()),
+                max_overflow=pool._max_overflow
+            )
+        return status
+    
     def create_tables(self):
         """Create all tables"""
         Base.metadata.create_all(bind=self.engine)
+        self._tables_created = True
+    
+    def ensure_tables(self):
+        """Create tables once per engine rather than once per service instance"""
+        if self._tables_created:
+            return
+        with self._tables_lock:
+            if not self._tables_created:
+                self.create_tables()
     
     def drop_tables(self):
         """Drop all tables (be careful!)"""
@@ -549,3 +698,127 @@ class DatabaseManager:
             print(f"❌ Error initializing default data: {e}")
         finally:
             session.close()
+
+
+# Process-wide engine registry: every DatabaseService against the same URL and
+# pool settings shares one engine, pool and session factory.
+_DATABASE_MANAGERS: Dict[Tuple, DatabaseManager] = {}
+_DATABASE_MANAGERS_LOCK = threading.Lock()
+
+
+def get_shared_database_manager(database_url: str, echo: bool = False, pool_size: int = 5,
+                                max_overflow: int = 10, pool_pre_ping: bool = True) -> DatabaseManager:
+    """Return the shared DatabaseManager for these settings, creating it on first use"""
+    key = (database_url, echo, pool_size, max_overflow, pool_pre_ping)
+    manager = _DATABASE_MANAGERS.get(key)
+    if manager is not None:
+        return manager
+    with _DATABASE_MANAGERS_LOCK:
+        manager = _DATABASE_MANAGERS.get(key)
+        if manager is None:
+            manager = DatabaseManager(
+                database_url,
+                echo=echo,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_pre_ping=pool_pre_ping
+            )
+            _DATABASE_MANAGERS[key] = manager
+        return manager
+
+
+# Async drivers for SQLAlchemy's asyncio extension, by sync URL scheme
+ASYNC_DRIVERS = {
+    "sqlite": ("sqlite+aiosqlite", "aiosqlite"),
+    "postgresql": ("postgresql+asyncpg", "asyncpg"),
+    "postgres": ("postgresql+asyncpg", "asyncpg"),
+}
+
+
+def to_async_url(database_url: str) -> Optional[str]:
+    """
+    Async-driver URL for a sync database URL, or None if unsupported.
+
+    None is also returned when the driver (aiosqlite/asyncpg) or greenlet is
+    not installed, and for in-memory SQLite, whose data lives in the sync
+    engine's connection and would not be visible to a second engine.
+    """
+    scheme, sep, rest = database_url.partition("://")
+    if not sep or _is_memory_sqlite(database_url):
+        return None
+    dialect = scheme.split("+", 1)[0]
+    driver = ASYNC_DRIVERS.get(dialect)
+    if driver is None:
+        return None
+    async_scheme, module = driver
+    if importlib.util.find_spec(module) is None or importlib.util.find_spec("greenlet") is None:
+        return None
+    return f"{async_scheme}://{rest}"
+
+
+class AsyncDatabaseManager:
+    """Async engine and session factory (SQLAlchemy asyncio) for one database URL"""
+    
+    def __init__(self, async_url: str, echo: bool = False, pool_size: int = 5,
+                 max_overflow: int = 10, pool_pre_ping: bool = True):
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        
+        self.database_url = async_url
+        engine_kwargs: Dict[str, Any] = {"echo": echo, "pool_pre_ping": pool_pre_ping}
+        if not async_url.startswith("sqlite"):
+            engine_kwargs.update(pool_size=pool_size, max_overflow=max_overflow)
+        self.engine = create_async_engine(async_url, **engine_kwargs)
+        # expire_on_commit=False: returned ORM objects stay readable after the session closes
+        self.SessionLocal = async_sessionmaker(self.engine, expire_on_commit=False)
+    
+    def get_session(self):
+        """Get an AsyncSession (use as `async with`)"""
+        return self.SessionLocal()
+    
+    def pool_status(self) -> Dict[str, Any]:
+        pool = self.engine.sync_engine.pool
+        status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            status.update(pool_size=pool.size(), checked_out=pool.checkedout(), overflow=max(0, pool.overflow()))
+        return status
+
+
+# Async engines hold loop-bound connections, so they are shared per event loop
+_ASYNC_DATABASE_MANAGERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, AsyncDatabaseManager]]" = weakref.WeakKeyDictionary()
+
+
+def get_shared_async_database_manager(async_url: str, echo: bool = False, pool_size: int = 5,
+                                      max_overflow: int = 10, pool_pre_ping: bool = True) -> AsyncDatabaseManager:
+    """Return the AsyncDatabaseManager for these settings on the running loop"""
+    key = (async_url, echo, pool_size, max_overflow, pool_pre_ping)
+    managers = _ASYNC_DATABASE_MANAGERS.setdefault(asyncio.get_running_loop(), {})
+    manager = managers.get(key)
+    if manager is None:
+        manager = AsyncDatabaseManager(
+            async_url,
+            echo=echo,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=pool_pre_ping
+        )
+        managers[key] = manager
+    return manager
+
+
+async def dispose_shared_async_database_managers():
+    """Dispose the async engines owned by the running loop (server shutdown, tests)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    for manager in _ASYNC_DATABASE_MANAGERS.pop(loop, {}).values():
+        await manager.engine.dispose()
+
+
+def dispose_shared_database_managers():
+    """Dispose every shared engine (server shutdown, tests)"""
+    with _DATABASE_MANAGERS_LOCK:
+        managers = list(_DATABASE_MANAGERS.values())
+        _DATABASE_MANAGERS.clear()
+    for manager in managers:
+        manager.engine.dispose()
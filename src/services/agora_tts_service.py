@@ -5,13 +5,16 @@ Text-to-Speech service abstraction for multiple providers.
 Maintains the legacy class name `AgoraTTSService` for backwards compatibility
 with existing imports. Supports OpenAI GPT-4o-mini-tts and ElevenLabs.
 """
+import asyncio
 import base64
 import logging
-from typing import Optional
+import weakref
+from typing import AsyncIterator, Dict, Optional, Tuple
 
 import aiohttp
 
 from ..utils.text_formatting import format_text_for_tts
+from ..utils.tts_cache import CachedAudio, TTSAudioCache, get_shared_tts_cache, make_tts_cache_key
 
 try:
     from langfuse import observe
@@ -25,7 +28,53 @@ except ImportError:  # pragma: no cover - optional dependency
 
         return decorator
 
-from ..utils.config import Config
+from ..utils.config import Config, TTSCacheConfig
+
+
+STREAM_CHUNK_BYTES = 16 * 1024
+
+# aiohttp sessions shared by every AgoraTTSService in the process, so TTS calls
+# reuse keep-alive connections instead of paying DNS/TCP/TLS setup each time.
+# Connectors are bound to the event loop that opened them, so sessions are
+# kept per running loop.
+_TTS_SESSIONS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, aiohttp.ClientSession]]" = weakref.WeakKeyDictionary()
+
+
+def _get_shared_tts_session(tts_config) -> aiohttp.ClientSession:
+    """Return the pooled session for these connection limits on the running loop"""
+    limit = getattr(tts_config, "connection_limit", 100)
+    limit_per_host = getattr(tts_config, "connection_limit_per_host", 16)
+    keepalive_timeout = getattr(tts_config, "keepalive_timeout", 60.0)
+    dns_cache_ttl = getattr(tts_config, "dns_cache_ttl", 300)
+    key = (limit, limit_per_host, keepalive_timeout, dns_cache_ttl)
+
+    loop = asyncio.get_running_loop()
+    sessions = _TTS_SESSIONS.setdefault(loop, {})
+    session = sessions.get(key)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=limit,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=dns_cache_ttl
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        sessions[key] = session
+    return session
+
+
+async def close_shared_tts_sessions():
+    """Close the pooled TTS sessions owned by the running loop"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    sessions = _TTS_SESSIONS.pop(loop, {})
+    for session in sessions.values():
+        try:
+            await session.close()
+        except Exception:
+            pass
 
 
 class AgoraTTSService:
@@ -40,6 +89,8 @@ class AgoraTTSService:
         self.enabled = bool(getattr(selection_cfg, "enabled", False))
         self.default_voice = getattr(selection_cfg, "default_voice", None)
         self.audio_format = (getattr(selection_cfg, "audio_format", "mp3") or "mp3").strip().lower()
+        self._selection_cfg = selection_cfg
+        self.request_timeout = aiohttp.ClientTimeout(total=getattr(selection_cfg, "request_timeout", 60))
 
         self._openai_cfg = getattr(config, "openai_tts", None)
         self._elevenlabs_cfg = getattr(config, "elevenlabs_tts", None)
@@ -55,6 +106,15 @@ class AgoraTTSService:
         self.style_preset: Optional[str] = None
         self.optimize_streaming_latency: Optional[int] = None
 
+        # Repeated lines ("......好。") are served from the shared audio cache
+        cache_cfg = getattr(config, "tts_cache", None)
+        self.audio_cache: Optional[TTSAudioCache] = None
+        if isinstance(cache_cfg, TTSCacheConfig) and cache_cfg.enabled:
+            try:
+                self.audio_cache = get_shared_tts_cache(cache_cfg)
+            except OSError as exc:
+                self.logger.warning("TTS audio cache unavailable: %s", exc)
+
         if self.provider == "openai":
             self._configure_openai()
         elif self.provider == "elevenlabs":
@@ -124,6 +184,10 @@ class AgoraTTSService:
         if not self.audio_format:
             self.audio_format = "mp3"
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Long-lived pooled session, created lazily on first use"""
+        return _get_shared_tts_session(self._selection_cfg)
+
     # ---------------------------------------------------------------------
     # Voice resolution helpers
     # ---------------------------------------------------------------------
@@ -176,24 +240,23 @@ class AgoraTTSService:
 
     async def _post_openai_tts(self, payload: dict) -> Optional[bytes]:
         url = f"{self.base_url}/v1/audio/speech"
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url,
-                json=payload,
-                headers=self._openai_headers(),
-                timeout=aiohttp.ClientTimeout(total=60),
-            ) as response:
-                if response.status >= 400:
-                    error_text = await response.text()
-                    self.logger.error("OpenAI TTS request failed (%s): %s", response.status, error_text)
-                    return None
-
-                audio_bytes = await response.read()
-                if not audio_bytes:
-                    self.logger.error("OpenAI TTS response did not contain audio data")
-                    return None
-
-                return audio_bytes
+        async with self._get_session().post(
+            url,
+            json=payload,
+            headers=self._openai_headers(),
+            timeout=self.request_timeout,
+        ) as response:
+            if response.status >= 400:
+                error_text = await response.text()
+                self.logger.error("OpenAI TTS request failed (%s): %s", response.status, error_text)
+                return None
+
+            audio_bytes = await response.read()
+            if not audio_bytes:
+                self.logger.error("OpenAI TTS response did not contain audio data")
+                return None
+
+            return audio_bytes
 
     async def _synthesize_openai(self, text: str, voice: Optional[str], audio_format: Optional[str]) -> Optional[bytes]:
         payload = self._build_openai_payload(text, voice, audio_format)
@@ -285,25 +348,24 @@ class AgoraTTSService:
         query_params: Optional[dict],
     ) -> Optional[bytes]:
         url = f"{self.base_url}/v1/text-to-speech/{voice_id}"
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url,
-                json=payload,
-                params=query_params or None,
-                headers=self._elevenlabs_headers(output_format),
-                timeout=aiohttp.ClientTimeout(total=60),
-            ) as response:
-                if response.status >= 400:
-                    error_text = await response.text()
-                    self.logger.error("ElevenLabs TTS request failed (%s): %s", response.status, error_text)
-                    return None
-
-                audio_bytes = await response.read()
-                if not audio_bytes:
-                    self.logger.error("ElevenLabs TTS response did not contain audio data")
-                    return None
-
-                return audio_bytes
+        async with self._get_session().post(
+            url,
+            json=payload,
+            params=query_params or None,
+            headers=self._elevenlabs_headers(output_format),
+            timeout=self.request_timeout,
+        ) as response:
+            if response.status >= 400:
+                error_text = await response.text()
+                self.logger.error("ElevenLabs TTS request failed (%s): %s", response.status, error_text)
+                return None
+
+            audio_bytes = await response.read()
+            if not audio_bytes:
+                self.logger.error("ElevenLabs TTS response did not contain audio data")
+                return None
+
+            return audio_bytes
 
     async def _synthesize_elevenlabs(self, text: str, voice: Optional[str], audio_format: Optional[str]) -> Optional[bytes]:
         payload_info = self._build_elevenlabs_payload(text, voice, audio_format)
@@ -319,21 +381,9 @@ class AgoraTTSService:
     # ---------------------------------------------------------------------
     # Public API
     # ---------------------------------------------------------------------
-    @observe(name="tts_synthesis")
-    async def synthesize_speech(
-        self,
-        text: str,
-        voice: Optional[str] = None,
-        audio_format: Optional[str] = None,
-    ) -> Optional[bytes]:
-        if not self.enabled:
-            self.logger.info("TTS provider '%s' disabled; skipping synthesis", self.provider)
-            return None
-
-        if not text:
-            return None
-
-        text = text.strip()
+    def _prepare_text(self, text: Optional[str]) -> Optional[str]:
+        """Strip and format text for the provider; None when there is nothing to say"""
+        text = (text or "").strip()
         if not text:
             return None
 
@@ -343,7 +393,36 @@ class AgoraTTSService:
         # Log if text was modified
         if formatted_text != text:
             self.logger.debug(f"Text formatted for {self.provider}: {text[:50]}... -> {formatted_text[:50]}...")
-
+        return formatted_text
+
+    def _output_format(self, audio_format: Optional[str]) -> str:
+        if self.provider == "elevenlabs":
+            return self._map_elevenlabs_output_format(audio_format)
+        return (audio_format or self.audio_format or "mp3").lower()
+
+    @staticmethod
+    def _file_extension(output_format: str) -> str:
+        # "mp3_44100_128" -> "mp3", "pcm_16000" -> "pcm"
+        return (output_format or "mp3").split("_", 1)[0].lower()
+
+    def cache_key(self, formatted_text: str, voice: Optional[str], audio_format: Optional[str]) -> str:
+        """Content address of one synthesis (formatted text + everything that changes the audio)"""
+        return make_tts_cache_key(
+            formatted_text,
+            provider=self.provider,
+            voice=self._resolve_voice(voice),
+            model=self.model,
+            audio_format=self._output_format(audio_format),
+            voice_settings=self.voice_settings,
+            style_preset=self.style_preset
+        )
+
+    async def _synthesize_formatted(
+        self,
+        formatted_text: str,
+        voice: Optional[str],
+        audio_format: Optional[str],
+    ) -> Optional[bytes]:
         try:
             if self.provider == "openai":
                 return await self._synthesize_openai(formatted_text, voice, audio_format)
@@ -356,6 +435,173 @@ class AgoraTTSService:
             self.logger.error("%s TTS synthesis error: %s", self.provider.title(), exc)
             return None
 
+    async def _stream_response(self, url: str, provider_label: str, **request_kwargs) -> AsyncIterator[bytes]:
+        """POST to a provider and yield the audio body as it arrives"""
+        async with self._get_session().post(url, timeout=self.request_timeout, **request_kwargs) as response:
+            if response.status >= 400:
+                error_text = await response.text()
+                self.logger.error("%s TTS stream failed (%s): %s", provider_label, response.status, error_text)
+                return
+            async for piece in response.content.iter_chunked(STREAM_CHUNK_BYTES):
+                if piece:
+                    yield piece
+
+    async def _stream_formatted(
+        self,
+        formatted_text: str,
+        voice: Optional[str],
+        audio_format: Optional[str],
+    ) -> AsyncIterator[bytes]:
+        """Provider streaming endpoints: OpenAI sends speech chunked; ElevenLabs has /stream"""
+        if self.provider == "openai":
+            payload = self._build_openai_payload(formatted_text, voice, audio_format)
+            async for piece in self._stream_response(
+                f"{self.base_url}/v1/audio/speech",
+                "OpenAI",
+                json=payload,
+                headers=self._openai_headers(),
+            ):
+                yield piece
+        elif self.provider == "elevenlabs":
+            payload_info = self._build_elevenlabs_payload(formatted_text, voice, audio_format)
+            if not payload_info:
+                return
+            payload, voice_id, output_format, query_params = payload_info
+            async for piece in self._stream_response(
+                f"{self.base_url}/v1/text-to-speech/{voice_id}/stream",
+                "ElevenLabs",
+                json=payload,
+                params=query_params or None,
+                headers=self._elevenlabs_headers(output_format),
+            ):
+                yield piece
+        else:
+            self.logger.error("No supported TTS provider configured")
+
+    async def stream_speech(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        audio_format: Optional[str] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield audio for text as the provider produces it.
+
+        Cached clips are replayed in one piece; fresh ones are stored in the
+        audio cache once the stream completes. A provider error before any
+        audio is logged and ends the stream; after audio was yielded it is
+        re-raised, so callers know the clip is truncated.
+        """
+        if not self.enabled:
+            return
+
+        formatted_text = self._prepare_text(text)
+        if not formatted_text:
+            return
+
+        key = self.cache_key(formatted_text, voice, audio_format) if self.audio_cache else None
+        if key:
+            cached = self.audio_cache.get_bytes(key)
+            if cached is not None:
+                yield cached
+                return
+
+        pieces = []
+        try:
+            async for piece in self._stream_formatted(formatted_text, voice, audio_format):
+                pieces.append(piece)
+                yield piece
+        except Exception as exc:
+            self.logger.error("%s TTS stream error: %s", self.provider.title(), exc)
+            if pieces:
+                raise
+            return
+
+        if key and pieces:
+            await self._store_in_cache(key, b"".join(pieces), audio_format)
+
+    async def store_audio(
+        self,
+        text: str,
+        audio_bytes: bytes,
+        voice: Optional[str] = None,
+        audio_format: Optional[str] = None,
+    ) -> Optional[CachedAudio]:
+        """Cache audio assembled elsewhere (e.g. joined sentence chunks) under text's key"""
+        formatted_text = self._prepare_text(text)
+        if not self.audio_cache or not formatted_text or not audio_bytes:
+            return None
+        return await self._store_in_cache(self.cache_key(formatted_text, voice, audio_format), audio_bytes, audio_format)
+
+    @observe(name="tts_synthesis")
+    async def synthesize_speech(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        audio_format: Optional[str] = None,
+    ) -> Optional[bytes]:
+        if not self.enabled:
+            self.logger.info("TTS provider '%s' disabled; skipping synthesis", self.provider)
+            return None
+
+        formatted_text = self._prepare_text(text)
+        if not formatted_text:
+            return None
+
+        if not self.audio_cache:
+            return await self._synthesize_formatted(formatted_text, voice, audio_format)
+
+        key = self.cache_key(formatted_text, voice, audio_format)
+        audio_bytes = self.audio_cache.get_bytes(key)
+        if audio_bytes is not None:
+            return audio_bytes
+
+        audio_bytes = await self._synthesize_formatted(formatted_text, voice, audio_format)
+        if audio_bytes:
+            await self._store_in_cache(key, audio_bytes, audio_format)
+        return audio_bytes
+
+    @observe(name="tts_synthesis_cached")
+    async def synthesize_to_cache(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        audio_format: Optional[str] = None,
+    ) -> Optional[CachedAudio]:
+        """
+        Synthesize into the audio cache and return the cached file.
+
+        On a hit the existing file is returned without reading it (``audio`` is
+        None); on a miss ``audio`` carries the freshly synthesized bytes.
+        Returns None when TTS/cache is unavailable or synthesis fails.
+        """
+        if not self.enabled or not self.audio_cache:
+            return None
+
+        formatted_text = self._prepare_text(text)
+        if not formatted_text:
+            return None
+
+        key = self.cache_key(formatted_text, voice, audio_format)
+        cached = self.audio_cache.get_file(key)
+        if cached is not None:
+            return cached
+
+        audio_bytes = await self._synthesize_formatted(formatted_text, voice, audio_format)
+        if not audio_bytes:
+            return None
+        cached = await self._store_in_cache(key, audio_bytes, audio_format)
+        if cached is not None:
+            cached.audio = audio_bytes
+        return cached
+
+    async def _store_in_cache(self, key: str, audio_bytes: bytes, audio_format: Optional[str]) -> Optional[CachedAudio]:
+        try:
+            return await self.audio_cache.put_async(key, audio_bytes, self._file_extension(self._output_format(audio_format)))
+        except OSError as exc:
+            self.logger.warning("Failed to cache TTS audio: %s", exc)
+            return None
+
     @observe(name="tts_simple")
     async def text_to_speech(
         self,
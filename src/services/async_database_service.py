@@ -0,0 +1,470 @@
+"""
+Async database service for the request path
+Non-blocking counterparts of the DatabaseService methods used by chat, device
+control and memory search, built on SQLAlchemy's asyncio extension
+(aiosqlite / asyncpg). The synchronous DatabaseService stays the API for
+scripts and admin tooling.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import String, desc, func, or_, select
+
+from ..models.database import (
+    Conversation, Device, DeviceInteraction, Message, User, UserMemory,
+    _is_memory_sqlite, get_shared_async_database_manager, to_async_url
+)
+from ..utils.config import Config
+from .database_service import (
+    ConversationTurnInfo, DatabaseService, UserInfo, derived_conversation_id, familiarity_for_interactions,
+    session_conversation_filter, user_profile
+)
+from .write_behind import WriteBehindQueue, get_shared_write_behind_queue
+
+
+class AsyncDatabaseService:
+    """
+    Async hot-path queries; results match the DatabaseService methods of the same name.
+
+    When no async driver is available for the configured URL (driver not
+    installed, unsupported dialect), each call runs the synchronous method
+    in a worker thread instead, so the event loop is never blocked either
+    way. In-memory SQLite keeps one connection per thread, so there the sync
+    method is called inline.
+    """
+
+    def __init__(self, config: Config, sync_service: Optional[DatabaseService] = None):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        # The sync service creates the tables and owns the device version counter
+        self.sync = sync_service or DatabaseService(config)
+        db_config = config.database
+        enabled = getattr(db_config, "async_enabled", True)
+        self.async_url = to_async_url(db_config.url) if enabled else None
+        self._inline = _is_memory_sqlite(db_config.url)
+        self.stats = {"native_calls": 0, "thread_calls": 0, "inline_calls": 0}
+        if self.async_url is None:
+            self.logger.info("Async database driver unavailable; running DatabaseService calls in threads")
+
+    @property
+    def native(self) -> bool:
+        """True when queries run on the async engine"""
+        return self.async_url is not None
+
+    def _session(self):
+        db_config = self.config.database
+        manager = get_shared_async_database_manager(
+            self.async_url,
+            echo=db_config.echo,
+            pool_size=db_config.pool_size,
+            max_overflow=db_config.max_overflow,
+            pool_pre_ping=db_config.pool_pre_ping
+        )
+        self.stats["native_calls"] += 1
+        return manager.get_session()
+
+    async def _in_thread(self, method: str, *args, **kwargs):
+        if self._inline:
+            self.stats["inline_calls"] += 1
+            return getattr(self.sync, method)(*args, **kwargs)
+        self.stats["thread_calls"] += 1
+        return await asyncio.to_thread(getattr(self.sync, method), *args, **kwargs)
+
+    # Write-behind
+    def write_queue(self) -> Optional[WriteBehindQueue]:
+        """The running loop's write-behind queue for this database, or None if disabled"""
+        db_config = self.config.database
+        if not getattr(db_config, "write_behind_enabled", False):
+            return None
+        return get_shared_write_behind_queue(
+            db_config.url,
+            lambda: WriteBehindQueue(
+                self.apply_write_batch,
+                batch_size=db_config.write_behind_batch_size,
+                flush_interval=db_config.write_behind_flush_interval,
+                max_pending=db_config.write_behind_max_pending
+            )
+        )
+
+    async def apply_write_batch(self, writes: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, int]:
+        """Commit a batch of queued writes (DatabaseService.apply_write_batch)"""
+        return await self._in_thread("apply_write_batch", writes)
+
+    async def queue_write(self, kind: str, **payload):
+        """Queue a write-behind write, or commit it now when the queue is disabled"""
+        queue = self.write_queue()
+        if queue is None:
+            await self.apply_write_batch([(kind, payload)])
+        else:
+            await queue.put(kind, **payload)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "native": self.native, "driver": self.async_url.split("://", 1)[0] if self.async_url else None}
+
+    # User Management
+    async def get_user_familiarity(self, user_id: str) -> int:
+        """Get user's familiarity score"""
+        profile = await self.get_user_metadata(user_id)
+        return profile.get("familiarity_score", self.config.system.default_familiarity_score)
+
+    async def get_user_metadata(self, user_id: str) -> dict:
+        """Get user metadata safely for external use (read through the shared profile cache)"""
+        cache = self.sync.user_cache
+        profile = cache.get(user_id)
+        if profile is not None:
+            return profile
+        generation = cache.generation
+        if self.native:
+            async with self._session() as session:
+                profile = user_profile(await session.get(User, user_id))
+        else:
+            profile = await self._in_thread("load_user_profile", user_id)
+        cache.set(user_id, profile, generation)
+        return profile
+
+    async def get_or_create_user(self, user_id: str, username: str = None, **kwargs) -> UserInfo:
+        """Get existing user or create new one"""
+        if not self.native:
+            return await self._in_thread("get_or_create_user", user_id, username, **kwargs)
+        async with self._session() as session:
+            user = await session.get(User, user_id)
+            if not user:
+                user = User(
+                    id=user_id,
+                    username=username or user_id,
+                    familiarity_score=self.config.system.default_familiarity_score,
+                    **kwargs
+                )
+                session.add(user)
+            else:
+                user.last_seen = datetime.utcnow()
+            await session.commit()
+            await session.refresh(user)
+        self.sync.invalidate_user(user_id)
+        return UserInfo(
+            id=user.id,
+            username=user.username,
+            familiarity_score=user.familiarity_score,
+            last_seen=user.last_seen,
+            created_at=user.created_at
+        )
+
+    async def update_user_familiarity(self, user_id: str, score: int) -> bool:
+        """Update user's familiarity score"""
+        if not self.native:
+            return await self._in_thread("update_user_familiarity", user_id, score)
+        async with self._session() as session:
+            user = await session.get(User, user_id)
+            if not user:
+                return False
+            user.familiarity_score = max(0, min(100, score))
+            user.updated_at = datetime.utcnow()
+            await session.commit()
+        self.sync.invalidate_user(user_id)
+        return True
+
+    async def increment_user_interaction(self, user_id: str):
+        """Increment user interaction count for familiarity scoring"""
+        if not self.native:
+            return await self._in_thread("increment_user_interaction", user_id)
+        async with self._session() as session:
+            user = await session.get(User, user_id)
+            if not user:
+                return
+            user.interaction_count = (user.interaction_count or 0) + 1
+            user.last_seen = datetime.utcnow()
+            user.familiarity_score = familiarity_for_interactions(user.interaction_count)
+            await session.commit()
+        self.sync.invalidate_user(user_id)
+
+    # Conversation Management
+    async def get_or_create_conversation(self, user_id: str, conversation_id: str = None) -> Conversation:
+        """Get existing conversation or create new one (user is created if needed)"""
+        if not self.native:
+            return await self._in_thread("get_or_create_conversation", user_id, conversation_id)
+        async with self._session() as session:
+            if await session.get(User, user_id) is None:
+                session.add(User(
+                    id=user_id,
+                    username=user_id,
+                    familiarity_score=self.config.system.default_familiarity_score
+                ))
+            conversation = None
+            if conversation_id:
+                conversation = await session.scalar(
+                    select(Conversation).where(
+                        Conversation.id == conversation_id,
+                        Conversation.user_id == user_id
+                    )
+                )
+            if conversation:
+                conversation.update_activity()
+            else:
+                conversation = Conversation(
+                    id=conversation_id or str(uuid.uuid4()),
+                    user_id=user_id,
+                    title=f"对话 {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                    message_count=0
+                )
+                session.add(conversation)
+            await session.commit()
+        self.sync.invalidate_user(user_id)
+        return conversation
+
+    async def record_conversation_turn(self, user_id: str, conversation_id: str = None) -> ConversationTurnInfo:
+        """Count one turn on the conversation (creating user/conversation if needed)"""
+        if not self.native:
+            return await self._in_thread("record_conversation_turn", user_id, conversation_id)
+        async with self._session() as session:
+            now = datetime.utcnow()
+            user = await session.get(User, user_id)
+            if not user:
+                user = User(
+                    id=user_id,
+                    username=user_id,
+                    familiarity_score=self.config.system.default_familiarity_score
+                )
+                session.add(user)
+            else:
+                user.last_seen = now
+
+            conversation, new_id = await self._resolve_turn_conversation(session, user_id, conversation_id)
+            is_new = conversation is None
+            if is_new:
+                conversation = Conversation(
+                    id=new_id,
+                    user_id=user_id,
+                    title=f"对话 {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                    message_count=1
+                )
+                session.add(conversation)
+            else:
+                conversation.last_activity = now
+                conversation.message_count = (conversation.message_count or 0) + 1
+                conversation.is_active = True
+            await session.commit()
+        self.sync.invalidate_user(user_id)
+        return ConversationTurnInfo(
+            conversation_id=conversation.id,
+            message_count=conversation.message_count,
+            familiarity_score=user.familiarity_score,
+            is_new=is_new
+        )
+
+    @staticmethod
+    async def _resolve_turn_conversation(session, user_id: str, conversation_id: Optional[str]):
+        """DatabaseService._resolve_turn_conversation on an AsyncSession"""
+        if not conversation_id:
+            return None, str(uuid.uuid4())
+        conversation = await session.get(Conversation, conversation_id)
+        if conversation is None:
+            return None, conversation_id
+        if conversation.user_id == user_id and not conversation.is_expired:
+            return conversation, conversation_id
+        return None, derived_conversation_id(conversation_id)
+
+    async def get_conversation_history(self, conversation_id: str, limit: int = 10) -> List[Message]:
+        """Get conversation history (chronological)"""
+        if not self.native:
+            return await self._in_thread("get_conversation_history", conversation_id, limit)
+        async with self._session() as session:
+            result = await session.scalars(
+                select(Message)
+                .where(Message.conversation_id == conversation_id)
+                .order_by(desc(Message.timestamp))
+                .limit(limit)
+            )
+            messages = list(result)
+        return list(reversed(messages))
+
+    async def get_session_history(
+        self,
+        session_id: str,
+        user_id: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Message]:
+        """History of the conversation a session's turns were last recorded under"""
+        if not self.native:
+            return await self._in_thread("get_session_history", session_id, user_id, limit)
+        statement = select(Conversation.id).where(session_conversation_filter(session_id))
+        if user_id:
+            statement = statement.where(Conversation.user_id == user_id)
+        async with self._session() as session:
+            conversation_id = await session.scalar(
+                statement.order_by(desc(Conversation.last_activity)).limit(1)
+            )
+        return await self.get_conversation_history(conversation_id, limit) if conversation_id else []
+
+    # Message Management
+    async def save_message(
+        self,
+        conversation_id: str,
+        user_input: str = None,
+        assistant_response: str = None,
+        tone_used: str = None,
+        intent_detected: dict = None,
+        tools_used: List[str] = None,
+        langfuse_trace_id: str = None,
+        processing_time_ms: float = None
+    ) -> Message:
+        """Save a message to the database"""
+        if not self.native:
+            return await self._in_thread(
+                "save_message", conversation_id, user_input, assistant_response, tone_used,
+                intent_detected, tools_used, langfuse_trace_id, processing_time_ms
+            )
+        message = Message(
+            conversation_id=conversation_id,
+            user_input=user_input,
+            assistant_response=assistant_response,
+            tone_used=tone_used,
+            intent_detected=intent_detected or {},
+            tools_used=tools_used or [],
+            langfuse_trace_id=langfuse_trace_id,
+            processing_time_ms=processing_time_ms
+        )
+        async with self._session() as session:
+            session.add(message)
+            await session.commit()
+            await session.refresh(message)
+        return message
+
+    # User Memory Management
+    async def save_user_memory(
+        self,
+        user_id: str,
+        content: str,
+        memory_type: str = "general",
+        keywords: List[str] = None,
+        source_conversation_id: str = None,
+        importance_score: float = 1.0
+    ) -> UserMemory:
+        """Save a user memory"""
+        if not self.native:
+            return await self._in_thread(
+                "save_user_memory", user_id, content, memory_type, keywords,
+                source_conversation_id, importance_score
+            )
+        memory = UserMemory(
+            user_id=user_id,
+            content=content,
+            memory_type=memory_type,
+            keywords=keywords or [],
+            source_conversation_id=source_conversation_id,
+            importance_score=importance_score
+        )
+        async with self._session() as session:
+            session.add(memory)
+            await session.commit()
+            await session.refresh(memory)
+        return memory
+
+    async def search_user_memories(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 5,
+        memory_type: str = None
+    ) -> List[UserMemory]:
+        """Search user memories by keywords (marks the results as accessed)"""
+        if not self.native:
+            return await self._in_thread("search_user_memories", user_id, query, limit, memory_type)
+        statement = select(UserMemory).where(UserMemory.user_id == user_id)
+        if memory_type:
+            statement = statement.where(UserMemory.memory_type == memory_type)
+        search_conditions = [
+            or_(
+                func.lower(UserMemory.content).contains(word),
+                func.lower(UserMemory.keywords.cast(String)).contains(f'"{word}"')
+            )
+            for word in query.lower().split()
+        ]
+        if search_conditions:
+            statement = statement.where(or_(*search_conditions))
+        statement = statement.order_by(
+            desc(UserMemory.importance_score),
+            desc(UserMemory.last_accessed)
+        ).limit(limit)
+
+        async with self._session() as session:
+            memories = list(await session.scalars(statement))
+            now = datetime.utcnow()
+            for memory in memories:
+                memory.last_accessed = now
+                memory.access_count = (memory.access_count or 0) + 1
+            await session.commit()
+        return memories
+
+    # Device Management
+    async def get_device(self, device_id: str) -> Optional[Device]:
+        """Get device by ID"""
+        if not self.native:
+            return await self._in_thread("get_device", device_id)
+        async with self._session() as session:
+            return await session.get(Device, device_id)
+
+    async def get_all_devices(self, active_only: bool = True) -> List[Device]:
+        """Get all devices"""
+        if not self.native:
+            return await self._in_thread("get_all_devices", active_only)
+        statement = select(Device)
+        if active_only:
+            statement = statement.where(Device.is_active == True)
+        async with self._session() as session:
+            return list(await session.scalars(statement))
+
+    async def update_device_state(self, device_id: str, new_state: Dict, user_id: str = None) -> bool:
+        """Update device state"""
+        if not self.native:
+            return await self._in_thread("update_device_state", device_id, new_state, user_id)
+        async with self._session() as session:
+            device = await session.get(Device, device_id)
+            if not device:
+                return False
+            # JSON columns need a new object for SQLAlchemy to detect the change
+            current_state = dict(device.current_state or {})
+            current_state.update(new_state)
+            device.current_state = current_state
+            device.last_updated = datetime.utcnow()
+            await session.commit()
+        self.sync.invalidate_devices()
+        return True
+
+    async def log_device_interaction(
+        self,
+        user_id: str,
+        device_id: str,
+        action: str,
+        parameters: Dict = None,
+        result: Dict = None,
+        success: bool = True,
+        conversation_id: str = None,
+        error_message: str = None
+    ) -> DeviceInteraction:
+        """Log a device interaction"""
+        if not self.native:
+            return await self._in_thread(
+                "log_device_interaction", user_id, device_id, action, parameters,
+                result, success, conversation_id, error_message
+            )
+        interaction = DeviceInteraction(
+            user_id=user_id,
+            device_id=device_id,
+            action=action,
+            parameters=parameters or {},
+            result=result or {},
+            success=success,
+            conversation_id=conversation_id,
+            error_message=error_message
+        )
+        async with self._session() as session:
+            session.add(interaction)
+            await session.commit()
+            await session.refresh(interaction)
+        if self.config.system.device_usage_rollup_enabled:
+            # Same refresh as the sync path; the upsert runs in a worker thread
+            await self._in_thread("_refresh_device_usage_rollup_after_write")
+        return interaction
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Background upload of cached audio to temporary cloud hosting
+ - Bounded worker pool on the event loop; the workflow returns the local URL
+   at once and the cloud URL is published when the upload finishes
+ - Retries with exponential backoff
+ - Pluggable uploaders (catbox.moe by default), so tests can point at a local server
+ - Per-upload status for GET /audio/uploads/{upload_id} and websocket events
+"""
+import asyncio
+import inspect
+import logging
+import os
+import time
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+import aiofiles
+import aiohttp
+
+from ..utils.config import AudioUploadConfig, Config
+
+
+class AudioUploadError(Exception):
+    """An upload attempt failed and may be retried"""
+
+
+class AudioUploader(ABC):
+    """Interface for a temporary hosting backend"""
+
+    name = "uploader"
+
+    @abstractmethod
+    async def upload(self, file_path: str) -> str:
+        """Upload file_path and return its public URL; raise AudioUploadError on failure"""
+        pass
+
+    async def close(self):
+        """Release network resources"""
+
+
+class CatboxUploader(AudioUploader):
+    """catbox.moe anonymous file upload (multipart POST, then a HEAD size check)"""
+
+    name = "catbox"
+
+    def __init__(
+        self,
+        host: str = "https://catbox.moe",
+        upload_timeout: float = 120.0,
+        verify_timeout: float = 20.0
+    ):
+        self.endpoint = f"{host.rstrip('/')}/user/api.php"
+        self.upload_timeout = aiohttp.ClientTimeout(total=upload_timeout)
+        self.verify_timeout = aiohttp.ClientTimeout(total=verify_timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def upload(self, file_path: str) -> str:
+        async with aiofiles.open(file_path, "rb") as fh:
+            audio = await fh.read()
+
+        form = aiohttp.FormData()
+        form.add_field("reqtype", "fileupload")
+        form.add_field("fileToUpload", audio, filename=os.path.basename(file_path), content_type="audio/mpeg")
+        try:
+            async with self._get_session().post(self.endpoint, data=form, timeout=self.upload_timeout) as response:
+                body = (await response.text()).strip()
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            raise AudioUploadError(f"{self.name} upload failed: {exc!r}") from exc
+
+        if status >= 400 or not body.startswith("http"):
+            raise AudioUploadError(f"{self.name} upload failed ({status}): {body[:200]}")
+        if not await self._verify_size(body, len(audio)):
+            raise AudioUploadError(f"{self.name} upload truncated: {body}")
+        return body
+
+    async def _verify_size(self, url: str, local_size: int) -> bool:
+        try:
+            async with self._get_session().head(url, allow_redirects=True, timeout=self.verify_timeout) as response:
+                remote_size = response.headers.get("Content-Length")
+        except Exception:
+            return True  # Cannot verify; don't fail the upload over it
+        if not remote_size:
+            return True
+        # Consider OK if remote >= 98% of local (some hosts re-encode headers)
+        return int(remote_size) >= int(local_size * 0.98)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+@dataclass
+class UploadStatus:
+    """Progress of one background upload"""
+    upload_id: str
+    file_path: str
+    local_url: Optional[str] = None
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
+    status: str = "pending"  # pending | uploading | done | failed
+    cloud_url: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Client-facing view (no server file paths)"""
+        return {
+            "upload_id": self.upload_id,
+            "status": self.status,
+            "local_url": self.local_url,
+            "cloud_url": self.cloud_url,
+            "attempts": self.attempts,
+            "error": self.error,
+            "session_id": self.session_id,
+        }
+
+
+UploadListener = Callable[[UploadStatus], Union[None, Awaitable[None]]]
+
+
+class AudioUploadManager:
+    """Queue + bounded worker pool that uploads cached audio off the request path"""
+
+    def __init__(
+        self,
+        uploader: AudioUploader,
+        workers: int = 2,
+        queue_size: int = 100,
+        max_attempts: int = 3,
+        backoff_base_seconds: float = 1.0,
+        backoff_max_seconds: float = 30.0,
+        max_tracked: int = 1000
+    ):
+        self.uploader = uploader
+        self.worker_count = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.max_tracked = max(1, max_tracked)
+        self.logger = logging.getLogger(__name__)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self._workers: List[asyncio.Task] = []
+        self._statuses: "OrderedDict[str, UploadStatus]" = OrderedDict()
+        self._listeners: List[UploadListener] = []
+        self.stats = {"submitted": 0, "uploaded": 0, "failed": 0, "retries": 0, "rejected": 0}
+
+    # Listeners ---------------------------------------------------------------
+
+    def add_listener(self, listener: UploadListener):
+        """Called (sync or async) whenever an upload finishes"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: UploadListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    # Submission --------------------------------------------------------------
+
+    def submit(
+        self,
+        file_path: str,
+        local_url: Optional[str] = None,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> UploadStatus:
+        """Queue file_path for upload and return its status immediately"""
+        self._ensure_workers()
+        status = UploadStatus(
+            upload_id=uuid.uuid4().hex,
+            file_path=file_path,
+            local_url=local_url,
+            user_id=user_id,
+            session_id=session_id
+        )
+        self.stats["submitted"] += 1
+        try:
+            self._queue.put_nowait(status)
+        except asyncio.QueueFull:
+            # Shed load rather than grow without bound; the local URL still works
+            status.status = "failed"
+            status.error = "upload queue full"
+            self.stats["rejected"] += 1
+        self._track(status)
+        return status
+
+    def get_status(self, upload_id: str) -> Optional[UploadStatus]:
+        return self._statuses.get(upload_id)
+
+    def _track(self, status: UploadStatus):
+        self._statuses[status.upload_id] = status
+        # Forget the oldest finished uploads first; in-flight ones stay visible
+        while len(self._statuses) > self.max_tracked:
+            oldest = next((key for key, value in self._statuses.items() if value.finished), None)
+            if oldest is None:
+                break
+            del self._statuses[oldest]
+
+    # Workers -----------------------------------------------------------------
+
+    def _ensure_workers(self):
+        self._workers = [task for task in self._workers if not task.done()]
+        while len(self._workers) < self.worker_count:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self):
+        while True:
+            status = await self._queue.get()
+            try:
+                await self._upload(status)
+            finally:
+                self._queue.task_done()
+
+    async def _upload(self, status: UploadStatus):
+        for attempt in range(1, self.max_attempts + 1):
+            status.status = "uploading"
+            status.attempts = attempt
+            status.updated_at = time.time()
+            try:
+                status.cloud_url = await self.uploader.upload(status.file_path)
+                status.status = "done"
+                status.error = None
+                self.stats["uploaded"] += 1
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                status.error = str(exc)
+                if attempt == self.max_attempts:
+                    status.status = "failed"
+                    self.stats["failed"] += 1
+                    self.logger.warning("Audio upload %s failed after %d attempts: %s", status.upload_id, attempt, exc)
+                    break
+                self.stats["retries"] += 1
+                await asyncio.sleep(min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** (attempt - 1)))
+        status.updated_at = time.time()
+        await self._notify(status)
+
+    async def _notify(self, status: UploadStatus):
+        for listener in list(self._listeners):
+            try:
+                result = listener(status)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as exc:
+                self.logger.warning("Audio upload listener failed: %s", exc)
+
+    async def join(self):
+        """Wait until every queued upload has finished"""
+        await self._queue.join()
+
+    async def close(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.uploader.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats.update({
+            "uploader": self.uploader.name,
+            "workers": self.worker_count,
+            "queued": self._queue.qsize(),
+            "in_progress": sum(1 for status in self._statuses.values() if status.status == "uploading"),
+            "tracked": len(self._statuses),
+        })
+        return stats
+
+
+# One manager per event loop (queues and worker tasks are loop-bound), shared
+# by every workflow instance and the API status endpoint.
+_UPLOAD_MANAGERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AudioUploadManager]" = weakref.WeakKeyDictionary()
+
+
+def get_shared_audio_uploader(config: Config, uploader: Optional[AudioUploader] = None) -> AudioUploadManager:
+    """
+    Return the upload manager for the running loop.
+
+    `uploader` replaces the default catbox backend when the manager is first
+    created (e.g. a local stand-in server in tests).
+    """
+    loop = asyncio.get_running_loop()
+    manager = _UPLOAD_MANAGERS.get(loop)
+    if manager is None:
+        upload_cfg = getattr(config, "audio_upload", None) or AudioUploadConfig()
+        if uploader is None:
+            uploader = CatboxUploader(
+                host=getattr(config.system, "temp_upload_host", None) or "https://catbox.moe",
+                upload_timeout=upload_cfg.upload_timeout,
+                verify_timeout=upload_cfg.verify_timeout
+            )
+        manager = AudioUploadManager(
+            uploader,
+            workers=upload_cfg.workers,
+            queue_size=upload_cfg.queue_size,
+            max_attempts=upload_cfg.max_attempts,
+            backoff_base_seconds=upload_cfg.backoff_base_seconds,
+            backoff_max_seconds=upload_cfg.backoff_max_seconds,
+            max_tracked=upload_cfg.max_tracked
+        )
+        _UPLOAD_MANAGERS[loop] = manager
+    return manager
+
+
+async def close_shared_audio_uploaders():
+    """Stop the workers and close the uploader owned by the running loop"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    manager = _UPLOAD_MANAGERS.pop(loop, None)
+    if manager is not None:
+        await manager.close()
+
+
+def get_audio_upload_stats() -> Dict[str, Any]:
+    """Counters of the upload manager on the running loop (empty if none yet)"""
+    try:
+        manager = _UPLOAD_MANAGERS.get(asyncio.get_running_loop())
+    except RuntimeError:
+        return {}
+    return manager.get_stats() if manager else {}
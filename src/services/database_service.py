@@ -3,18 +3,34 @@ Database service layer for the Smart Home AI Assistant
 Replaces the mock databases with real database operations
 """
 import json
+import threading
 import uuid
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any, Tuple
 from dataclasses import dataclass
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc, String
+from sqlalchemy import func, and_, or_, desc, case, String
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from ..models.database import (
     User, Conversation, Message, UserMemory, Device, UserDevice,
-    DeviceInteraction, SystemSettings, DatabaseManager
+    DeviceInteraction, DeviceUsageHourly, SystemSettings, DatabaseManager, get_shared_database_manager
 )
 from ..utils.config import Config
+from .user_profile_cache import UserProfileCache, get_user_profile_cache
+
+# Write counter for the devices table, per database URL. Device caches
+# (DeviceCatalog, fast-intent snapshot) compare versions instead of re-querying.
+_DEVICE_VERSIONS: Dict[str, int] = {}
+_DEVICE_VERSIONS_LOCK = threading.Lock()
+
+# Rollup refreshes run after device-interaction writes, one at a time per
+# database URL in this process; a refresh requested while one is running is
+# folded into a rerun of it instead of waiting for the lock
+_ROLLUP_LOCKS: Dict[str, threading.Lock] = {}
+_ROLLUP_REQUESTED: Dict[str, threading.Event] = {}
+_ROLLUP_STATE_LOCK = threading.Lock()
 
 @dataclass
 class UserInfo:
@@ -25,18 +41,95 @@ class UserInfo:
     last_seen: datetime
     created_at: datetime
 
+@dataclass
+class ConversationTurnInfo:
+    """Conversation/user metadata recorded for one chat turn"""
+    conversation_id: str
+    message_count: int
+    familiarity_score: int
+    is_new: bool = False
+
+
+def user_profile(user: Optional[User]) -> Dict[str, Any]:
+    """Profile fields served by get_user_metadata ({} when the user does not exist)"""
+    if user is None:
+        return {}
+    return {
+        "interaction_count": user.interaction_count or 0,
+        "familiarity_score": user.familiarity_score,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "last_seen": user.last_seen.isoformat() if user.last_seen else None
+    }
+
+
+def derived_conversation_id(session_id: str) -> str:
+    """Fresh conversation id for a session whose own id is expired or taken.
+
+    The session id stays a prefix, so the session's latest conversation can
+    still be found when an evicted session is rehydrated.
+    """
+    return f"{session_id}:{uuid.uuid4().hex[:12]}"
+
+
+def session_conversation_filter(session_id: str):
+    """Conversations recorded for a session: its own id or ids derived from it"""
+    return or_(
+        Conversation.id == session_id,
+        Conversation.id.startswith(f"{session_id}:", autoescape=True)
+    )
+
+
+def familiarity_for_interactions(interaction_count: int) -> float:
+    """Familiarity score earned by a number of interactions"""
+    if interaction_count <= 10:
+        return min(30, interaction_count * 3)
+    if interaction_count <= 30:
+        return min(60, 30 + (interaction_count - 10) * 1.5)
+    return min(100, 60 + (interaction_count - 30) * 0.8)
+
 class DatabaseService:
     """Service layer for database operations"""
     
     def __init__(self, config: Config):
         self.config = config
-        self.db_manager = DatabaseManager(config.database.url)
-        self.db_manager.create_tables()
+        db_config = config.database
+        self.db_manager: DatabaseManager = get_shared_database_manager(
+            db_config.url,
+            echo=db_config.echo,
+            pool_size=db_config.pool_size,
+            max_overflow=db_config.max_overflow,
+            pool_pre_ping=db_config.pool_pre_ping
+        )
+        self.db_manager.ensure_tables()
+        self._db_url = db_config.url
+        self.user_cache: UserProfileCache = get_user_profile_cache(
+            db_config.url,
+            ttl_seconds=config.system.user_cache_ttl_seconds,
+            max_entries=config.system.user_cache_max_entries
+        )
     
     def get_session(self) -> Session:
         """Get a database session"""
         return self.db_manager.get_session()
     
+    def get_pool_status(self) -> Dict[str, Any]:
+        """Connection pool metrics for the shared engine"""
+        return self.db_manager.pool_status()
+
+    @property
+    def device_version(self) -> int:
+        """Bumped on every write to the devices table made in this process"""
+        return _DEVICE_VERSIONS.get(self._db_url, 0)
+
+    def invalidate_devices(self):
+        """Record a devices-table write (call after writes that bypass this service)"""
+        with _DEVICE_VERSIONS_LOCK:
+            _DEVICE_VERSIONS[self._db_url] = _DEVICE_VERSIONS.get(self._db_url, 0) + 1
+
+    def invalidate_user(self, user_id: str = None):
+        """Drop cached profile fields for a user, or all users (call after writes that bypass this service)"""
+        self.user_cache.invalidate(user_id)
+    
     # User Management
     def get_or_create_user(self, user_id: str, username: str = None, **kwargs) -> UserInfo:
         """Get existing user or create new one"""
@@ -58,6 +151,7 @@ class DatabaseService:
                 # Update last_seen
                 user.last_seen = datetime.utcnow()
                 session.commit()
+            self.invalidate_user(user_id)
 
             # Create UserInfo object to avoid session issues
             user_info = UserInfo(
@@ -80,6 +174,7 @@ class DatabaseService:
                 user.familiarity_score = max(0, min(100, score))
                 user.updated_at = datetime.utcnow()
                 session.commit()
+                self.invalidate_user(user_id)
                 return True
             return False
         finally:
@@ -87,28 +182,23 @@ class DatabaseService:
     
     def get_user_familiarity(self, user_id: str) -> int:
         """Get user's familiarity score"""
-        session = self.get_session()
-        try:
-            user = session.query(User).filter_by(id=user_id).first()
-            if user:
-                return user.familiarity_score
-            return self.config.system.default_familiarity_score
-        finally:
-            session.close()
+        profile = self.get_user_metadata(user_id)
+        return profile.get("familiarity_score", self.config.system.default_familiarity_score)
     
     def get_user_metadata(self, user_id: str) -> dict:
-        """Get user metadata safely for external use"""
+        """Get user metadata safely for external use (read through the profile cache)"""
+        profile = self.user_cache.get(user_id)
+        if profile is None:
+            generation = self.user_cache.generation
+            profile = self.load_user_profile(user_id)
+            self.user_cache.set(user_id, profile, generation)
+        return profile
+
+    def load_user_profile(self, user_id: str) -> dict:
+        """Read the profile fields from the database, bypassing the cache"""
         session = self.get_session()
         try:
-            user = session.query(User).filter_by(id=user_id).first()
-            if user:
-                return {
-                    "interaction_count": user.interaction_count or 0,
-                    "familiarity_score": user.familiarity_score,
-                    "created_at": user.created_at.isoformat() if user.created_at else None,
-                    "last_seen": user.last_seen.isoformat() if user.last_seen else None
-                }
-            return {}
+            return user_profile(session.query(User).filter_by(id=user_id).first())
         finally:
             session.close()
     
@@ -148,6 +238,82 @@ class DatabaseService:
         finally:
             session.close()
     
+    def record_conversation_turn(
+        self,
+        user_id: str,
+        conversation_id: str = None
+    ) -> ConversationTurnInfo:
+        """Count one turn on the conversation (creating user/conversation if needed).
+
+        Uses the maintained Conversation.message_count column, so the cost does
+        not grow with conversation length.
+        """
+        session = self.get_session()
+        try:
+            now = datetime.utcnow()
+            user = session.query(User).filter_by(id=user_id).first()
+            if not user:
+                user = User(
+                    id=user_id,
+                    username=user_id,
+                    familiarity_score=self.config.system.default_familiarity_score
+                )
+                session.add(user)
+            else:
+                user.last_seen = now
+            
+            conversation, new_id = self._resolve_turn_conversation(session, user_id, conversation_id)
+            
+            is_new = conversation is None
+            if is_new:
+                conversation = Conversation(
+                    id=new_id,
+                    user_id=user_id,
+                    title=f"对话 {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                    message_count=1
+                )
+                session.add(conversation)
+            else:
+                conversation.last_activity = now
+                conversation.message_count = (conversation.message_count or 0) + 1
+                conversation.is_active = True
+            
+            session.commit()
+            self.invalidate_user(user_id)
+            return ConversationTurnInfo(
+                conversation_id=conversation.id,
+                message_count=conversation.message_count,
+                familiarity_score=user.familiarity_score,
+                is_new=is_new
+            )
+        finally:
+            session.close()
+    
+    def _resolve_turn_conversation(
+        self,
+        session,
+        user_id: str,
+        conversation_id: Optional[str]
+    ) -> Tuple[Optional[Conversation], str]:
+        """The user's live conversation for a turn, or (None, id for a new one).
+
+        Like get_or_create_conversation, only a conversation owned by user_id
+        that has not expired is reused. When the requested id belongs to
+        another user or to an expired conversation, the new one gets a fresh id
+        derived from it (derived_conversation_id).
+        """
+        if not conversation_id:
+            return None, str(uuid.uuid4())
+        conversation = session.query(Conversation).filter_by(
+            id=conversation_id,
+            user_id=user_id
+        ).first()
+        if conversation and not conversation.is_expired:
+            return conversation, conversation_id
+        if conversation or session.query(Conversation.id).filter_by(id=conversation_id).first():
+            return None, derived_conversation_id(conversation_id)
+        return None, conversation_id
+    
     def end_conversation(self, conversation_id: str) -> bool:
         """End a conversation"""
         session = self.get_session()
@@ -204,6 +370,28 @@ class DatabaseService:
         finally:
             session.close()
 
+    def get_session_history(
+        self,
+        session_id: str,
+        user_id: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Message]:
+        """History of the conversation a session's turns were last recorded under.
+
+        That is the session id itself or, when it was expired or taken at the
+        time, a conversation id derived from it; user_id narrows the search to
+        that user's conversations.
+        """
+        session = self.get_session()
+        try:
+            query = session.query(Conversation.id).filter(session_conversation_filter(session_id))
+            if user_id:
+                query = query.filter(Conversation.user_id == user_id)
+            latest = query.order_by(desc(Conversation.last_activity)).first()
+        finally:
+            session.close()
+        return self.get_conversation_history(latest[0], limit) if latest else []
+
     def get_recent_conversations_for_user(
         self,
         user_id: str,
@@ -416,6 +604,7 @@ class DatabaseService:
             device.last_updated = datetime.utcnow()
             
             session.commit()
+            self.invalidate_devices()
             
             return True
         finally:
@@ -448,62 +637,169 @@ class DatabaseService:
             session.add(interaction)
             session.commit()
             session.refresh(interaction)
-            return interaction
         finally:
             session.close()
+        self._refresh_device_usage_rollup_after_write()
+        return interaction
     
     def get_device_usage_stats(
         self, 
         user_id: str = None, 
         device_id: str = None,
-        days: int = 7
+        days: int = 7,
+        use_rollup: bool = None
     ) -> List[Dict]:
-        """Get device usage statistics"""
+        """Get device usage statistics per device and action (aggregated in SQL).
+
+        With use_rollup (default: system.device_usage_rollup_enabled) the hourly
+        per-device rollup table is summed instead of scanning interactions; the
+        window then starts at the beginning of its first hour. The rollup is
+        refreshed when interactions are written, not here, so reads stay cheap.
+        Per-user queries always scan (the rollup has no user dimension).
+        """
+        if use_rollup is None:
+            use_rollup = self.config.system.device_usage_rollup_enabled
+        start_date = datetime.utcnow() - timedelta(days=days)
+        if use_rollup and not user_id:
+            source = DeviceUsageHourly
+            columns = (
+                func.sum(DeviceUsageHourly.count),
+                func.sum(DeviceUsageHourly.success_count),
+                func.max(DeviceUsageHourly.last_used),
+            )
+            window = DeviceUsageHourly.hour >= start_date.replace(minute=0, second=0, microsecond=0)
+        else:
+            source = DeviceInteraction
+            columns = (
+                func.count(DeviceInteraction.id),
+                func.sum(case((DeviceInteraction.success == True, 1), else_=0)),
+                func.max(DeviceInteraction.timestamp),
+            )
+            window = DeviceInteraction.timestamp >= start_date
+
         session = self.get_session()
         try:
-            start_date = datetime.utcnow() - timedelta(days=days)
-            
-            query = session.query(DeviceInteraction).filter(
-                DeviceInteraction.timestamp >= start_date
-            )
-            
+            query = session.query(source.device_id, source.action, *columns).filter(window)
             if user_id:
-                query = query.filter_by(user_id=user_id)
+                query = query.filter(DeviceInteraction.user_id == user_id)
             if device_id:
-                query = query.filter_by(device_id=device_id)
-            
-            interactions = query.all()
-            
-            # Group by device and action
-            stats = {}
-            for interaction in interactions:
-                key = f"{interaction.device_id}_{interaction.action}"
-                if key not in stats:
-                    stats[key] = {
-                        "device_id": interaction.device_id,
-                        "action": interaction.action,
-                        "count": 0,
-                        "success_rate": 0.0,
-                        "last_used": None
+                query = query.filter(source.device_id == device_id)
+            rows = query.group_by(source.device_id, source.action).order_by(
+                source.device_id, source.action
+            ).all()
+
+            return [
+                {
+                    "device_id": row_device_id,
+                    "action": action,
+                    "count": count,
+                    "success_rate": (successes or 0) / count,
+                    "last_used": last_used.isoformat() if last_used else None
+                }
+                for row_device_id, action, count, successes, last_used in rows
+                if count
+            ]
+        finally:
+            session.close()
+
+    def refresh_device_usage_rollup(self) -> int:
+        """Bring device_usage_hourly up to date; returns the number of rollup rows written.
+
+        Incremental: only hours from one hour before the newest rolled-up hour
+        onward are re-aggregated (that margin covers interactions committed late,
+        e.g. by the write-behind queue), so the cost follows new rows, not history.
+        Rows are upserted, so refreshes in other processes never collide; if one
+        is already running in this process it reruns for this call instead.
+        """
+        with _ROLLUP_STATE_LOCK:
+            lock = _ROLLUP_LOCKS.setdefault(self._db_url, threading.Lock())
+            requested = _ROLLUP_REQUESTED.setdefault(self._db_url, threading.Event())
+        requested.set()
+        written = 0
+        while requested.is_set():
+            if not lock.acquire(blocking=False):
+                return written
+            try:
+                requested.clear()
+                written += self._refresh_device_usage_rollup()
+            finally:
+                lock.release()
+        return written
+
+    def _refresh_device_usage_rollup_after_write(self):
+        """Refresh after committed interactions; a failure leaves the rollup for the next write"""
+        if not self.config.system.device_usage_rollup_enabled:
+            return
+        try:
+            self.refresh_device_usage_rollup()
+        except Exception as e:
+            print(f"Error refreshing device usage rollup: {e}")
+
+    def _refresh_device_usage_rollup(self) -> int:
+        session = self.get_session()
+        try:
+            newest = session.query(func.max(DeviceUsageHourly.hour)).scalar()
+            if newest is None:
+                newest = session.query(func.min(DeviceInteraction.timestamp)).scalar()
+                if newest is None:
+                    return 0
+            since = newest.replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+
+            hour = self._hour_bucket(session, DeviceInteraction.timestamp)
+            rows = session.query(
+                hour,
+                DeviceInteraction.device_id,
+                DeviceInteraction.action,
+                func.count(DeviceInteraction.id),
+                func.sum(case((DeviceInteraction.success == True, 1), else_=0)),
+                func.max(DeviceInteraction.timestamp),
+            ).filter(
+                DeviceInteraction.timestamp >= since
+            ).group_by(
+                hour, DeviceInteraction.device_id, DeviceInteraction.action
+            ).all()
+            if not rows:
+                return 0
+
+            values = [
+                {
+                    "hour": bucket if isinstance(bucket, datetime) else datetime.fromisoformat(bucket),
+                    "device_id": row_device_id,
+                    "action": action,
+                    "count": count,
+                    "success_count": successes or 0,
+                    "last_used": last_used
+                }
+                for bucket, row_device_id, action, count, successes, last_used in rows
+            ]
+            dialect = session.get_bind().dialect.name
+            if dialect in ("sqlite", "postgresql"):
+                upsert = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(DeviceUsageHourly)
+                session.execute(upsert.on_conflict_do_update(
+                    index_elements=["hour", "device_id", "action"],
+                    set_={
+                        "count": upsert.excluded.count,
+                        "success_count": upsert.excluded.success_count,
+                        "last_used": upsert.excluded.last_used,
                     }
-                
-                stats[key]["count"] += 1
-                if interaction.success:
-                    stats[key]["success_rate"] += 1
-                stats[key]["last_used"] = max(
-                    stats[key]["last_used"] or interaction.timestamp,
-                    interaction.timestamp
-                )
-            
-            # Calculate success rates
-            for stat in stats.values():
-                stat["success_rate"] = stat["success_rate"] / stat["count"]
-                if stat["last_used"]:
-                    stat["last_used"] = stat["last_used"].isoformat()
-            
-            return list(stats.values())
+                ), values)
+            else:
+                for value in values:
+                    session.merge(DeviceUsageHourly(**value))
+            session.commit()
+            return len(rows)
+        except Exception:
+            session.rollback()
+            raise
         finally:
             session.close()
+
+    @staticmethod
+    def _hour_bucket(session: Session, column):
+        """SQL expression truncating a timestamp to its hour"""
+        if session.get_bind().dialect.name == "sqlite":
+            return func.strftime('%Y-%m-%d %H:00:00', column)
+        return func.date_trunc('hour', column)
     
     # System Settings
     def get_system_setting(self, setting_id: str, default_value: Any = None) -> Any:
@@ -621,15 +917,134 @@ class DatabaseService:
                 user.interaction_count = (user.interaction_count or 0) + 1
                 user.last_seen = datetime.utcnow()
                 # Update familiarity score based on interactions
-                if user.interaction_count <= 10:
-                    user.familiarity_score = min(30, user.interaction_count * 3)
-                elif user.interaction_count <= 30:
-                    user.familiarity_score = min(60, 30 + (user.interaction_count - 10) * 1.5)
-                else:
-                    user.familiarity_score = min(100, 60 + (user.interaction_count - 30) * 0.8)
+                user.familiarity_score = familiarity_for_interactions(user.interaction_count)
                 session.commit()
+                self.invalidate_user(user_id)
+        finally:
+            session.close()
+
+    # Write-behind batches
+    def apply_write_batch(self, writes: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, int]:
+        """Apply queued (kind, payload) writes in one transaction.
+
+        Kinds (see services/write_behind.py):
+          conversation_turn  - user_id, conversation_id: get_or_create_conversation + activity
+          message            - save_message arguments, plus the optional user_id of the turn
+          user_interaction   - user_id: increment_user_interaction
+          device_interaction - log_device_interaction arguments
+        Repeated conversation/user counters are merged; users and conversations
+        are written before the rows that reference them. As in
+        record_conversation_turn, a turn only continues the user's own live
+        conversation; otherwise a new one is started under a fresh id, and the
+        batch's messages and device logs of that turn (matched by user_id and
+        conversation_id) follow it. Returns writes per kind.
+        """
+        turns: Dict[Tuple[str, str], int] = {}
+        interactions: Dict[str, int] = {}
+        messages: List[Dict[str, Any]] = []
+        device_logs: List[Dict[str, Any]] = []
+        applied = {"conversation_turn": 0, "message": 0, "user_interaction": 0, "device_interaction": 0}
+        for kind, payload in writes:
+            if kind == "conversation_turn":
+                key = (payload["user_id"], payload["conversation_id"])
+                turns[key] = turns.get(key, 0) + 1
+            elif kind == "user_interaction":
+                interactions[payload["user_id"]] = interactions.get(payload["user_id"], 0) + 1
+            elif kind == "message":
+                messages.append(payload)
+            elif kind == "device_interaction":
+                device_logs.append(payload)
+            else:
+                raise ValueError(f"Unknown write kind: {kind}")
+            applied[kind] += 1
+
+        session = self.get_session()
+        try:
+            now = datetime.utcnow()
+            user_ids = (
+                {user_id for user_id, _ in turns}
+                | set(interactions)
+                | {payload["user_id"] for payload in device_logs}
+            )
+            users = {
+                user.id: user
+                for user in session.query(User).filter(User.id.in_(user_ids))
+            } if user_ids else {}
+            for user_id in user_ids - users.keys():
+                users[user_id] = User(
+                    id=user_id,
+                    username=user_id,
+                    familiarity_score=self.config.system.default_familiarity_score
+                )
+                session.add(users[user_id])
+
+            resolved_ids: Dict[Tuple[str, str], str] = {}
+            for (user_id, conversation_id), count in turns.items():
+                conversation, resolved_ids[(user_id, conversation_id)] = self._resolve_turn_conversation(
+                    session, user_id, conversation_id
+                )
+                if conversation is None:
+                    session.add(Conversation(
+                        id=resolved_ids[(user_id, conversation_id)],
+                        user_id=user_id,
+                        title=f"对话 {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                        message_count=count,
+                        last_activity=now
+                    ))
+                else:
+                    conversation.last_activity = now
+                    conversation.message_count = (conversation.message_count or 0) + count
+                users[user_id].last_seen = now
+                # The next turn's lookup must see this conversation
+                session.flush()
+
+            def conversation_for(payload):
+                key = (payload.get("user_id"), payload.get("conversation_id"))
+                return resolved_ids.get(key, payload.get("conversation_id"))
+
+            for user_id, count in interactions.items():
+                user = users[user_id]
+                user.interaction_count = (user.interaction_count or 0) + count
+                user.last_seen = now
+                user.familiarity_score = familiarity_for_interactions(user.interaction_count)
+
+            session.add_all(
+                Message(
+                    conversation_id=conversation_for(payload),
+                    user_input=payload.get("user_input"),
+                    assistant_response=payload.get("assistant_response"),
+                    tone_used=payload.get("tone_used"),
+                    intent_detected=payload.get("intent_detected") or {},
+                    tools_used=payload.get("tools_used") or [],
+                    langfuse_trace_id=payload.get("langfuse_trace_id"),
+                    processing_time_ms=payload.get("processing_time_ms")
+                )
+                for payload in messages
+            )
+            session.add_all(
+                DeviceInteraction(
+                    user_id=payload["user_id"],
+                    device_id=payload["device_id"],
+                    action=payload["action"],
+                    parameters=payload.get("parameters") or {},
+                    result=payload.get("result") or {},
+                    success=payload.get("success", True),
+                    conversation_id=conversation_for(payload),
+                    error_message=payload.get("error_message")
+                )
+                for payload in device_logs
+            )
+            session.commit()
+            for user_id in user_ids:
+                self.invalidate_user(user_id)
+        except Exception:
+            session.rollback()
+            raise
         finally:
             session.close()
+        if device_logs:
+            self._refresh_device_usage_rollup_after_write()
+        return applied
 
     # Enhanced User Management
     def update_user(self, user_id: str, **updates) -> bool:
@@ -648,6 +1063,7 @@ class DatabaseService:
             
             user.updated_at = datetime.utcnow()
             session.commit()
+            self.invalidate_user(user_id)
             return True
         except Exception as e:
             session.rollback()
@@ -671,6 +1087,7 @@ class DatabaseService:
                 session.delete(user)
             
             session.commit()
+            self.invalidate_user(user_id)
             return True
         except Exception as e:
             session.rollback()
@@ -703,6 +1120,7 @@ class DatabaseService:
             device = Device(**device_data)
             session.add(device)
             session.commit()
+            self.invalidate_devices()
             session.refresh(device)
             return device
         except Exception as e:
@@ -729,6 +1147,7 @@ class DatabaseService:
             
             device.last_updated = datetime.utcnow()
             session.commit()
+            self.invalidate_devices()
             return True
         except Exception as e:
             session.rollback()
@@ -752,6 +1171,7 @@ class DatabaseService:
                 session.delete(device)
             
             session.commit()
+            self.invalidate_devices()
             return True
         except Exception as e:
             session.rollback()
@@ -810,6 +1230,8 @@ class DatabaseService:
                     results["errors"].append(f"Error creating user {user_data.get('username', 'unknown')}: {e}")
             
             session.commit()
+            # New users may have been looked up (and cached as missing) before
+            self.invalidate_user()
         except Exception as e:
             session.rollback()
             results["errors"].append(f"Bulk operation failed: {e}")
@@ -840,6 +1262,7 @@ class DatabaseService:
                     results["errors"].append(f"Error creating device {device_data.get('id', 'unknown')}: {e}")
             
             session.commit()
+            self.invalidate_devices()
         except Exception as e:
             session.rollback()
             results["errors"].append(f"Bulk operation failed: {e}")
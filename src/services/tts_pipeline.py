@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Sentence-pipelined TTS
+ - Reply text is split on sentence/ellipsis boundaries as it streams in
+ - Each sentence is synthesized in a bounded-parallel task using the
+   provider's streaming endpoint
+ - Audio is delivered strictly in sentence order; the first sentence's bytes
+   go out as soon as the provider sends them, later sentences are buffered
+ - Only frame-based formats (MP3) can be joined into one file afterwards;
+   for others the whole reply is synthesized again as a single clip
+"""
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from ..utils.text_formatting import SentenceSplitter
+from .agora_tts_service import AgoraTTSService
+
+
+# Marks the end of one sentence's audio in its queue
+_SENTENCE_DONE = None
+
+# File extensions whose per-sentence streams concatenate into a valid file
+# (WAV/PCM carry a header per stream, Opus/AAC need container rewriting)
+CONCATENABLE_AUDIO_FORMATS = ("mp3",)
+
+
+class TTSSentencePipeline:
+    """
+    Bounded-parallel, in-order TTS for one reply
+
+    Usage: feed() text as it is generated, collect ready_chunks() between
+    tokens, then close() and drain chunks(). Each chunk is
+    {"index": sentence index, "text": sentence, "audio": bytes}.
+    """
+
+    def __init__(
+        self,
+        tts: AgoraTTSService,
+        voice: Optional[str] = None,
+        audio_format: Optional[str] = None,
+        max_parallel: int = 3,
+        max_chars: int = 80
+    ):
+        self.tts = tts
+        self.voice = voice
+        self.audio_format = audio_format
+        self.logger = logging.getLogger(__name__)
+        self._splitter = SentenceSplitter(max_chars=max_chars)
+        self._semaphore = asyncio.Semaphore(max(1, max_parallel))
+        self.sentences: List[str] = []
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._audio: List[List[bytes]] = []
+        self._failed: Set[int] = set()
+        self._next = 0  # Sentence currently being delivered
+        self._closed = False
+
+    # Input -------------------------------------------------------------------
+
+    def feed(self, text: str):
+        """Add reply text; completed sentences start synthesizing immediately"""
+        for sentence in self._splitter.feed(text):
+            self._submit(sentence)
+
+    def close(self):
+        """The reply is complete; submit the trailing sentence"""
+        if self._closed:
+            return
+        self._closed = True
+        for sentence in self._splitter.flush():
+            self._submit(sentence)
+
+    def _submit(self, sentence: str):
+        index = len(self.sentences)
+        queue: asyncio.Queue = asyncio.Queue()
+        self.sentences.append(sentence)
+        self._queues.append(queue)
+        self._audio.append([])
+        self._tasks.append(asyncio.create_task(self._synthesize(index, sentence, queue)))
+
+    async def _synthesize(self, index: int, sentence: str, queue: asyncio.Queue):
+        # Semaphore waiters are served in order, so earlier sentences start first
+        async with self._semaphore:
+            try:
+                async for piece in self.tts.stream_speech(sentence, voice=self.voice, audio_format=self.audio_format):
+                    await queue.put(piece)
+            except Exception as e:
+                self._failed.add(index)
+                self.logger.error(f"Sentence {index} TTS failed: {e}")
+            finally:
+                await queue.put(_SENTENCE_DONE)
+
+    # Output ------------------------------------------------------------------
+
+    def _chunk(self, piece: bytes) -> Dict[str, Any]:
+        self._audio[self._next].append(piece)
+        return {"index": self._next, "text": self.sentences[self._next], "audio": piece}
+
+    def ready_chunks(self) -> List[Dict[str, Any]]:
+        """In-order audio available right now, without waiting"""
+        chunks = []
+        while self._next < len(self._queues):
+            queue = self._queues[self._next]
+            try:
+                piece = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if piece is _SENTENCE_DONE:
+                self._next += 1
+            else:
+                chunks.append(self._chunk(piece))
+        return chunks
+
+    async def chunks(self) -> AsyncIterator[Dict[str, Any]]:
+        """Remaining audio in order, waiting for each sentence (closes the pipeline)"""
+        self.close()
+        while self._next < len(self._queues):
+            piece = await self._queues[self._next].get()
+            if piece is _SENTENCE_DONE:
+                self._next += 1
+            else:
+                yield self._chunk(piece)
+
+    @property
+    def audio(self) -> bytes:
+        """All audio delivered so far, concatenated in sentence order
+
+        Only a valid file for CONCATENABLE_AUDIO_FORMATS.
+        """
+        return b"".join(b"".join(pieces) for pieces in self._audio)
+
+    @property
+    def failed_sentences(self) -> List[int]:
+        """Delivered sentences whose synthesis failed or produced no audio"""
+        return [i for i in range(self._next) if i in self._failed or not self._audio[i]]
+
+    def cancel(self):
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,117 @@
+"""
+Read-through cache for user profile fields
+get_user_familiarity / get_user_metadata are called several times per turn
+(context loading in each graph node, API handlers); the profile row is read
+once and served from memory until a user write in this process invalidates
+it or the TTL (which bounds writes from other processes) expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class UserProfileCache:
+    """TTL + LRU cache of user profile dicts, keyed by user id"""
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Invalidation clock and the generation of each user's last invalidation,
+        # so a read that raced a write to the same user is not stored. Users
+        # trimmed from _invalidated_at fall back to _floor (at worst one extra miss).
+        self._generation = 0
+        self._invalidated_at: "OrderedDict[str, int]" = OrderedDict()
+        self._floor = 0
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0, "evictions": 0}
+
+    @property
+    def generation(self) -> int:
+        """Take before reading the database; pass to set()"""
+        return self._generation
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Cached profile ({} for a user that does not exist), or None on miss"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, profile = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(user_id)
+                    self.stats["hits"] += 1
+                    return dict(profile)
+                del self._entries[user_id]
+                self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, user_id: str, profile: Dict[str, Any], generation: int):
+        """Store a profile read at `generation`; dropped if the user was invalidated since"""
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if max(self._floor, self._invalidated_at.get(user_id, 0)) > generation:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, dict(profile))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Forget one user, or every user when user_id is None (bulk imports)"""
+        with self._lock:
+            self._generation += 1
+            self.stats["invalidations"] += 1
+            if user_id is None:
+                self._entries.clear()
+                self._invalidated_at.clear()
+                self._floor = self._generation
+            else:
+                self._entries.pop(user_id, None)
+                self._invalidated_at[user_id] = self._generation
+                self._invalidated_at.move_to_end(user_id)
+                while len(self._invalidated_at) > self.max_entries:
+                    _, trimmed = self._invalidated_at.popitem(last=False)
+                    self._floor = max(self._floor, trimmed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# One cache per database URL, shared by every DatabaseService in the process
+_USER_PROFILE_CACHES: Dict[str, UserProfileCache] = {}
+_USER_PROFILE_CACHES_LOCK = threading.Lock()
+
+
+def get_user_profile_cache(database_url: str, ttl_seconds: float = 30.0,
+                           max_entries: int = 10000) -> UserProfileCache:
+    """Return the process-wide profile cache for a database"""
+    with _USER_PROFILE_CACHES_LOCK:
+        cache = _USER_PROFILE_CACHES.get(database_url)
+        if cache is None:
+            cache = _USER_PROFILE_CACHES[database_url] = UserProfileCache(ttl_seconds, max_entries)
+        return cache
+
+
+def get_user_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters summed over every profile cache"""
+    totals = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0, "evictions": 0, "entries": 0}
+    with _USER_PROFILE_CACHES_LOCK:
+        caches = list(_USER_PROFILE_CACHES.values())
+    for cache in caches:
+        stats = cache.get_stats()
+        for key in totals:
+            totals[key] += stats[key]
+    lookups = totals["hits"] + totals["misses"]
+    totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+    return totals
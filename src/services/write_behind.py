@@ -0,0 +1,207 @@
+"""
+Write-behind queue for per-turn bookkeeping writes
+Messages, conversation activity, interaction counters and device-interaction
+logs are queued by the request and committed later in batched transactions
+(DatabaseService.apply_write_batch), so reply latency no longer includes
+these commits and commit overhead is shared by every in-flight turn.
+
+Flushing
+ - when `batch_size` writes are pending, or `flush_interval` seconds after
+   the first write of a batch, by a background task on the event loop
+ - on close() (API shutdown) and whenever flush() is awaited
+
+Backpressure
+ - at most `max_pending` writes are held; a producer that finds the queue
+   full flushes it itself before its write is accepted
+
+Crash safety
+ - a write is acknowledged when queued, not when committed: if the process
+   dies without a clean shutdown, writes still pending are lost (at most
+   `max_pending` writes, normally under `flush_interval` seconds of turns)
+ - each batch is one transaction; a batch that fails is bisected and the
+   halves applied separately, so one bad write (e.g. a foreign-key
+   violation) only holds back itself. Writes that still fail on their own
+   are put back at the front of the queue and retried up to `max_attempts`
+   times, then dropped and counted in `dropped`. When the database is down
+   this costs up to 2 * batch_size - 1 attempts per flush. A commit that
+   fails ambiguously (connection lost during COMMIT) may be applied twice.
+ - state other requests read back stays synchronous: device state
+   (update_device_state) and the conversation turn recorded for the reply
+   (record_conversation_turn) are not queued
+"""
+import asyncio
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+
+WRITE_KINDS = ("conversation_turn", "message", "user_interaction", "device_interaction")
+
+
+@dataclass
+class PendingWrite:
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int = 0
+
+
+class WriteBehindQueue:
+    """Batches queued writes into one transaction per flush (one queue per event loop and database)"""
+
+    def __init__(
+        self,
+        apply_batch: Callable[[List[Tuple[str, Dict[str, Any]]]], Awaitable[Any]],
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_pending: int = 1000,
+        max_attempts: int = 3
+    ):
+        self.apply_batch = apply_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max(max_pending, batch_size)
+        self.max_attempts = max_attempts
+        self.logger = logging.getLogger(__name__)
+        self._pending: List[PendingWrite] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+        self.stats = {
+            "queued": 0,
+            "written": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "dropped": 0,
+            "backpressure_flushes": 0,
+        }
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def put(self, kind: str, **payload):
+        """Queue one write; returns once it is accepted (not committed)"""
+        if kind not in WRITE_KINDS:
+            raise ValueError(f"Unknown write kind: {kind}")
+        if self._closed:
+            # Late writes after shutdown started go straight to the database
+            await self.apply_batch([(kind, payload)])
+            return
+        while len(self._pending) >= self.max_pending:
+            self.stats["backpressure_flushes"] += 1
+            await self.flush()
+        self._pending.append(PendingWrite(kind, payload))
+        self.stats["queued"] += 1
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._pending:
+                # Idle: let the task finish; the next put() starts a new one
+                return
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Commit pending writes in batches of batch_size; returns the number written"""
+        written = 0
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:len(batch)]
+                applied, retry = await self._apply(batch)
+                written += applied
+                if retry:
+                    # Retried on the next flush, ahead of newer writes
+                    self._pending[:0] = retry
+                    self.logger.warning(f"Write-behind flush: {len(retry)} of {len(batch)} writes requeued")
+                    break
+        return written
+
+    async def _apply(self, batch: List[PendingWrite]) -> Tuple[int, List[PendingWrite]]:
+        """Apply a batch, bisecting on failure; returns (written, writes to retry)"""
+        try:
+            await self.apply_batch([(write.kind, write.payload) for write in batch])
+        except Exception as e:
+            self.stats["failed_batches"] += 1
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                written_head, retry_head = await self._apply(batch[:middle])
+                written_tail, retry_tail = await self._apply(batch[middle:])
+                return written_head + written_tail, retry_head + retry_tail
+            write = batch[0]
+            write.attempts += 1
+            if write.attempts < self.max_attempts:
+                return 0, [write]
+            self.stats["dropped"] += 1
+            self.logger.error(f"Write-behind dropped a {write.kind} write after {write.attempts} attempts: {e}")
+            return 0, []
+        self.stats["batches"] += 1
+        self.stats["written"] += len(batch)
+        return len(batch), []
+
+    async def close(self):
+        """Stop the background task and flush what is pending (graceful shutdown)"""
+        self._closed = True
+        self._wakeup.set()
+        if self._worker is not None:
+            try:
+                await self._worker
+            except Exception as e:
+                self.logger.error(f"Write-behind worker failed: {e}")
+            self._worker = None
+        # Failed batches are retried here until written or dropped
+        while self._pending:
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "max_pending": self.max_pending,
+        }
+
+
+# asyncio primitives are loop-bound, so queues are shared per event loop
+_WRITE_QUEUES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, WriteBehindQueue]]" = weakref.WeakKeyDictionary()
+
+
+def get_shared_write_behind_queue(key: str, factory: Callable[[], WriteBehindQueue]) -> WriteBehindQueue:
+    """Return the queue for `key` (the database URL) on the running loop"""
+    queues = _WRITE_QUEUES.setdefault(asyncio.get_running_loop(), {})
+    queue = queues.get(key)
+    if queue is None:
+        queue = queues[key] = factory()
+    return queue
+
+
+async def close_shared_write_behind_queues():
+    """Flush and close the queues owned by the running loop (server shutdown, tests)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    for queue in _WRITE_QUEUES.pop(loop, {}).values():
+        await queue.close()
+
+
+def get_write_behind_stats() -> Dict[str, Any]:
+    """Counters of every live write-behind queue, keyed by database URL"""
+    stats: Dict[str, Any] = {}
+    for queues in list(_WRITE_QUEUES.values()):
+        for key, queue in queues.items():
+            stats[make_url(key).render_as_string(hide_password=True)] = queue.get_stats()
+    return stats
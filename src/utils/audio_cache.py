@@ -1,17 +1,26 @@
 #!/usr/bin/env python3
 """
 Audio cache utilities
- - Decode base64 audio data and persist as MP3 files under cached_audio
- - Optionally upload files to a free temporary hosting service to obtain a shareable URL
+ - Persist synthesized audio (raw bytes, or legacy base64) as files under cached_audio
  - Construct local static URLs served by FastAPI (mounted at /cached_audio)
+ - AudioCacheManager bounds the per-reply files by bytes and age (LRU on last access)
 """
 
+import asyncio
 import base64
+import logging
 import os
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple, Union
+
+import aiofiles
+
+from .config import AudioCacheConfig
 
 
 # Absolute path to the repository root (three levels up from this file)
@@ -38,32 +47,53 @@ def _sanitize_base64(data: str) -> str:
     return data
 
 
-def save_base64_mp3_to_cache(base64_audio: str, filename_hint: Optional[str] = None) -> Tuple[str, str]:
-    """
-    Save base64-encoded MP3 bytes into cached_audio directory.
-
-    Returns:
-      (absolute_file_path, relative_url_path)
-    where relative_url_path is suitable to be prefixed by FastAPI base URL (e.g., /cached_audio/<file>.mp3)
-    """
+def _new_cache_file(filename_hint: Optional[str], extension: str = "mp3") -> Tuple[Path, str]:
+    """Unique file under cached_audio and its relative URL"""
     ensure_cache_dir()
 
     safe_hint = (filename_hint or "audio").strip().replace(" ", "_")[:40]
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     unique_id = uuid.uuid4().hex[:8]
-    filename = f"{safe_hint}_{timestamp}_{unique_id}.mp3"
-    file_path = CACHE_DIR / filename
+    filename = f"{safe_hint}_{timestamp}_{unique_id}.{extension or 'mp3'}"
 
-    payload = _sanitize_base64(base64_audio)
-    audio_bytes = base64.b64decode(payload)
+    # Relative URL (served by FastAPI StaticFiles mounted at /cached_audio)
+    return CACHE_DIR / filename, f"/cached_audio/{filename}"
+
+
+def save_mp3_bytes_to_cache(audio_bytes: bytes, filename_hint: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Save raw MP3 bytes into cached_audio directory.
+
+    Returns:
+      (absolute_file_path, relative_url_path)
+    where relative_url_path is suitable to be prefixed by FastAPI base URL (e.g., /cached_audio/<file>.mp3)
+    """
+    file_path, url_path = _new_cache_file(filename_hint)
     with open(file_path, "wb") as f:
         f.write(audio_bytes)
+    _track_new_file(file_path, len(audio_bytes))
+    return str(file_path), url_path
 
-    # Relative URL (served by FastAPI StaticFiles mounted at /cached_audio)
-    url_path = f"/cached_audio/{filename}"
+
+async def write_audio_to_cache(
+    audio: Union[bytes, memoryview],
+    filename_hint: Optional[str] = None,
+    extension: str = "mp3"
+) -> Tuple[str, str]:
+    """Async variant of save_mp3_bytes_to_cache; the write runs off the event loop."""
+    file_path, url_path = _new_cache_file(filename_hint, extension)
+    async with aiofiles.open(file_path, "wb") as f:
+        await f.write(audio)
+    _track_new_file(file_path, len(audio) if isinstance(audio, bytes) else audio.nbytes)
     return str(file_path), url_path
 
 
+def save_base64_mp3_to_cache(base64_audio: str, filename_hint: Optional[str] = None) -> Tuple[str, str]:
+    """Decode base64-encoded MP3 data and save it via save_mp3_bytes_to_cache."""
+    payload = _sanitize_base64(base64_audio)
+    return save_mp3_bytes_to_cache(base64.b64decode(payload), filename_hint=filename_hint)
+
+
 def make_absolute_url(relative_url: str, public_base_url: Optional[str]) -> Optional[str]:
     """Compose absolute URL from public base if provided; else None."""
     if not relative_url:
@@ -76,67 +106,194 @@ def make_absolute_url(relative_url: str, public_base_url: Optional[str]) -> Opti
     return None
 
 
-def try_upload_temp_cloud(file_path: str, preferred_host: Optional[str] = None) -> Optional[str]:
+class AudioCacheManager:
     """
-    Best-effort upload to a free temporary file hosting service.
-    Attempts preferred host first if provided, then transfer.sh (PUT), then file.io.
-    Returns a public URL on success, or None on failure.
+    Byte quota and maximum age for files directly under cached_audio.
+
+    Subdirectories (e.g. the content-addressed tts/ cache) bound themselves
+    and are left alone. The index lives in memory, least recently accessed
+    first; it is rebuilt from one directory scan at start and eviction runs
+    in a background task.
     """
-    # Lazy import requests if available; otherwise skip
-    try:
-        import requests  # type: ignore
-    except Exception:
-        return None
 
-    try:
-        filename = os.path.basename(file_path)
+    def __init__(
+        self,
+        directory: Path = CACHE_DIR,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_age_seconds: float = 24 * 3600,
+        sweep_interval_seconds: float = 300.0
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max(1, max_bytes)
+        self.max_age_seconds = max_age_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # filename -> (size, last access time), least recently accessed first
+        self._index: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"scans": 0, "sweeps": 0, "evicted_quota": 0, "evicted_age": 0, "bytes_evicted": 0}
+
+    def scan(self):
+        """Rebuild the index from the directory (access time, falling back to mtime)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries.append((max(stat.st_atime, stat.st_mtime), entry.name, stat.st_size))
+        with self._lock:
+            self._index = OrderedDict((name, (size, accessed)) for accessed, name, size in sorted(entries))
+            self._bytes = sum(size for size, _ in self._index.values())
+            self.stats["scans"] += 1
+
+    def register(self, path: Union[str, Path], size: int):
+        """Record a newly written file; wakes the sweeper when over quota"""
+        path = Path(path)
+        if path.parent != self.directory:
+            return
+        with self._lock:
+            previous = self._index.pop(path.name, None)
+            if previous:
+                self._bytes -= previous[0]
+            self._index[path.name] = (size, time.time())
+            self._bytes += size
+            over_quota = self._bytes > self.max_bytes
+        if over_quota:
+            self._request_sweep()
+
+    def touch(self, filename: str):
+        """Mark a file as just read (served or re-used)"""
+        with self._lock:
+            entry = self._index.get(filename)
+            if entry is None:
+                return
+            self._index[filename] = (entry[0], time.time())
+            self._index.move_to_end(filename)
 
-        # Only use catbox.moe as requested
-        def _upload_once(timeout_s: int = 120) -> Optional[str]:
+    def evict(self, now: Optional[float] = None) -> int:
+        """Delete expired files, then least recently accessed ones until under quota"""
+        now = now if now is not None else time.time()
+        victims = []
+        with self._lock:
+            cutoff = now - self.max_age_seconds
+            for name, (size, accessed) in list(self._index.items()):
+                if accessed >= cutoff:
+                    break  # Index is in access order; the rest are newer
+                victims.append((name, size, "evicted_age"))
+                del self._index[name]
+                self._bytes -= size
+            while self._bytes > self.max_bytes and self._index:
+                name, (size, _) = self._index.popitem(last=False)
+                victims.append((name, size, "evicted_quota"))
+                self._bytes -= size
+            for _, size, reason in victims:
+                self.stats[reason] += 1
+                self.stats["bytes_evicted"] += size
+            self.stats["sweeps"] += 1
+
+        for name, _, _ in victims:
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                self.logger.warning("Failed to evict cached audio %s: %s", name, exc)
+        return len(victims)
+
+    # Background sweeper ------------------------------------------------------
+
+    async def start(self):
+        """Scan the directory and start the background sweeper on the running loop"""
+        if self._task is not None and not self._task.done():
+            return
+        await asyncio.to_thread(self.scan)
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
             try:
-                with open(file_path, "rb") as fh:
-                    resp = requests.post(
-                        "https://catbox.moe/user/api.php",
-                        data={"reqtype": "fileupload"},
-                        files={"fileToUpload": (filename, fh)},
-                        timeout=timeout_s
-                    )
-                if resp.ok:
-                    url_candidate = resp.text.strip()
-                    if url_candidate.startswith("http"):
-                        return url_candidate
-            except Exception:
-                return None
-            return None
-
-        def _verify_size(url: str) -> bool:
+                evicted = await asyncio.to_thread(self.evict)
+                if evicted:
+                    self.logger.info("Evicted %d cached audio files", evicted)
+            except Exception as exc:
+                self.logger.warning("Cached audio sweep failed: %s", exc)
+            self._wake.clear()
             try:
-                local_size = os.path.getsize(file_path)
-                head = requests.head(url, allow_redirects=True, timeout=20)
-                remote_size_str = head.headers.get("Content-Length")
-                if not remote_size_str:
-                    return True  # cannot verify; assume OK
-                remote_size = int(remote_size_str)
-                # Consider OK if remote >= 98% of local (some hosts re-encode headers)
-                return remote_size >= int(local_size * 0.98)
-            except Exception:
-                return True  # on any error, don't block
-
-        # First attempt
-        url = _upload_once(timeout_s=120)
-        if url and _verify_size(url):
-            return url
-        # Retry once if size mismatch or upload failed
-        url = _upload_once(timeout_s=180)
-        if url and _verify_size(url):
-            return url
-        return url
-
-        # No fallbacks per user request
-
-    except Exception:
-        return None
+                await asyncio.wait_for(self._wake.wait(), timeout=self.sweep_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
 
-    return None
+    def _request_sweep(self):
+        if self._loop is None or self._wake is None or self._loop.is_closed():
+            return
+        try:
+            if asyncio.get_running_loop() is self._loop:
+                self._wake.set()
+                return
+        except RuntimeError:
+            pass
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                "files": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age_seconds,
+                "running": self._task is not None and not self._task.done(),
+            })
+        return stats
+
+
+# Process-wide manager; writers register new files with it once it exists
+_AUDIO_CACHE_MANAGER: Optional[AudioCacheManager] = None
+
+
+def _track_new_file(path: Path, size: int):
+    if _AUDIO_CACHE_MANAGER is not None:
+        _AUDIO_CACHE_MANAGER.register(path, size)
+
+
+def get_audio_cache_manager(cache_config: Optional[AudioCacheConfig] = None) -> AudioCacheManager:
+    """Return the process-wide cached_audio manager, creating it on first use"""
+    global _AUDIO_CACHE_MANAGER
+    if _AUDIO_CACHE_MANAGER is None:
+        cache_config = cache_config or AudioCacheConfig()
+        _AUDIO_CACHE_MANAGER = AudioCacheManager(
+            CACHE_DIR,
+            max_bytes=cache_config.max_bytes,
+            max_age_seconds=cache_config.max_age_seconds,
+            sweep_interval_seconds=cache_config.sweep_interval_seconds
+        )
+    return _AUDIO_CACHE_MANAGER
+
+
+def touch_cached_audio(relative_path: str):
+    """Record a read of /cached_audio/<relative_path> for LRU eviction"""
+    if _AUDIO_CACHE_MANAGER is not None and "/" not in relative_path.strip("/"):
+        _AUDIO_CACHE_MANAGER.touch(relative_path.strip("/"))
 
 
+def get_audio_cache_stats() -> Dict[str, Any]:
+    """Disk usage and eviction counters for cached_audio (empty until the manager exists)"""
+    return _AUDIO_CACHE_MANAGER.get_stats() if _AUDIO_CACHE_MANAGER is not None else {}
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Audio handles
+ - Carry synthesized audio through the workflow as raw bytes or a cached file
+   instead of a base64 string
+ - In-memory audio is written to disk once, asynchronously
+ - Base64 is produced only when a client asks for inline audio
+"""
+import base64
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import aiofiles
+
+from .audio_cache import write_audio_to_cache
+
+
+@dataclass
+class AudioHandle:
+    """Synthesized audio held in memory (zero-copy view), on disk, or both"""
+    format: str = "mp3"
+    data: Optional[memoryview] = field(default=None, repr=False)
+    path: Optional[str] = None
+    url: Optional[str] = None  # Relative URL served under /cached_audio
+
+    @classmethod
+    def from_bytes(cls, audio: Union[bytes, bytearray, memoryview], audio_format: str = "mp3") -> "AudioHandle":
+        return cls(format=audio_format or "mp3", data=memoryview(audio))
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], url: Optional[str] = None, audio_format: str = "mp3") -> "AudioHandle":
+        return cls(format=audio_format or "mp3", path=str(path), url=url)
+
+    @property
+    def on_disk(self) -> bool:
+        return self.path is not None
+
+    @property
+    def size(self) -> int:
+        if self.data is not None:
+            return self.data.nbytes
+        try:
+            return os.path.getsize(self.path) if self.path else 0
+        except OSError:
+            return 0
+
+    async def read(self) -> bytes:
+        """Audio bytes, from memory or read from disk off the event loop"""
+        if self.data is not None:
+            return self.data.tobytes()
+        if not self.path:
+            return b""
+        async with aiofiles.open(self.path, "rb") as f:
+            return await f.read()
+
+    async def persist(self, filename_hint: Optional[str] = None) -> "AudioHandle":
+        """
+        Write in-memory audio under cached_audio.
+
+        Returns a disk-backed handle without the bytes; handles already on
+        disk are returned unchanged.
+        """
+        if self.on_disk:
+            return self
+        if self.data is None:
+            raise ValueError("Audio handle has neither data nor path")
+        path, url = await write_audio_to_cache(self.data, filename_hint=filename_hint, extension=self.format)
+        return AudioHandle.from_file(path, url, self.format)
+
+    async def to_base64(self) -> str:
+        if self.data is not None:
+            return base64.b64encode(self.data).decode()
+        return base64.b64encode(await self.read()).decode()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Metadata only (never the bytes), safe for logs and JSON payloads"""
+        return {"format": self.format, "path": self.path, "url": self.url, "size": self.size}
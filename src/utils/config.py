@@ -3,7 +3,7 @@ Configuration management for the Smart Home AI Assistant
 """
 import json
 import os
-from typing import Optional
+from typing import Optional, Tuple
 from dataclasses import dataclass, field
 from pathlib import Path
 from dotenv import load_dotenv
@@ -19,6 +19,12 @@ class DatabaseConfig:
     pool_size: int = 5
     max_overflow: int = 10
     pool_pre_ping: bool = True
+    async_enabled: bool = True  # Request-path queries via aiosqlite/asyncpg when installed
+    # Write-behind queue for messages, counters and interaction logs (services/write_behind.py)
+    write_behind_enabled: bool = True
+    write_behind_batch_size: int = 100
+    write_behind_flush_interval: float = 0.5  # Seconds
+    write_behind_max_pending: int = 1000
 
 @dataclass
 class LangfuseConfig:
@@ -35,6 +41,10 @@ class AnthropicConfig:
     model: str = "claude-3-sonnet-20240229"
     max_tokens: int = 1000
     timeout: int = 60
+    max_concurrent_requests: int = 16  # In-flight request cap shared by all clients in the process
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    prompt_caching: bool = True  # Mark static system prompt prefixes with cache_control
 
 @dataclass
 class GeminiConfig:
@@ -44,6 +54,7 @@ class GeminiConfig:
     base_url: str = "https://generativelanguage.googleapis.com/v1beta/"
     max_tokens: int = 100000
     timeout: int = 60
+    model_cache_size: int = 64  # GenerativeModel objects kept per (system instruction, safety settings)
 
 @dataclass
 class LLMConfig:
@@ -51,6 +62,26 @@ class LLMConfig:
     provider: str = "gemini"  # Options: anthropic, gemini
     enabled: bool = True
 
+@dataclass
+class LLMCacheConfig:
+    """LLM response cache configuration"""
+    enabled: bool = True
+    backend: str = "memory"  # Options: memory, sqlite
+    max_entries: int = 1024
+    ttl_seconds: int = 600
+    max_temperature: float = 0.4  # Only calls at or below this temperature are cached
+    sqlite_path: str = "cache/llm_cache.sqlite"
+
+@dataclass
+class CheckpointConfig:
+    """LangGraph checkpointer configuration"""
+    backend: str = "memory"  # Options: memory, sqlite
+    max_threads: int = 1000  # Sessions kept; least recently used are dropped
+    max_checkpoints_per_thread: int = 4
+    max_age_minutes: int = 60  # Sessions idle longer than this are dropped
+    strip_fields: Tuple[str, ...] = ("audio_data",)  # Large payloads never checkpointed
+    sqlite_path: str = "cache/checkpoints.sqlite"
+
 @dataclass
 class SystemConfig:
     """System-wide configuration"""
@@ -63,10 +94,31 @@ class SystemConfig:
     default_familiarity_score: int = 25
     min_familiarity_for_hardware: int = 40
     
+    # Rule-based fast path for simple device commands (skips the LLM)
+    fast_intent_enabled: bool = True
+    fast_intent_min_confidence: float = 0.9
+
+    # Cached device catalog; in-process device writes invalidate it at once,
+    # the age limit covers writes from other processes
+    device_catalog_max_age_seconds: float = 300.0
+    # Device list in device-control prompts: most relevant devices first,
+    # cut off at this many estimated tokens / devices
+    device_context_token_budget: int = 1500
+    device_context_max_devices: int = 50
+    # User profile cache (familiarity, metadata); in-process user writes
+    # invalidate it at once, the TTL covers writes from other processes
+    user_cache_ttl_seconds: float = 30.0
+    user_cache_max_entries: int = 10000
+    # Serve device usage analytics from the hourly rollup table (window
+    # start rounded down to the hour, refreshed as interactions are written)
+    # instead of scanning device_interactions
+    device_usage_rollup_enabled: bool = False
+    
     # Conversation context configuration
     max_conversation_turns: int = 20  # Maximum turns to keep in memory for LLM context
     max_history_storage: int = 100   # Maximum turns to store in database (unlimited if -1)
     conversation_context_window: int = 8000  # Token limit for conversation context
+    conversation_summary_tokens: int = 400  # Part of the window kept for a summary of trimmed turns (0 disables)
 
     # Temporary audio upload
     temp_upload_enabled: bool = True
@@ -113,6 +165,44 @@ class TTSConfig:
     enabled: bool = True
     default_voice: Optional[str] = None
     audio_format: str = "mp3"
+    # Shared HTTP connection pool for provider requests
+    connection_limit: int = 100
+    connection_limit_per_host: int = 16
+    keepalive_timeout: float = 60.0  # Seconds an idle connection is kept open
+    dns_cache_ttl: int = 300
+    request_timeout: float = 60.0
+    # Sentence-pipelined synthesis for streamed replies
+    pipelined_streaming: bool = True
+    pipeline_max_parallel: int = 3  # Sentences synthesized concurrently
+    sentence_max_chars: int = 80  # Longer runs are cut at a comma or space
+
+@dataclass
+class TTSCacheConfig:
+    """Content-addressed cache of synthesized audio (memory + cached_audio/<subdirectory>)"""
+    enabled: bool = True
+    memory_max_bytes: int = 16 * 1024 * 1024
+    disk_max_bytes: int = 256 * 1024 * 1024
+    subdirectory: str = "tts"
+
+@dataclass
+class AudioCacheConfig:
+    """Quota/age limits for per-reply audio files directly under cached_audio"""
+    enabled: bool = True
+    max_bytes: int = 512 * 1024 * 1024
+    max_age_seconds: int = 24 * 3600  # Files not read for this long are deleted
+    sweep_interval_seconds: float = 300.0
+
+@dataclass
+class AudioUploadConfig:
+    """Background upload of cached audio to temporary hosting (SystemConfig.temp_upload_* toggles it)"""
+    workers: int = 2
+    queue_size: int = 100  # Uploads beyond this are rejected; the local URL still works
+    max_attempts: int = 3
+    backoff_base_seconds: float = 1.0  # Doubles per retry
+    backoff_max_seconds: float = 30.0
+    upload_timeout: float = 120.0
+    verify_timeout: float = 20.0
+    max_tracked: int = 1000  # Finished upload statuses kept for status lookups
 
 class Config:
     """Main configuration class"""
@@ -121,11 +211,16 @@ class Config:
         self.database = self._load_database_config()
         self.langfuse = self._load_langfuse_config()
         self.llm = self._load_llm_config()
+        self.llm_cache = self._load_llm_cache_config()
+        self.checkpoint = self._load_checkpoint_config()
         self.anthropic = self._load_anthropic_config()
         self.gemini = self._load_gemini_config()
         self.system = self._load_system_config()
         self.vector_search = self._load_vector_search_config()
         self.tts = self._load_tts_config()
+        self.tts_cache = self._load_tts_cache_config()
+        self.audio_cache = self._load_audio_cache_config()
+        self.audio_upload = self._load_audio_upload_config()
         self.openai_tts = self._load_openai_tts_config()
         self.elevenlabs_tts = self._load_elevenlabs_tts_config()
     
@@ -152,7 +247,9 @@ class Config:
             url=os.getenv("DATABASE_URL", default_url),
             echo=os.getenv("DB_ECHO", "false").lower() == "true",
             pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
-            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10"))
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            async_enabled=os.getenv("DB_ASYNC", "true").lower() == "true",
+            write_behind_enabled=os.getenv("DB_WRITE_BEHIND", "true").lower() == "true"
         )
     
     def _load_langfuse_config(self) -> LangfuseConfig:
@@ -182,6 +279,14 @@ class Config:
             enabled=True
         )
     
+    def _load_llm_cache_config(self) -> LLMCacheConfig:
+        """Centralized LLM response cache configuration (code-controlled)"""
+        return LLMCacheConfig()
+    
+    def _load_checkpoint_config(self) -> CheckpointConfig:
+        """Centralized LangGraph checkpointer configuration (code-controlled)"""
+        return CheckpointConfig()
+    
     def _load_anthropic_config(self) -> AnthropicConfig:
         """Anthropic configuration: API key may come from env; system settings are code-controlled."""
         api_key = os.getenv("ANTHROPIC_API_KEY") or ""
@@ -189,7 +294,10 @@ class Config:
             api_key=api_key,
             model="claude-3-sonnet-20240229",
             max_tokens=1000,
-            timeout=60
+            timeout=60,
+            max_concurrent_requests=16,
+            max_connections=100,
+            max_keepalive_connections=20
         )
     
     def _load_gemini_config(self) -> GeminiConfig:
@@ -200,7 +308,8 @@ class Config:
             model="gemini-2.5-flash",
             base_url="https://generativelanguage.googleapis.com/v1beta/",
             max_tokens=10000,
-            timeout=60
+            timeout=60,
+            model_cache_size=64
         )
     
     def _load_system_config(self) -> SystemConfig:
@@ -215,6 +324,18 @@ class Config:
         """Centralized TTS configuration (code-controlled)."""
         return TTSConfig()
 
+    def _load_tts_cache_config(self) -> TTSCacheConfig:
+        """Centralized TTS audio cache configuration (code-controlled)."""
+        return TTSCacheConfig()
+
+    def _load_audio_cache_config(self) -> AudioCacheConfig:
+        """Centralized cached_audio quota configuration (code-controlled)."""
+        return AudioCacheConfig()
+
+    def _load_audio_upload_config(self) -> AudioUploadConfig:
+        """Centralized background audio upload configuration (code-controlled)."""
+        return AudioUploadConfig()
+
     def _load_openai_tts_config(self) -> OpenAITTSConfig:
         """Load OpenAI TTS configuration from environment variables"""
         api_key = os.getenv("OPENAI_API_KEY") or os.getenv("GPT_TTS_API_KEY")
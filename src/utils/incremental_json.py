@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON object parser for streamed LLM output
+ - Accepts text chunks in arbitrary sizes (split escapes, keys, values)
+ - Emits each top-level field as soon as its value closes
+ - Emits top-level string values progressively while they are still being written
+"""
+
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+
+# Event kinds returned by IncrementalJSONParser.feed
+DELTA = "delta"   # (DELTA, key, decoded text appended to a top-level string value)
+VALUE = "value"   # (VALUE, key, complete decoded value)
+
+_SIMPLE_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+
+# Parser states
+_BEFORE_OBJECT = 0
+_EXPECT_KEY = 1
+_IN_KEY = 2
+_EXPECT_COLON = 3
+_EXPECT_VALUE = 4
+_IN_STRING_VALUE = 5
+_IN_COMPOSITE = 6
+_IN_SCALAR = 7
+_DONE = 8
+
+
+class IncrementalJSONParser:
+    """Streaming parser for a single top-level JSON object.
+
+    Text before the opening brace (e.g. a ```json fence) and after the
+    closing brace is ignored. Nested objects/arrays are buffered and decoded
+    once their closing bracket arrives; top-level strings are decoded
+    character by character so callers can forward them immediately.
+    """
+
+    def __init__(self):
+        self.state = _BEFORE_OBJECT
+        self.result: dict = {}
+        self._key: Optional[str] = None
+        self._text: List[str] = []      # decoded key / string value so far
+        self._escape: Optional[str] = None  # pending escape sequence (after the backslash)
+        self._high_surrogate: Optional[int] = None
+        self._raw: List[str] = []       # raw text of composite/scalar value
+        self._depth = 0
+        self._raw_in_string = False
+        self._raw_escaped = False
+
+    @property
+    def done(self) -> bool:
+        return self.state == _DONE
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        """Consume a chunk and return the events it completed"""
+        events: List[Tuple[str, str, Any]] = []
+        delta: List[str] = []
+        for ch in chunk:
+            if self.state == _DONE:
+                break
+            if self.state == _IN_STRING_VALUE:
+                closed = self._consume_string_char(ch, delta)
+                if closed:
+                    if delta:
+                        events.append((DELTA, self._key, ''.join(delta)))
+                        delta = []
+                    value = ''.join(self._text)
+                    self.result[self._key] = value
+                    events.append((VALUE, self._key, value))
+                    self._reset_value()
+                continue
+            self._step(ch, events)
+        if delta:
+            events.append((DELTA, self._key, ''.join(delta)))
+        return events
+
+    # Internal state machine ----------------------------------------------
+
+    def _step(self, ch: str, events: List[Tuple[str, str, Any]]):
+        state = self.state
+        if state == _BEFORE_OBJECT:
+            if ch == '{':
+                self.state = _EXPECT_KEY
+        elif state == _EXPECT_KEY:
+            if ch == '"':
+                self._text = []
+                self.state = _IN_KEY
+            elif ch == '}':
+                self.state = _DONE
+        elif state == _IN_KEY:
+            if self._consume_string_char(ch, None):
+                self._key = ''.join(self._text)
+                self._text = []
+                self.state = _EXPECT_COLON
+        elif state == _EXPECT_COLON:
+            if ch == ':':
+                self.state = _EXPECT_VALUE
+        elif state == _EXPECT_VALUE:
+            if ch.isspace():
+                return
+            if ch == '"':
+                self._text = []
+                self.state = _IN_STRING_VALUE
+            elif ch in '{[':
+                self._raw = [ch]
+                self._depth = 1
+                self._raw_in_string = False
+                self._raw_escaped = False
+                self.state = _IN_COMPOSITE
+            else:
+                self._raw = [ch]
+                self.state = _IN_SCALAR
+        elif state == _IN_COMPOSITE:
+            self._raw.append(ch)
+            if self._raw_in_string:
+                if self._raw_escaped:
+                    self._raw_escaped = False
+                elif ch == '\\':
+                    self._raw_escaped = True
+                elif ch == '"':
+                    self._raw_in_string = False
+            elif ch == '"':
+                self._raw_in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit_raw_value(events)
+        elif state == _IN_SCALAR:
+            if ch in ',}' or ch.isspace():
+                self._emit_raw_value(events)
+                if ch == '}':
+                    self.state = _DONE
+            else:
+                self._raw.append(ch)
+
+    def _emit_raw_value(self, events: List[Tuple[str, str, Any]]):
+        raw = ''.join(self._raw).strip()
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            try:
+                value = json.loads(_TRAILING_COMMA.sub(r'\1', raw))
+            except json.JSONDecodeError:
+                value = raw
+        self.result[self._key] = value
+        events.append((VALUE, self._key, value))
+        self._reset_value()
+
+    def _reset_value(self):
+        self._text = []
+        self._raw = []
+        self._depth = 0
+        self.state = _EXPECT_KEY
+
+    def _consume_string_char(self, ch: str, delta: Optional[List[str]]) -> bool:
+        """Decode one character of a JSON string; return True when the string closes"""
+        if self._escape is not None:
+            self._escape += ch
+            if self._escape[0] == 'u':
+                if len(self._escape) < 5:
+                    return False
+                try:
+                    code = int(self._escape[1:], 16)
+                except ValueError:
+                    code = None
+                self._escape = None
+                if code is None:
+                    return False
+                if 0xD800 <= code <= 0xDBFF:
+                    self._high_surrogate = code
+                    return False
+                if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+                    code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+                self._high_surrogate = None
+                self._append(chr(code), delta)
+                return False
+            decoded = _SIMPLE_ESCAPES.get(self._escape, self._escape)
+            self._escape = None
+            self._append(decoded, delta)
+            return False
+        if ch == '\\':
+            self._escape = ''
+            return False
+        if ch == '"':
+            return True
+        self._append(ch, delta)
+        return False
+
+    def _append(self, text: str, delta: Optional[List[str]]):
+        self._text.append(text)
+        if delta is not None:
+            delta.append(text)
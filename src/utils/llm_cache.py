@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+LLM response cache
+ - Keys on a normalized hash of model, system prompt, messages and sampling parameters
+ - In-memory LRU backend, or an on-disk SQLite backend shared across restarts
+ - TTL expiry, size-bounded eviction, per-call opt-out and hit/miss counters
+ - Only complete responses are stored: JSON-looking output must parse
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .config import Config, LLMCacheConfig
+from .llm_client import LLMClient
+
+
+_WHITESPACE = re.compile(r'\s+')
+_CODE_FENCE = re.compile(r'^```[a-zA-Z]*\s*|\s*```$')
+
+
+def _normalize_text(text: Any) -> str:
+    """Collapse whitespace so formatting-only prompt differences share a key"""
+    return _WHITESPACE.sub(' ', str(text or '')).strip()
+
+
+def is_cacheable_response(text: str) -> bool:
+    """False for empty output and for JSON output that does not parse (truncated/malformed)"""
+    if not text or not text.strip():
+        return False
+    body = _CODE_FENCE.sub('', text.strip())
+    if body[:1] in ('{', '['):
+        try:
+            json.loads(body)
+        except ValueError:
+            return False
+    return True
+
+
+def make_cache_key(
+    model: str,
+    system_prompt: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: Optional[int] = None,
+    **kwargs
+) -> str:
+    """Stable SHA-256 key for an LLM request"""
+    payload = {
+        "model": model,
+        "system": _normalize_text(system_prompt),
+        "messages": [
+            {"role": m.get("role", "user"), "content": _normalize_text(m.get("content"))}
+            if isinstance(m, dict) else {"role": "user", "content": _normalize_text(m)}
+            for m in messages or []
+        ],
+        "temperature": round(float(temperature), 3),
+        "max_tokens": max_tokens,
+        "extra": kwargs,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class LLMCacheBackend(ABC):
+    """Storage backend for cached LLM responses"""
+
+    # Backends doing file I/O are called from a worker thread on async paths
+    blocking = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None on miss/expiry"""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl_seconds: float):
+        """Store a value, evicting the least recently used entries when full"""
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["entries"] = len(self)
+        stats["max_entries"] = self.max_entries
+        stats["backend"] = type(self).__name__
+        return stats
+
+
+class MemoryLLMCache(LLMCacheBackend):
+    """Process-local LRU cache"""
+
+    def __init__(self, max_entries: int = 1024):
+        super().__init__(max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._count("misses")
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self._count("expired")
+                self._count("misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count("hits")
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            self._count("stores")
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._count("evictions")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteLLMCache(LLMCacheBackend):
+    """On-disk cache; survives restarts and can be shared by worker processes"""
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        super().__init__(max_entries)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._count("expired")
+                self._count("misses")
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl_seconds, now)
+            )
+            self._count("stores")
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    " SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self._count("evictions", overflow)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+# Backends are shared process-wide so every component's client reuses the same
+# entries and the counters reflect total traffic
+_SHARED_CACHES: Dict[Tuple, LLMCacheBackend] = {}
+_SHARED_CACHES_LOCK = threading.Lock()
+
+
+def get_shared_llm_cache(cache_config: LLMCacheConfig) -> LLMCacheBackend:
+    """Return the process-wide cache backend for this configuration"""
+    backend = cache_config.backend.lower()
+    key = (backend, cache_config.sqlite_path if backend == "sqlite" else None, cache_config.max_entries)
+    with _SHARED_CACHES_LOCK:
+        cache = _SHARED_CACHES.get(key)
+        if cache is None:
+            if backend == "sqlite":
+                cache = SQLiteLLMCache(cache_config.sqlite_path, max_entries=cache_config.max_entries)
+            elif backend == "memory":
+                cache = MemoryLLMCache(max_entries=cache_config.max_entries)
+            else:
+                raise ValueError(f"Unsupported LLM cache backend: {cache_config.backend}")
+            _SHARED_CACHES[key] = cache
+        return cache
+
+
+def get_llm_cache_stats() -> List[Dict[str, Any]]:
+    """Counters for every cache backend created in this process"""
+    with _SHARED_CACHES_LOCK:
+        caches = list(_SHARED_CACHES.values())
+    return [cache.get_stats() for cache in caches]
+
+
+class CachedLLMClient(LLMClient):
+    """LLMClient wrapper that serves repeated low-temperature requests from a cache.
+
+    Pass ``use_cache=False`` to any call to bypass the cache for that call.
+    """
+
+    def __init__(self, client: LLMClient, cache: LLMCacheBackend, cache_config: LLMCacheConfig):
+        self.client = client
+        self.cache = cache
+        self.cache_config = cache_config
+        self.logger = logging.getLogger(__name__)
+
+    def __getattr__(self, name):
+        # Expose the wrapped client's attributes (default_model, config, ...)
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def _cache_key(
+        self,
+        use_cache: bool,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int],
+        temperature: float,
+        kwargs: Dict[str, Any]
+    ) -> Optional[str]:
+        """Key for a cacheable call, or None when the call should go straight through"""
+        if not use_cache or temperature > self.cache_config.max_temperature:
+            return None
+        model = getattr(self.client, "default_model", type(self.client).__name__)
+        return make_cache_key(model, system_prompt, messages, temperature, max_tokens, **kwargs)
+
+    def _store(self, key: Optional[str], value: str):
+        if not key:
+            return
+        if not is_cacheable_response(value):
+            self.logger.debug("LLM response not cached: empty or malformed JSON")
+            return
+        self.cache.set(key, value, self.cache_config.ttl_seconds)
+
+    async def _aget(self, key: str) -> Optional[str]:
+        if self.cache.blocking:
+            return await asyncio.to_thread(self.cache.get, key)
+        return self.cache.get(key)
+
+    async def _astore(self, key: Optional[str], value: str):
+        if key and self.cache.blocking:
+            await asyncio.to_thread(self._store, key, value)
+        else:
+            self._store(key, value)
+
+    async def generate(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        use_cache: bool = True,
+        **kwargs
+    ) -> str:
+        key = self._cache_key(use_cache, system_prompt, messages, max_tokens, temperature, kwargs)
+        if key:
+            cached = await self._aget(key)
+            if cached is not None:
+                self.logger.debug("LLM cache hit")
+                return cached
+        response = await self.client.generate(
+            system_prompt=system_prompt,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **kwargs
+        )
+        await self._astore(key, response)
+        return response
+
+    def generate_sync(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        use_cache: bool = True,
+        **kwargs
+    ) -> str:
+        key = self._cache_key(use_cache, system_prompt, messages, max_tokens, temperature, kwargs)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        response = self.client.generate_sync(
+            system_prompt=system_prompt,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **kwargs
+        )
+        self._store(key, response)
+        return response
+
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        use_cache: bool = True,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Cache hits are replayed as a single chunk; misses are streamed and stored once complete"""
+        key = self._cache_key(use_cache, system_prompt, messages, max_tokens, temperature, kwargs)
+        if key:
+            cached = await self._aget(key)
+            if cached is not None:
+                yield cached
+                return
+        chunks = []
+        async for chunk in self.client.generate_stream(
+            system_prompt=system_prompt,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **kwargs
+        ):
+            chunks.append(chunk)
+            yield chunk
+        await self._astore(key, ''.join(chunks))
+
+
+def wrap_with_cache(client: LLMClient, config: Config) -> LLMClient:
+    """Wrap a client with the shared response cache when enabled in config"""
+    cache_config = getattr(config, "llm_cache", None)
+    if not isinstance(cache_config, LLMCacheConfig) or not cache_config.enabled:
+        return client
+    return CachedLLMClient(client, get_shared_llm_cache(cache_config), cache_config)
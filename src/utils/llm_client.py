@@ -3,11 +3,17 @@
 LLM Client Abstraction Layer
 Provides a unified interface for multiple LLM providers (Anthropic, Gemini)
 """
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from abc import ABC, abstractmethod
 
 import anthropic
+import httpx
 
 try:
     from langfuse import observe
@@ -20,6 +26,7 @@ except ImportError:
         return decorator
 
 from .config import Config
+from .prompt_registry import SystemPrompt, get_prompt_registry
 
 
 class LLMClient(ABC):
@@ -48,6 +55,76 @@ class LLMClient(ABC):
     ) -> str:
         """Generate a response from the LLM (synchronous)"""
         pass
+    
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Stream response text chunks as they arrive.
+
+        Providers without native streaming fall back to yielding the full
+        ``generate`` result as a single chunk.
+        """
+        yield await self.generate(
+            system_prompt=system_prompt,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **kwargs
+        )
+
+
+# Async Anthropic clients and concurrency limiters shared by every
+# AnthropicLLMClient in the process. httpx connection pools are bound to the
+# event loop that opened them, so entries are kept per running loop.
+_ANTHROPIC_ASYNC_POOLS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, Tuple[anthropic.AsyncAnthropic, asyncio.Semaphore]]]" = weakref.WeakKeyDictionary()
+
+
+def _get_shared_anthropic_pool(config: Config) -> Tuple["anthropic.AsyncAnthropic", asyncio.Semaphore]:
+    """Return the (async client, semaphore) pair shared for this config on the running loop"""
+    cfg = config.anthropic
+    max_connections = getattr(cfg, "max_connections", 100)
+    max_keepalive = getattr(cfg, "max_keepalive_connections", 20)
+    max_concurrency = getattr(cfg, "max_concurrent_requests", 16)
+    key = (cfg.api_key, cfg.timeout, max_connections, max_keepalive, max_concurrency)
+
+    loop = asyncio.get_running_loop()
+    pools = _ANTHROPIC_ASYNC_POOLS.setdefault(loop, {})
+    pool = pools.get(key)
+    if pool is None:
+        http_client = anthropic.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive
+            )
+        )
+        client = anthropic.AsyncAnthropic(
+            api_key=cfg.api_key,
+            max_retries=3,
+            timeout=cfg.timeout,
+            http_client=http_client
+        )
+        pool = (client, asyncio.Semaphore(max(1, max_concurrency)))
+        pools[key] = pool
+    return pool
+
+
+async def close_shared_llm_clients():
+    """Close the shared async LLM connection pools owned by the running loop"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    pools = _ANTHROPIC_ASYNC_POOLS.pop(loop, {})
+    for client, _ in pools.values():
+        try:
+            await client.close()
+        except Exception:
+            pass
 
 
 class AnthropicLLMClient(LLMClient):
@@ -56,6 +133,8 @@ class AnthropicLLMClient(LLMClient):
     def __init__(self, config: Config):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        # Synchronous client is only used by generate_sync; async calls go
+        # through the process-wide pool from _get_shared_anthropic_pool
         self.client = anthropic.Anthropic(
             api_key=config.anthropic.api_key,
             max_retries=3,
@@ -64,6 +143,12 @@ class AnthropicLLMClient(LLMClient):
         self.default_model = config.anthropic.model
         self.default_max_tokens = config.anthropic.max_tokens
     
+    def _system_param(self, system_prompt: str):
+        """Send a SystemPrompt's static prefix as a cache_control block"""
+        if isinstance(system_prompt, SystemPrompt) and getattr(self.config.anthropic, "prompt_caching", True):
+            return system_prompt.to_anthropic_blocks()
+        return system_prompt
+    
     async def generate(
         self,
         system_prompt: str,
@@ -72,21 +157,55 @@ class AnthropicLLMClient(LLMClient):
         temperature: float = 0.7,
         **kwargs
     ) -> str:
-        """Generate a response using Anthropic Claude"""
+        """Generate a response using Anthropic Claude (non-blocking)"""
         try:
-            response = self.client.messages.create(
-                model=self.default_model,
-                max_tokens=max_tokens or self.default_max_tokens,
-                system=system_prompt,
-                messages=messages,
-                temperature=temperature,
-                **kwargs
-            )
+            kwargs.pop("use_cache", None)  # Cache opt-out flag, only meaningful to CachedLLMClient
+            async_client, semaphore = _get_shared_anthropic_pool(self.config)
+            async with semaphore:
+                response = await async_client.messages.create(
+                    model=self.default_model,
+                    max_tokens=max_tokens or self.default_max_tokens,
+                    system=self._system_param(system_prompt),
+                    messages=messages,
+                    temperature=temperature,
+                    **kwargs
+                )
+            get_prompt_registry().record_usage(getattr(response, "usage", None))
             return response.content[0].text
         except Exception as e:
             self.logger.error(f"Anthropic API error: {e}")
             raise
     
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Stream response text deltas from Anthropic Claude"""
+        try:
+            kwargs.pop("use_cache", None)  # Cache opt-out flag, only meaningful to CachedLLMClient
+            async_client, semaphore = _get_shared_anthropic_pool(self.config)
+            async with semaphore:
+                async with async_client.messages.stream(
+                    model=self.default_model,
+                    max_tokens=max_tokens or self.default_max_tokens,
+                    system=self._system_param(system_prompt),
+                    messages=messages,
+                    temperature=temperature,
+                    **kwargs
+                ) as stream:
+                    async for text in stream.text_stream:
+                        if text:
+                            yield text
+                    final_message = await stream.get_final_message()
+            get_prompt_registry().record_usage(getattr(final_message, "usage", None))
+        except Exception as e:
+            self.logger.error(f"Anthropic streaming error: {e}")
+            raise
+    
     def generate_sync(
         self,
         system_prompt: str,
@@ -97,20 +216,46 @@ class AnthropicLLMClient(LLMClient):
     ) -> str:
         """Generate a response using Anthropic Claude (synchronous)"""
         try:
+            kwargs.pop("use_cache", None)
             response = self.client.messages.create(
                 model=self.default_model,
                 max_tokens=max_tokens or self.default_max_tokens,
-                system=system_prompt,
+                system=self._system_param(system_prompt),
                 messages=messages,
                 temperature=temperature,
                 **kwargs
             )
+            get_prompt_registry().record_usage(getattr(response, "usage", None))
             return response.content[0].text
         except Exception as e:
             self.logger.error(f"Anthropic API error: {e}")
             raise
 
 
+# GenerativeModel objects are immutable after construction and carry no
+# per-request state, so they are shared by every GeminiLLMClient in the process.
+_GEMINI_MODEL_CACHE: "OrderedDict[Tuple, Any]" = OrderedDict()
+_GEMINI_GENERATION_CONFIGS: "OrderedDict[Tuple, Any]" = OrderedDict()
+_GEMINI_CACHE_LOCK = threading.Lock()
+_GEMINI_GENERATION_CONFIG_LIMIT = 64
+
+
+def _lru_get_or_create(cache: OrderedDict, key: Tuple, limit: int, factory):
+    """Return cache[key], creating it with factory() and evicting the oldest entry past limit"""
+    with _GEMINI_CACHE_LOCK:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+            return value
+    value = factory()
+    with _GEMINI_CACHE_LOCK:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max(1, limit):
+            cache.popitem(last=False)
+    return value
+
+
 class GeminiLLMClient(LLMClient):
     """Google Gemini LLM client implementation"""
     
@@ -144,8 +289,39 @@ class GeminiLLMClient(LLMClient):
             HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
         }
         
-        # Base model name; per-request model is built with system_instruction
+        # Base model name; per-request model is looked up by system_instruction
         self.model_name = self.default_model
+        self.model_cache_size = getattr(config.gemini, "model_cache_size", 64)
+        self._safety_key = tuple(sorted((int(k), int(v)) for k, v in self.safety_settings.items()))
+    
+    def _get_model(self, system_instruction: str):
+        """Shared GenerativeModel for (model name, system instruction, safety settings)"""
+        instruction_hash = hashlib.sha256((system_instruction or "").encode("utf-8")).hexdigest()
+        key = (self.model_name, instruction_hash, self._safety_key)
+        return _lru_get_or_create(
+            _GEMINI_MODEL_CACHE,
+            key,
+            self.model_cache_size,
+            lambda: self.genai.GenerativeModel(
+                self.model_name,
+                system_instruction=system_instruction or "",
+                safety_settings=self.safety_settings
+            )
+        )
+    
+    def _get_generation_config(self, max_output_tokens: int, temperature: float):
+        """Shared JSON-mode GenerationConfig for (max tokens, temperature)"""
+        key = (max_output_tokens, temperature, "application/json")
+        return _lru_get_or_create(
+            _GEMINI_GENERATION_CONFIGS,
+            key,
+            _GEMINI_GENERATION_CONFIG_LIMIT,
+            lambda: self.genai.GenerationConfig(
+                max_output_tokens=max_output_tokens,
+                temperature=temperature,
+                response_mime_type="application/json"
+            )
+        )
     
     def _build_contents(self, messages: List[Dict[str, str]]) -> list:
         """Build Gemini contents array from messages (use only last user message)."""
@@ -167,22 +343,14 @@ class GeminiLLMClient(LLMClient):
     ) -> str:
         """Generate a response using Google Gemini"""
         try:
-            # Build model with system instruction per request
-            model = self.genai.GenerativeModel(
-                self.model_name,
-                system_instruction=system_prompt or "",
-                safety_settings=self.safety_settings
-            )
+            # Shared model for this system instruction (built once, then reused)
+            model = self._get_model(system_prompt)
 
             contents = self._build_contents(messages)
 
             response = await model.generate_content_async(
                 contents,
-                generation_config=self.genai.GenerationConfig(
-                    max_output_tokens=max_tokens or self.default_max_tokens,
-                    temperature=temperature,
-                    response_mime_type="application/json"
-                )
+                generation_config=self._get_generation_config(max_tokens or self.default_max_tokens, temperature)
             )
             
             # Handle response with better error checking
@@ -193,18 +361,10 @@ class GeminiLLMClient(LLMClient):
                 if finish_reason == 2 or str(finish_reason).upper() in ('MAX_TOKENS', 'MAX_TOKENS_EXCEEDED'):
                     # Retry once with a higher token limit
                     retry_tokens = (max_tokens or self.default_max_tokens) + 512
-                    retry_model = self.genai.GenerativeModel(
-                        self.model_name,
-                        system_instruction=(system_prompt or "") + "\n# Instruction: If the previous response was cut due to token limits, return a complete valid JSON object only.",
-                        safety_settings=self.safety_settings
-                    )
+                    retry_model = self._get_model((system_prompt or "") + "\n# Instruction: If the previous response was cut due to token limits, return a complete valid JSON object only.")
                     retry_resp = await retry_model.generate_content_async(
                         contents,
-                        generation_config=self.genai.GenerationConfig(
-                            max_output_tokens=retry_tokens,
-                            temperature=temperature,
-                            response_mime_type="application/json"
-                        )
+                        generation_config=self._get_generation_config(retry_tokens, temperature)
                     )
                     if getattr(retry_resp, 'candidates', None):
                         for cand in retry_resp.candidates:
@@ -242,6 +402,43 @@ class GeminiLLMClient(LLMClient):
             self.logger.error(f"Gemini API error: {e}")
             raise
     
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Extract text from a streamed chunk without touching chunk.text on empty parts"""
+        texts = []
+        for cand in getattr(chunk, 'candidates', None) or []:
+            content = getattr(cand, 'content', None)
+            if content and getattr(content, 'parts', None):
+                texts.extend(getattr(p, 'text', '') for p in content.parts if getattr(p, 'text', None))
+        return ''.join(texts)
+    
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Stream response text chunks from Google Gemini"""
+        try:
+            model = self._get_model(system_prompt)
+
+            contents = self._build_contents(messages)
+
+            response = await model.generate_content_async(
+                contents,
+                generation_config=self._get_generation_config(max_tokens or self.default_max_tokens, temperature),
+                stream=True
+            )
+            async for chunk in response:
+                text = self._chunk_text(chunk)
+                if text:
+                    yield text
+        except Exception as e:
+            self.logger.error(f"Gemini streaming error: {e}")
+            raise
+    
     def generate_sync(
         self,
         system_prompt: str,
@@ -252,21 +449,13 @@ class GeminiLLMClient(LLMClient):
     ) -> str:
         """Generate a response using Google Gemini (synchronous)"""
         try:
-            model = self.genai.GenerativeModel(
-                self.model_name,
-                system_instruction=system_prompt or "",
-                safety_settings=self.safety_settings
-            )
+            model = self._get_model(system_prompt)
 
             contents = self._build_contents(messages)
 
             response = model.generate_content(
                 contents,
-                generation_config=self.genai.GenerationConfig(
-                    max_output_tokens=max_tokens or self.default_max_tokens,
-                    temperature=temperature,
-                    response_mime_type="application/json"
-                )
+                generation_config=self._get_generation_config(max_tokens or self.default_max_tokens, temperature)
             )
             
             # Handle response with better error checking
@@ -274,18 +463,10 @@ class GeminiLLMClient(LLMClient):
                 finish_reason = getattr(response.candidates[0], 'finish_reason', 'UNKNOWN')
                 if finish_reason == 2 or str(finish_reason).upper() in ('MAX_TOKENS', 'MAX_TOKENS_EXCEEDED'):
                     retry_tokens = (max_tokens or self.default_max_tokens) + 512
-                    retry_model = self.genai.GenerativeModel(
-                        self.model_name,
-                        system_instruction=(system_prompt or "") + "\n# Instruction: If the previous response was cut due to token limits, return a complete valid JSON object only.",
-                        safety_settings=self.safety_settings
-                    )
+                    retry_model = self._get_model((system_prompt or "") + "\n# Instruction: If the previous response was cut due to token limits, return a complete valid JSON object only.")
                     retry_resp = retry_model.generate_content(
                         contents,
-                        generation_config=self.genai.GenerationConfig(
-                            max_output_tokens=retry_tokens,
-                            temperature=temperature,
-                            response_mime_type="application/json"
-                        )
+                        generation_config=self._get_generation_config(retry_tokens, temperature)
                     )
                     if getattr(retry_resp, 'candidates', None):
                         for cand in retry_resp.candidates:
@@ -324,12 +505,17 @@ class GeminiLLMClient(LLMClient):
 
 def create_llm_client(config: Config) -> LLMClient:
     """Factory function to create the appropriate LLM client"""
+    from .llm_cache import wrap_with_cache
+    
     provider = config.llm.provider.lower()
     
     if provider == "anthropic":
-        return AnthropicLLMClient(config)
+        client = AnthropicLLMClient(config)
     elif provider == "gemini":
-        return GeminiLLMClient(config)
+        client = GeminiLLMClient(config)
     else:
         raise ValueError(f"Unsupported LLM provider: {provider}")
+    
+    # Repeated low-temperature requests are served from the shared response cache
+    return wrap_with_cache(client, config)
 
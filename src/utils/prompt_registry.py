@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Prompt template registry
+ - prompts/*.txt files are read once per process, not once per component
+ - Static instruction blocks are compiled once into a template prefix; each
+   request only formats the dynamic suffix
+ - SystemPrompt keeps the static/dynamic split so providers with prompt-prefix
+   caching (Anthropic cache_control) can cache the static part
+ - Hit/miss counters for the registry and the provider's prompt cache
+"""
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+
+class SystemPrompt(str):
+    """
+    System prompt text that remembers which leading part is static.
+
+    Behaves as a plain string everywhere (Gemini, the response cache, logs);
+    the Anthropic client sends `static` as a cacheable block.
+    """
+
+    static: str
+    dynamic: str
+
+    def __new__(cls, static: str, dynamic: str = ""):
+        prompt = super().__new__(cls, static + dynamic)
+        prompt.static = static
+        prompt.dynamic = dynamic
+        return prompt
+
+    def to_anthropic_blocks(self) -> List[Dict[str, Any]]:
+        """System content blocks with a cache breakpoint after the static prefix"""
+        blocks: List[Dict[str, Any]] = [
+            {"type": "text", "text": self.static, "cache_control": {"type": "ephemeral"}}
+        ]
+        if self.dynamic:
+            blocks.append({"type": "text", "text": self.dynamic})
+        return blocks
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A compiled static prefix; render() appends the per-request suffix"""
+    name: str
+    static: str
+
+    def render(self, dynamic: str = "") -> SystemPrompt:
+        return SystemPrompt(self.static, dynamic)
+
+
+class PromptRegistry:
+    """Process-wide store of prompt files and compiled templates"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files: Dict[str, str] = {}
+        self._templates: Dict[str, PromptTemplate] = {}
+        self.stats = {
+            "file_hits": 0,
+            "file_misses": 0,
+            "template_hits": 0,
+            "template_misses": 0,
+            "provider_requests": 0,
+            "provider_cache_hits": 0,
+            "provider_cache_read_tokens": 0,
+            "provider_cache_write_tokens": 0,
+            "provider_uncached_input_tokens": 0,
+        }
+
+    def load_file(self, filepath: str) -> str:
+        """Prompt file contents, read from disk on first use (errors are not cached)"""
+        key = os.path.abspath(filepath)
+        with self._lock:
+            text = self._files.get(key)
+            if text is not None:
+                self.stats["file_hits"] += 1
+                return text
+        with open(filepath, 'r', encoding='utf-8') as f:
+            text = f.read()
+        with self._lock:
+            self.stats["file_misses"] += 1
+            return self._files.setdefault(key, text)
+
+    def template(self, name: str, build_static: Callable[[], str]) -> PromptTemplate:
+        """
+        Template `name`, compiling its static prefix with build_static() once.
+
+        The name must identify everything build_static() depends on (e.g. the
+        prompt file it embeds).
+        """
+        with self._lock:
+            template = self._templates.get(name)
+            if template is not None:
+                self.stats["template_hits"] += 1
+                return template
+        static = build_static()
+        with self._lock:
+            self.stats["template_misses"] += 1
+            return self._templates.setdefault(name, PromptTemplate(name=name, static=static))
+
+    def record_usage(self, usage: Any):
+        """Count provider prompt-cache reads/writes from an Anthropic `usage` object"""
+        if usage is None:
+            return
+        read, written, uncached = (
+            value if isinstance(value, int) else 0
+            for value in (
+                getattr(usage, "cache_read_input_tokens", None),
+                getattr(usage, "cache_creation_input_tokens", None),
+                getattr(usage, "input_tokens", None),
+            )
+        )
+        with self._lock:
+            self.stats["provider_requests"] += 1
+            self.stats["provider_cache_hits"] += 1 if read else 0
+            self.stats["provider_cache_read_tokens"] += read
+            self.stats["provider_cache_write_tokens"] += written
+            self.stats["provider_uncached_input_tokens"] += uncached
+
+    def clear(self):
+        """Forget loaded files and templates (e.g. after editing prompts/*.txt)"""
+        with self._lock:
+            self._files.clear()
+            self._templates.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["files"] = len(self._files)
+            stats["templates"] = len(self._templates)
+        return stats
+
+
+_PROMPT_REGISTRY = PromptRegistry()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """The registry shared by every component in the process"""
+    return _PROMPT_REGISTRY
+
+
+def get_prompt_stats() -> Dict[str, Any]:
+    """Registry and provider prompt-cache counters"""
+    return _PROMPT_REGISTRY.get_stats()
@@ -4,7 +4,7 @@ Text formatting utilities for TTS with ElevenLabs Audio Tags
 Converts text markers to ElevenLabs Voice Tags format
 """
 import re
-from typing import Dict, Callable
+from typing import Dict, Callable, List
 
 
 def format_for_elevenlabs(text: str) -> str:
@@ -88,3 +88,81 @@ def format_text_for_tts(text: str, provider: str = 'elevenlabs') -> str:
     formatter = TTS_FORMATTERS.get(provider.lower(), lambda x: x)
     return formatter(text)
 
+
+# Sentence/pause boundaries for pipelined TTS: terminal punctuation or an
+# ellipsis, plus any closing quotes/brackets that follow
+_SENTENCE_BOUNDARY = re.compile(r'(?:[。！？!?；;～~\n]+|\.{2,}|…+)[”’』」）)]*')
+_SOFT_BREAKS = "，,、 "
+
+
+def _speakable_length(text: str) -> int:
+    return sum(1 for ch in text if ch.isalnum())
+
+
+class SentenceSplitter:
+    """
+    Incrementally split streamed reply text into TTS-sized chunks
+    
+    Chunks end on sentence punctuation or an ellipsis ("......好。" pauses are
+    kept with the words they lead into). A boundary is only confirmed once a
+    following character has arrived, so "..." streamed as "." + ".." is not
+    cut early. Chunks with fewer than min_chars speakable characters are
+    merged into the next one; runs longer than max_chars are cut at a comma.
+    """
+    
+    def __init__(self, min_chars: int = 1, max_chars: int = 80):
+        self.min_chars = max(1, min_chars)
+        self.max_chars = max(self.min_chars, max_chars)
+        self._buffer = ""
+        self._pending = ""
+        self._emitted = 0
+    
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; return the chunks completed by it"""
+        self._buffer += text or ""
+        pieces = []
+        while True:
+            match = _SENTENCE_BOUNDARY.search(self._buffer)
+            if match and match.end() < len(self._buffer):
+                cut = match.end()
+            elif len(self._buffer) > self.max_chars:
+                window = self._buffer[:self.max_chars]
+                soft = max(window.rfind(ch) for ch in _SOFT_BREAKS)
+                cut = soft + 1 if soft > 0 else self.max_chars
+            else:
+                break
+            pieces.append(self._buffer[:cut])
+            self._buffer = self._buffer[cut:]
+        return self._merge(pieces)
+    
+    def flush(self) -> List[str]:
+        """Return whatever remains once the reply is complete"""
+        rest, self._buffer = self._buffer, ""
+        chunks = self._merge([rest], final=True)
+        leftover, self._pending = self._pending.strip(), ""
+        if leftover and not self._emitted and not chunks:
+            # A reply that is only a pause ("......") is still voiced
+            chunks.append(leftover)
+        elif leftover and _speakable_length(leftover):
+            chunks.append(leftover)
+        self._emitted += len(chunks)
+        return chunks
+    
+    def _merge(self, pieces: List[str], final: bool = False) -> List[str]:
+        chunks = []
+        for piece in pieces:
+            self._pending += piece
+            if _speakable_length(self._pending) >= self.min_chars:
+                chunk = self._pending.strip()
+                self._pending = ""
+                if chunk:
+                    chunks.append(chunk)
+        if not final:
+            self._emitted += len(chunks)
+        return chunks
+
+
+def split_tts_sentences(text: str, min_chars: int = 1, max_chars: int = 80) -> List[str]:
+    """Split a complete reply into TTS chunks (see SentenceSplitter)"""
+    splitter = SentenceSplitter(min_chars=min_chars, max_chars=max_chars)
+    return splitter.feed(text) + splitter.flush()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Token Budget Helpers
+Cheap prompt token estimates for trimming context before an LLM call.
+No tokenizer is bundled, so counts are a heuristic: CJK characters cost about
+one token each, other text about one token per four characters.
+"""
+import math
+import re
+from typing import Iterable, List, Tuple
+
+
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿豈-﫿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text (errs on the high side)"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def take_within_budget(
+    items: Iterable[Tuple[str, int]],
+    token_budget: int,
+    min_items: int = 1
+) -> Tuple[List[str], int]:
+    """
+    Keep (text, tokens) items in order until token_budget is spent.
+
+    The first `min_items` are always kept so an over-tight budget never
+    produces an empty context. Returns the kept texts and their token total.
+    """
+    kept: List[str] = []
+    used = 0
+    for text, tokens in items:
+        if len(kept) >= min_items and used + tokens > token_budget:
+            break
+        kept.append(text)
+        used += tokens
+    return kept, used
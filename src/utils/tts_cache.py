@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Content-addressed TTS audio cache
+ - Keys on a hash of the TTS-formatted text, provider, voice, model, voice settings and format
+ - Memory tier (bytes) in front of a disk tier under cached_audio/tts
+ - Size-bounded LRU eviction on both tiers, hit/miss counters
+ - Disk entries are served directly by FastAPI at /cached_audio/tts/<key>.<ext>
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import aiofiles
+
+from .audio_cache import CACHE_DIR
+from .config import TTSCacheConfig
+
+
+def make_tts_cache_key(
+    text: str,
+    provider: str,
+    voice: Optional[str],
+    model: Optional[str],
+    audio_format: Optional[str],
+    voice_settings: Optional[Dict[str, Any]] = None,
+    **extra
+) -> str:
+    """Stable SHA-256 key for one synthesis; text should already be TTS-formatted"""
+    payload = {
+        "text": " ".join((text or "").split()),
+        "provider": provider,
+        "voice": voice,
+        "model": model,
+        "format": audio_format,
+        "voice_settings": voice_settings or {},
+        "extra": extra,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAudio:
+    """A synthesized clip stored in the disk tier"""
+    key: str
+    path: str
+    url: str  # Relative URL served under /cached_audio
+    size: int
+    cache_hit: bool
+    audio: Optional[bytes] = None  # Set only for fresh syntheses
+
+
+class TTSAudioCache:
+    """Two-tier (memory + disk) LRU cache of synthesized audio"""
+
+    def __init__(
+        self,
+        directory: Path,
+        memory_max_bytes: int = 16 * 1024 * 1024,
+        disk_max_bytes: int = 256 * 1024 * 1024,
+        url_prefix: str = "/cached_audio/tts"
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.memory_max_bytes = max(0, memory_max_bytes)
+        self.disk_max_bytes = max(1, disk_max_bytes)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        # key -> (filename, size), least recently used first
+        self._disk: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._disk_bytes = 0
+        self.stats = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0,
+            "memory_evictions": 0, "disk_evictions": 0
+        }
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the disk index from files left by earlier runs (oldest access first)"""
+        entries = []
+        for path in self.directory.iterdir():
+            if not path.is_file() or path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_atime, path.stem, path.name, stat.st_size))
+        for _, key, filename, size in sorted(entries):
+            self._disk[key] = (filename, size)
+            self._disk_bytes += size
+        self._evict_disk()
+
+    # Lookups -----------------------------------------------------------------
+
+    def get_file(self, key: str) -> Optional[CachedAudio]:
+        """Disk entry for key, without reading it (hits skip any re-encoding)"""
+        with self._lock:
+            entry = self._disk.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            filename, size = entry
+            path = self.directory / filename
+            if not path.exists():
+                del self._disk[key]
+                self._disk_bytes -= size
+                self.stats["misses"] += 1
+                return None
+            self._disk.move_to_end(key)
+            self.stats["disk_hits"] += 1
+        self._touch(path)
+        return CachedAudio(key=key, path=str(path), url=f"{self.url_prefix}/{filename}", size=size, cache_hit=True)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Audio bytes for key from memory, falling back to the disk tier"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return audio
+        cached = self.get_file(key)
+        if cached is None:
+            return None
+        try:
+            audio = Path(cached.path).read_bytes()
+        except OSError:
+            return None
+        self._remember(key, audio)
+        return audio
+
+    # Stores ------------------------------------------------------------------
+
+    def put(self, key: str, audio: bytes, extension: str = "mp3") -> CachedAudio:
+        """Store audio in both tiers and return its disk entry"""
+        path, tmp_path = self._entry_paths(key, extension)
+        with open(tmp_path, "wb") as handle:
+            handle.write(audio)
+        os.replace(tmp_path, path)
+        return self._register(key, path, audio)
+
+    async def put_async(self, key: str, audio: Union[bytes, memoryview], extension: str = "mp3") -> CachedAudio:
+        """put() with the file written off the event loop"""
+        path, tmp_path = self._entry_paths(key, extension)
+        async with aiofiles.open(tmp_path, "wb") as handle:
+            await handle.write(audio)
+        os.replace(tmp_path, path)
+        return self._register(key, path, bytes(audio))
+
+    def _entry_paths(self, key: str, extension: str) -> Tuple[Path, Path]:
+        path = self.directory / f"{key}.{extension or 'mp3'}"
+        # Unique temp name: concurrent async stores of one key must not share a file
+        return path, path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+
+    def _register(self, key: str, path: Path, audio: bytes) -> CachedAudio:
+        with self._lock:
+            previous = self._disk.pop(key, None)
+            if previous:
+                self._disk_bytes -= previous[1]
+            self._disk[key] = (path.name, len(audio))
+            self._disk_bytes += len(audio)
+            self.stats["stores"] += 1
+            self._evict_disk(keep=key)
+        self._remember(key, audio)
+        return CachedAudio(key=key, path=str(path), url=f"{self.url_prefix}/{path.name}", size=len(audio), cache_hit=False)
+
+    def _remember(self, key: str, audio: bytes):
+        if len(audio) > self.memory_max_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = audio
+            self._memory_bytes += len(audio)
+            while self._memory_bytes > self.memory_max_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self.stats["memory_evictions"] += 1
+
+    def _evict_disk(self, keep: Optional[str] = None):
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            key, (filename, size) = next(iter(self._disk.items()))
+            if key == keep and len(self._disk) == 1:
+                break
+            del self._disk[key]
+            self._disk_bytes -= size
+            self.stats["disk_evictions"] += 1
+            try:
+                (self.directory / filename).unlink()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _touch(path: Path):
+        # Access time orders the index rebuilt on the next start
+        try:
+            now = time.time()
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.memory_max_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes,
+            })
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# One cache per directory so every AgoraTTSService shares entries and counters
+_SHARED_TTS_CACHES: Dict[str, TTSAudioCache] = {}
+_SHARED_TTS_CACHES_LOCK = threading.Lock()
+
+
+def get_shared_tts_cache(cache_config: TTSCacheConfig) -> TTSAudioCache:
+    """Return the process-wide TTS audio cache for this configuration"""
+    directory = CACHE_DIR / cache_config.subdirectory
+    key = str(directory)
+    with _SHARED_TTS_CACHES_LOCK:
+        cache = _SHARED_TTS_CACHES.get(key)
+        if cache is None:
+            cache = TTSAudioCache(
+                directory,
+                memory_max_bytes=cache_config.memory_max_bytes,
+                disk_max_bytes=cache_config.disk_max_bytes,
+                url_prefix=f"/cached_audio/{cache_config.subdirectory}"
+            )
+            _SHARED_TTS_CACHES[key] = cache
+        return cache
+
+
+def get_tts_cache_stats() -> Dict[str, Any]:
+    """Counters for every TTS cache created in this process, keyed by directory"""
+    with _SHARED_TTS_CACHES_LOCK:
+        caches = dict(_SHARED_TTS_CACHES)
+    return {directory: cache.get_stats() for directory, cache in caches.items()}
@@ -131,6 +131,7 @@ class UserDeviceManager:
             
             session.add(device)
             session.commit()
+            self.db_service.invalidate_devices()
             
             print(f"✅ 添加设备成功:")
             print(f"   设备ID: {device_id}")
@@ -180,6 +181,7 @@ class UserDeviceManager:
             if device:
                 device.is_active = False
                 session.commit()
+                self.db_service.invalidate_devices()
                 print(f"✅ 已删除设备 {device_id}")
             else:
                 print(f"❌ 设备 {device_id} 不存在")
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Bounded LangGraph checkpointers
+ - Large state fields (base64 audio) are stripped before anything is stored
+ - Per-session checkpoint history, session count and idle age are capped
+ - In-memory by default; optional SQLite backend (langgraph-checkpoint-sqlite)
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from ..utils.config import CheckpointConfig
+
+try:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    SQLITE_CHECKPOINT_AVAILABLE = True
+except ImportError:
+    aiosqlite = None
+    AsyncSqliteSaver = None
+    SQLITE_CHECKPOINT_AVAILABLE = False
+
+
+# JSON-encoded channels whose payload may embed stripped fields
+JSON_ENCODED_FIELDS = ("final_response",)
+
+
+def strip_large_fields(value: Any, fields: Iterable[str]) -> Any:
+    """Copy of value with the named keys removed at any depth.
+
+    JSON strings stored under JSON_ENCODED_FIELDS (final_response embeds the
+    audio blob) are decoded, stripped and re-encoded.
+    """
+    fields = frozenset(fields)
+    if not fields:
+        return value
+
+    def strip(item: Any) -> Any:
+        if isinstance(item, dict):
+            result = {}
+            for key, inner in item.items():
+                if key in fields:
+                    continue
+                if key in JSON_ENCODED_FIELDS and isinstance(inner, str):
+                    inner = _strip_json_string(inner, strip)
+                result[key] = strip(inner)
+            return result
+        if isinstance(item, list):
+            return [strip(inner) for inner in item]
+        return item
+
+    return strip(value)
+
+
+def _strip_json_string(text: str, strip) -> str:
+    try:
+        decoded = json.loads(text)
+    except (TypeError, ValueError):
+        return text
+    if not isinstance(decoded, dict):
+        return text
+    return json.dumps(strip(decoded), ensure_ascii=False)
+
+
+def _strip_checkpoint(checkpoint: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    stripped = dict(checkpoint)
+    stripped["channel_values"] = strip_large_fields(checkpoint.get("channel_values", {}), fields)
+    return stripped
+
+
+def _strip_writes(writes: Sequence[Tuple[str, Any]], fields: Sequence[str]) -> List[Tuple[str, Any]]:
+    """Stripped channels are written as None so the write itself is kept"""
+    result = []
+    for channel, value in writes:
+        if channel in fields:
+            value = None
+        elif channel in JSON_ENCODED_FIELDS and isinstance(value, str):
+            value = strip_large_fields({channel: value}, fields)[channel]
+        else:
+            value = strip_large_fields(value, fields)
+        result.append((channel, value))
+    return result
+
+
+class BoundedMemorySaver(MemorySaver):
+    """MemorySaver with bounded history, session count and idle age.
+
+    Only the newest ``max_checkpoints_per_thread`` checkpoints of a session are
+    kept (the latest one is all ``get_workflow_state`` needs). Sessions idle
+    for longer than ``max_age_seconds`` or beyond ``max_threads`` (least
+    recently written first) are dropped.
+    """
+
+    def __init__(
+        self,
+        max_threads: int = 1000,
+        max_checkpoints_per_thread: int = 4,
+        max_age_seconds: float = 3600,
+        strip_fields: Sequence[str] = ("audio_data",)
+    ):
+        super().__init__()
+        self.max_threads = max(1, max_threads)
+        self.max_checkpoints_per_thread = max(1, max_checkpoints_per_thread)
+        self.max_age_seconds = max_age_seconds
+        self.strip_fields = tuple(strip_fields)
+        self._lock = threading.RLock()
+        # thread_id -> last write time, oldest first
+        self._threads: "OrderedDict[str, float]" = OrderedDict()
+        # (thread_id, checkpoint_ns) -> checkpoint_id -> channel_versions, oldest first
+        self._history: Dict[Tuple[str, str], "OrderedDict[str, Dict[str, Any]]"] = {}
+        # (thread_id, checkpoint_ns) -> {(channel, version)} stored in self.blobs
+        self._blob_keys: Dict[Tuple[str, str], Set[Tuple[str, Any]]] = {}
+        self.stats = {"checkpoints_pruned": 0, "threads_evicted": 0}
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        checkpoint = _strip_checkpoint(checkpoint, self.strip_fields)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            key = (thread_id, checkpoint_ns)
+            history = self._history.setdefault(key, OrderedDict())
+            history[checkpoint["id"]] = dict(checkpoint.get("channel_versions", {}))
+            self._blob_keys.setdefault(key, set()).update(new_versions.items())
+            self._prune_history(key, history)
+            self._touch(thread_id)
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        writes = _strip_writes(writes, self.strip_fields)
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._threads.pop(thread_id, None)
+            keys = [key for key in self._history if key[0] == thread_id]
+            if not keys:
+                super().delete_thread(thread_id)
+                return
+            for key in keys:
+                _, checkpoint_ns = key
+                for checkpoint_id in self._history.pop(key):
+                    self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                for channel, version in self._blob_keys.pop(key, set()):
+                    self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+            self.storage.pop(thread_id, None)
+
+    def _prune_history(self, key: Tuple[str, str], history: "OrderedDict[str, Dict[str, Any]]"):
+        thread_id, checkpoint_ns = key
+        pruned = False
+        while len(history) > self.max_checkpoints_per_thread:
+            checkpoint_id, _ = history.popitem(last=False)
+            self.storage[thread_id][checkpoint_ns].pop(checkpoint_id, None)
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            self.stats["checkpoints_pruned"] += 1
+            pruned = True
+        if not pruned:
+            return
+        # Blobs are shared between checkpoints; drop the ones no survivor references
+        referenced = {item for versions in history.values() for item in versions.items()}
+        blob_keys = self._blob_keys.get(key, set())
+        for channel, version in blob_keys - referenced:
+            self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        blob_keys &= referenced
+
+    def _touch(self, thread_id: str):
+        now = time.time()
+        self._threads[thread_id] = now
+        self._threads.move_to_end(thread_id)
+        cutoff = now - self.max_age_seconds
+        while self._threads:
+            oldest, written_at = next(iter(self._threads.items()))
+            if oldest == thread_id:
+                break
+            if written_at >= cutoff and len(self._threads) <= self.max_threads:
+                break
+            self.delete_thread(oldest)
+            self.stats["threads_evicted"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "threads": len(self._threads),
+                "checkpoints": sum(len(history) for history in self._history.values()),
+                "blobs": len(self.blobs),
+                "max_threads": self.max_threads,
+                "max_checkpoints_per_thread": self.max_checkpoints_per_thread,
+                **self.stats
+            }
+
+
+if SQLITE_CHECKPOINT_AVAILABLE:
+
+    class BoundedSqliteSaver(AsyncSqliteSaver):
+        """AsyncSqliteSaver with the same stripping and limits as BoundedMemorySaver"""
+
+        def __init__(
+            self,
+            conn,
+            max_threads: int = 1000,
+            max_checkpoints_per_thread: int = 4,
+            max_age_seconds: float = 3600,
+            strip_fields: Sequence[str] = ("audio_data",)
+        ):
+            super().__init__(conn)
+            self.max_threads = max(1, max_threads)
+            self.max_checkpoints_per_thread = max(1, max_checkpoints_per_thread)
+            self.max_age_seconds = max_age_seconds
+            self.strip_fields = tuple(strip_fields)
+            self.stats = {"checkpoints_pruned": 0, "threads_evicted": 0}
+            self._threads_table_ready = False
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            checkpoint = _strip_checkpoint(checkpoint, self.strip_fields)
+            result = await super().aput(config, checkpoint, metadata, new_versions)
+            await self._prune(str(config["configurable"]["thread_id"]), config["configurable"]["checkpoint_ns"])
+            return result
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            writes = _strip_writes(writes, self.strip_fields)
+            await super().aput_writes(config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id: str) -> None:
+            await super().adelete_thread(thread_id)
+            if not self._threads_table_ready:
+                return
+            async with self.lock:
+                await self.conn.execute("DELETE FROM checkpoint_threads WHERE thread_id = ?", (str(thread_id),))
+                await self.conn.commit()
+
+        async def _prune(self, thread_id: str, checkpoint_ns: str):
+            now = time.time()
+            async with self.lock:
+                if not self._threads_table_ready:
+                    await self.conn.execute(
+                        "CREATE TABLE IF NOT EXISTS checkpoint_threads ("
+                        " thread_id TEXT PRIMARY KEY,"
+                        " updated_at REAL NOT NULL)"
+                    )
+                    await self.conn.execute(
+                        "CREATE INDEX IF NOT EXISTS idx_checkpoint_threads_updated_at"
+                        " ON checkpoint_threads (updated_at)"
+                    )
+                    self._threads_table_ready = True
+                # Checkpoint ids are time-ordered, so the newest sort last
+                cursor = await self.conn.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                    " SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                    " ORDER BY checkpoint_id DESC LIMIT ?)",
+                    (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.max_checkpoints_per_thread)
+                )
+                if cursor.rowcount > 0:
+                    self.stats["checkpoints_pruned"] += cursor.rowcount
+                    await self.conn.execute(
+                        "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                        " SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?)",
+                        (thread_id, checkpoint_ns, thread_id, checkpoint_ns)
+                    )
+                await self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoint_threads (thread_id, updated_at) VALUES (?, ?)",
+                    (thread_id, now)
+                )
+                cursor = await self.conn.execute(
+                    "SELECT thread_id FROM checkpoint_threads WHERE thread_id != ? AND (updated_at < ? OR thread_id IN ("
+                    " SELECT thread_id FROM checkpoint_threads ORDER BY updated_at DESC LIMIT -1 OFFSET ?))",
+                    (thread_id, now - self.max_age_seconds, self.max_threads)
+                )
+                expired = [row[0] for row in await cursor.fetchall()]
+                for expired_id in expired:
+                    await self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (expired_id,))
+                    await self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (expired_id,))
+                    await self.conn.execute("DELETE FROM checkpoint_threads WHERE thread_id = ?", (expired_id,))
+                self.stats["threads_evicted"] += len(expired)
+                await self.conn.commit()
+
+        async def aclose(self):
+            await self.conn.close()
+
+        def get_stats(self) -> Dict[str, Any]:
+            return {
+                "backend": "sqlite",
+                "max_threads": self.max_threads,
+                "max_checkpoints_per_thread": self.max_checkpoints_per_thread,
+                **self.stats
+            }
+
+
+def create_checkpointer(checkpoint_config: Optional[CheckpointConfig] = None):
+    """Build the configured bounded checkpointer.
+
+    The SQLite backend needs langgraph-checkpoint-sqlite and a running event
+    loop; otherwise the in-memory saver is used.
+    """
+    if not isinstance(checkpoint_config, CheckpointConfig):
+        checkpoint_config = CheckpointConfig()
+    logger = logging.getLogger(__name__)
+    limits = dict(
+        max_threads=checkpoint_config.max_threads,
+        max_checkpoints_per_thread=checkpoint_config.max_checkpoints_per_thread,
+        max_age_seconds=checkpoint_config.max_age_minutes * 60,
+        strip_fields=checkpoint_config.strip_fields
+    )
+    backend = checkpoint_config.backend.lower()
+    if backend == "sqlite":
+        if not SQLITE_CHECKPOINT_AVAILABLE:
+            logger.warning("langgraph-checkpoint-sqlite not installed; using in-memory checkpointer")
+        else:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                logger.warning("SQLite checkpointer needs a running event loop; using in-memory checkpointer")
+            else:
+                path = Path(checkpoint_config.sqlite_path)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                return BoundedSqliteSaver(aiosqlite.connect(str(path)), **limits)
+    elif backend != "memory":
+        raise ValueError(f"Unsupported checkpoint backend: {checkpoint_config.backend}")
+    return BoundedMemorySaver(**limits)
@@ -4,16 +4,17 @@ LangGraph-based workflow for Home AI System
 Orchestrates intent analysis, device control, and character responses using LangGraph state management
 """
 import asyncio
+import base64
 import json
 import uuid
-from typing import Dict, List, Optional, Any, TypedDict, Annotated
+from typing import Dict, List, Optional, Any, AsyncIterator, TypedDict, Annotated
 from datetime import datetime
 import logging
 
 try:
     from langgraph.graph import StateGraph, START, END
     from langgraph.graph.message import add_messages
-    from langgraph.checkpoint.memory import MemorySaver
+    from .checkpointer import create_checkpointer
     LANGGRAPH_AVAILABLE = True
     print("✅ LangGraph available")
 except ImportError:
@@ -35,17 +36,22 @@ except ImportError:
         return decorator
 
 from ..utils.config import Config, load_config
-from ..utils.audio_cache import save_base64_mp3_to_cache, try_upload_temp_cloud, make_absolute_url
+from ..utils.audio_cache import make_absolute_url
+from ..utils.audio_handle import AudioHandle
 from ..services.database_service import DatabaseService
+from ..services.async_database_service import AsyncDatabaseService
 from ..core.context_manager import ContextManager, SystemContext
 from ..core.intent_analyzer import IntentAnalyzer
 from ..core.device_controller import DeviceController
 from ..core.character_system import CharacterSystem
 from ..core.unified_responder import UnifiedResponder
+from ..core.fast_intent import recognize_fast_intent, render_fast_reply
 from ..utils.task_planner import TaskPlanner
 from ..core.tool_executor import ToolExecutor
 from ..services.langfuse_session_manager import LangfuseSessionManager
 from ..services.agora_tts_service import AgoraTTSService
+from ..services.tts_pipeline import CONCATENABLE_AUDIO_FORMATS, TTSSentencePipeline
+from ..services.audio_upload_service import get_shared_audio_uploader
 from ..services.conversation_summary_service import ConversationSummaryService
 from .planner_nodes import PlannerNodes
 
@@ -58,7 +64,7 @@ class AISystemState(TypedDict):
     intent_analysis: Optional[Dict]
     device_actions: Optional[List[Dict]]
     character_response: Optional[str]
-    audio_data: Optional[str]
+    audio_data: Optional[AudioHandle]  # Raw bytes or cached file; never base64
     audio_generation_result: Optional[Dict]
     cached_audio_url: Optional[str]
     cloud_audio_url: Optional[str]
@@ -93,7 +99,14 @@ class LangGraphHomeAISystem:
 
         # Initialize services
         self.db_service = DatabaseService(self.config)
-        self.context_manager = ContextManager()
+        self.async_db = AsyncDatabaseService(self.config, self.db_service)
+        self.context_manager = ContextManager(
+            max_turns=self.config.system.max_conversation_turns,
+            max_sessions=self.config.system.max_active_conversations,
+            idle_timeout_minutes=self.config.system.conversation_timeout_minutes,
+            db_service=self.db_service,
+            async_db=self.async_db
+        )
         self.intent_analyzer = IntentAnalyzer(self.config)
         self.device_controller = DeviceController(self.config)
         self.character_system = CharacterSystem(self.config)
@@ -106,10 +119,13 @@ class LangGraphHomeAISystem:
         # Use unified task planner approach with optimized responder
         self.use_unified_mode = True
         self.use_optimized_responder = True  # NEW: Enable optimized single-call response
+        # Device actions still running for turns whose stream was abandoned
+        self._detached_device_tasks = set()
 
         # Initialize LangGraph workflow
         if LANGGRAPH_AVAILABLE:
-            self.memory = MemorySaver()
+            # Bounded: audio payloads are stripped and old sessions are dropped
+            self.memory = create_checkpointer(getattr(self.config, "checkpoint", None))
             self.workflow = self._create_workflow()
         else:
             self.workflow = None
@@ -195,33 +211,25 @@ class LangGraphHomeAISystem:
                     context.add_user_message(user_input, max_history=self.config.system.max_conversation_turns)
                 except Exception:
                     pass
-                unified_result = await self.unified_responder.process_and_respond(
-                    user_input=user_input,
-                    context=context
-                )
                 
-                if not unified_result.get("success"):
-                    return {**state, "error": unified_result.get("error", "Unified response failed")}
+                fast_match = await recognize_fast_intent(self.config, user_input)
+                if fast_match:
+                    turn_state = await self._fast_path_turn(state, context, fast_match)
+                else:
+                    # Non-streaming /chat keeps the plain call (and the Gemini
+                    # MAX_TOKENS retry in GeminiLLMClient.generate)
+                    unified_result = await self.unified_responder.process_and_respond(
+                        user_input=user_input,
+                        context=context
+                    )
+                    turn_state = self._unified_turn_state(state, context, unified_result)
                 
-                intent = unified_result["intent"]
-                response = unified_result["response"]
-                # Append assistant response into conversation history
-                try:
-                    context.add_assistant_response(response, max_history=self.config.system.max_conversation_turns)
-                except Exception:
-                    pass
+                if turn_state.get("error"):
+                    return {**state, "error": turn_state["error"]}
                 
                 return {
-                    **state,
-                    "session_id": session_id or str(uuid.uuid4()),
-                    "context": context.to_dict(),
-                    "character_response": response,
-                    "intent_analysis": intent,
-                    "metadata": {
-                        "optimized_mode": True,
-                        "api_calls": 1,
-                        "timestamp": datetime.now().isoformat()
-                    }
+                    **turn_state,
+                    "session_id": session_id or str(uuid.uuid4())
                 }
             else:
                 # TRADITIONAL PATH: Use task planner (2 API calls)
@@ -284,6 +292,10 @@ class LangGraphHomeAISystem:
     async def _execute_device_actions_node(self, state: AISystemState) -> AISystemState:
         """Node for device action execution with familiarity check"""
         try:
+            # Already executed while the character reply was streaming
+            if state.get("device_actions") is not None:
+                return state
+
             self.logger.info("Executing device actions")
 
             intent_analysis = state.get("intent_analysis", {})
@@ -405,20 +417,7 @@ class LangGraphHomeAISystem:
             self.logger.info("Finalizing response")
 
             # Create final response structure (filter sensitive information)
-            device_actions = state.get("device_actions", []) or []
-            # Remove sensitive familiarity information from device actions
-            filtered_device_actions = []
-            for action in device_actions if device_actions else []:
-                filtered_action = {
-                    "success": action.get("success", False),
-                    "device": action.get("device"),
-                    "action": action.get("action")
-                }
-                # Only add reason if it's not familiarity-related
-                reason = action.get("reason")
-                if reason and reason != "insufficient_familiarity":
-                    filtered_action["reason"] = reason
-                filtered_device_actions.append(filtered_action)
+            filtered_device_actions = self._filter_device_actions(state.get("device_actions"))
             
             base_response_text = state.get("character_response", "I apologize, but I couldn't generate a response.")
 
@@ -432,30 +431,26 @@ class LangGraphHomeAISystem:
                 "response": response_text,
                 "intent_analysis": state.get("intent_analysis", {}),
                 "device_actions": filtered_device_actions,
-                "audio": None,
                 "audio_url": preferred_url,
+                "audio_upload_id": (state.get("metadata") or {}).get("audio_upload_id"),
                 "session_id": state.get("session_id"),
                 "timestamp": datetime.now().isoformat(),
                 "metadata": state.get("metadata", {})
             }
 
-            audio_data = state.get("audio_data")
-            if audio_data:
-                audio_result = state.get("audio_generation_result", {}) or {}
-                voice_value = audio_result.get("voice") or getattr(self.agora_tts, "default_voice", None)
-                final_response["audio"] = {
-                    "data": audio_data,
-                    "format": audio_result.get("format", "base64_mp3"),
-                    "voice": voice_value,
-                    "timestamp": audio_result.get("timestamp") or datetime.now().isoformat()
-                }
-            else:
-                final_response.pop("audio", None)
-
             # Update context after successful processing
             if state.get("context") and not state.get("error"):
                 await self._update_context(state)
 
+            # Conversation metadata travels with the result so API handlers
+            # need no follow-up queries
+            turn_info = await self._record_conversation_turn(state)
+            if turn_info:
+                final_response["conversation_id"] = turn_info.conversation_id
+                final_response["message_count"] = turn_info.message_count
+                final_response["familiarity_score"] = turn_info.familiarity_score
+                await self._record_message(state, turn_info.conversation_id)
+
             return {
                 **state,
                 "final_response": json.dumps(final_response, indent=2)
@@ -465,6 +460,49 @@ class LangGraphHomeAISystem:
             self.logger.error(f"Response finalization failed: {e}")
             return {**state, "error": f"Response finalization failed: {str(e)}"}
 
+    async def _record_conversation_turn(self, state: AISystemState):
+        """Count this turn on the conversation row; None if the database is unavailable"""
+        try:
+            return await self.async_db.record_conversation_turn(
+                user_id=state.get("user_id") or "default_user",
+                conversation_id=state.get("session_id")
+            )
+        except Exception as e:
+            self.logger.warning(f"Failed to record conversation turn: {e}")
+            return None
+
+    async def _record_message(self, state: AISystemState, conversation_id: str):
+        """Queue the turn's Message row; ContextManager rehydrates evicted sessions from it"""
+        if state.get("error"):
+            return
+        try:
+            await self.async_db.queue_write(
+                "message",
+                conversation_id=conversation_id,
+                user_input=state.get("user_input"),
+                assistant_response=state.get("character_response"),
+                intent_detected=state.get("intent_analysis") or {},
+                tools_used=["device_controller"] if state.get("device_actions") else []
+            )
+        except Exception as e:
+            self.logger.warning(f"Failed to record message: {e}")
+
+    def _filter_device_actions(self, device_actions: Optional[List[Dict]]) -> List[Dict]:
+        """Remove sensitive familiarity information from device actions"""
+        filtered_device_actions = []
+        for action in device_actions or []:
+            filtered_action = {
+                "success": action.get("success", False),
+                "device": action.get("device"),
+                "action": action.get("action")
+            }
+            # Only add reason if it's not familiarity-related
+            reason = action.get("reason")
+            if reason and reason != "insufficient_familiarity":
+                filtered_action["reason"] = reason
+            filtered_device_actions.append(filtered_action)
+        return filtered_device_actions
+
     @observe(name="handle_error_node")
     async def _handle_error_node(self, state: AISystemState) -> AISystemState:
         """Node for error handling"""
@@ -477,6 +515,9 @@ class LangGraphHomeAISystem:
             "session_id": state.get("session_id"),
             "timestamp": datetime.now().isoformat()
         }
+        if state.get("device_actions"):
+            # Actions that already ran (overlapped with a reply that then failed)
+            error_response["device_actions"] = self._filter_device_actions(state["device_actions"])
 
         return {
             **state,
@@ -507,18 +548,13 @@ class LangGraphHomeAISystem:
             session_id = state.get("session_id")
             user_id = state.get("user_id")
 
-            current = self.context_manager.get_context()
-            if session_id:
-                if not current.session_id or current.session_id != session_id:
-                    context = self.context_manager.create_session(session_id)
-                else:
-                    context = current
-            else:
-                context = current
+            # Per-session store: concurrent sessions no longer overwrite each other
+            context = await self.context_manager.get_context_async(session_id, user_id)
+            context.user_id = user_id or ""
             
             # Load user familiarity from database
             if user_id:
-                familiarity = self.db_service.get_user_familiarity(user_id)
+                familiarity = await self.async_db.get_user_familiarity(user_id)
                 context.familiarity_score = familiarity
                 self.logger.info(f"Loaded user familiarity: {familiarity}/100")
             else:
@@ -542,16 +578,28 @@ class LangGraphHomeAISystem:
             self.logger.error(f"Context update failed: {e}")
 
     @observe(name="langgraph_workflow")
-    async def process_message(self, user_input: str, user_id: str = None, session_id: str = None) -> Dict[str, Any]:
-        """Process a user message through the LangGraph workflow with Langfuse tracing"""
+    async def process_message(
+        self,
+        user_input: str,
+        user_id: str = None,
+        session_id: str = None,
+        include_audio: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Process a user message through the LangGraph workflow with Langfuse tracing.
+
+        Audio is returned by URL; pass include_audio=True to also get it inline
+        as base64 under "audio".
+        """
         if not LANGGRAPH_AVAILABLE:
             raise RuntimeError("LangGraph is not available. Please install langgraph package.")
 
-        # Create initial state
+        # Create initial state (the session id doubles as the checkpoint thread id)
+        session_id = session_id or str(uuid.uuid4())
         initial_state = AISystemState(
             user_input=user_input,
             user_id=user_id or str(uuid.uuid4()),
-            session_id=session_id or str(uuid.uuid4()),
+            session_id=session_id,
             context=None,
             intent_analysis=None,
             device_actions=None,
@@ -566,8 +614,7 @@ class LangGraphHomeAISystem:
         )
 
         # Execute workflow with Langfuse tracing
-        thread_id = session_id or str(uuid.uuid4())
-        config = {"configurable": {"thread_id": thread_id}}
+        config = {"configurable": {"thread_id": session_id}}
 
         # No need to manually start trace - @observe decorators will handle it
 
@@ -577,6 +624,10 @@ class LangGraphHomeAISystem:
             # Parse final response
             final_response_str = result.get("final_response", "{}")
             final_response = json.loads(final_response_str)
+            if include_audio:
+                inline_audio = await self._inline_audio(result)
+                if inline_audio:
+                    final_response["audio"] = inline_audio
 
             # Score the trace if Langfuse is enabled
             if self.langfuse_enabled and self.langfuse_client:
@@ -615,6 +666,410 @@ class LangGraphHomeAISystem:
                 "timestamp": datetime.now().isoformat()
             }
 
+    async def _stream_unified_turn(
+        self,
+        state: AISystemState,
+        context: SystemContext
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the unified LLM call with device execution overlapped.
+
+        The responder's output is parsed incrementally; once the intent object
+        closes, device actions start in a background task while the model is
+        still writing the reply. Yields token events, then a final
+        {"type": "state", "state": ...} with character_response, intent_analysis
+        and (when execution overlapped) device_actions filled in.
+
+        A started device task is never cancelled: if the reply fails its
+        result is still reported with the error, and if the consumer goes
+        away it finishes in the background.
+        """
+        fast_match = await recognize_fast_intent(self.config, state["user_input"])
+        if fast_match:
+            fast_state = await self._fast_path_turn(state, context, fast_match)
+            yield {"type": "token", "text": fast_state["character_response"]}
+            yield {"type": "state", "state": fast_state}
+            return
+
+        device_task: Optional[asyncio.Task] = None
+        early_intent: Optional[Dict[str, Any]] = None
+        unified_result: Dict[str, Any] = {}
+        finished = False
+        try:
+            async for event in self.unified_responder.stream_and_respond(
+                user_input=state["user_input"],
+                context=context
+            ):
+                if event["type"] == "token":
+                    yield event
+                elif event["type"] == "intent":
+                    early_state = {**state, "intent_analysis": event["intent"]}
+                    if device_task is None and self._should_execute_devices(early_state) == "execute":
+                        self.logger.info("⚡ Intent parsed early - starting device actions during reply generation")
+                        early_intent = event["intent"]
+                        device_task = asyncio.create_task(self._execute_device_actions_node(early_state))
+                elif event["type"] == "result":
+                    unified_result = event
+
+            new_state = self._unified_turn_state(state, context, unified_result)
+            if device_task is not None:
+                device_state = await device_task
+                new_state = self._merge_overlapped_devices(new_state, device_state, early_intent)
+
+            finished = True
+            yield {"type": "state", "state": new_state}
+        finally:
+            if device_task is not None and not finished:
+                self._detach_device_task(device_task)
+
+    def _unified_turn_state(
+        self,
+        state: AISystemState,
+        context: SystemContext,
+        unified_result: Dict[str, Any]
+    ) -> AISystemState:
+        """Workflow state for a finished unified responder call"""
+        if not unified_result.get("success"):
+            return {**state, "error": unified_result.get("error", "Unified response failed")}
+
+        response = unified_result["response"]
+        # Append assistant response into conversation history
+        try:
+            context.add_assistant_response(response, max_history=self.config.system.max_conversation_turns)
+        except Exception:
+            pass
+
+        return {
+            **state,
+            "context": context.to_dict(),
+            "character_response": response,
+            "intent_analysis": unified_result["intent"],
+            "metadata": {
+                "optimized_mode": True,
+                "api_calls": 1,
+                "timestamp": datetime.now().isoformat()
+            }
+        }
+
+    def _merge_overlapped_devices(
+        self,
+        new_state: AISystemState,
+        device_state: AISystemState,
+        executed_intent: Dict[str, Any]
+    ) -> AISystemState:
+        """Report the result of device actions that ran while the reply streamed"""
+        if device_state.get("error"):
+            return {**new_state, "error": new_state.get("error") or device_state["error"]}
+
+        merged = {
+            **new_state,
+            "device_actions": device_state.get("device_actions") or [],
+            "metadata": {
+                **(new_state.get("metadata") or {}),
+                **(device_state.get("metadata") or {}),
+                "device_actions_overlapped": True
+            }
+        }
+        final_intent = new_state.get("intent_analysis")
+        if final_intent != executed_intent:
+            if final_intent is not None:
+                # Fallback parsing produced a different intent; report what actually ran
+                self.logger.warning(f"Final intent differs from the executed early intent: {final_intent} != {executed_intent}")
+                merged["metadata"]["early_intent_mismatch"] = True
+            merged["intent_analysis"] = executed_intent
+        return merged
+
+    def _detach_device_task(self, device_task: asyncio.Task):
+        """Let device actions started for an abandoned turn finish and log their outcome"""
+        self._detached_device_tasks.add(device_task)
+
+        def done(task: asyncio.Task):
+            self._detached_device_tasks.discard(task)
+            if task.cancelled():
+                return
+            error = task.exception()
+            result = task.result() if error is None else {"error": str(error)}
+            if result.get("error"):
+                self.logger.error(f"Device actions of an abandoned turn failed: {result['error']}")
+            else:
+                self.logger.info(f"Device actions of an abandoned turn finished: {result.get('device_actions')}")
+
+        device_task.add_done_callback(done)
+
+    async def _fast_path_turn(self, state: AISystemState, context: SystemContext, match) -> AISystemState:
+        """Templated turn for a rule-recognized device command (no LLM call)
+
+        The command runs first so the reply reports what actually happened.
+        """
+        allowed = context.familiarity_score >= self.config.system.min_familiarity_for_hardware
+        intent = match.to_intent()
+        intent["familiarity_check"] = "passed" if allowed else "insufficient"
+        context.add_intent(intent)
+
+        device_actions = None
+        succeeded = True
+        if allowed:
+            device_result = await self.device_controller.process_device_intent(intent, context)
+            succeeded = bool(device_result.get("success") or (device_result.get("execution") or {}).get("success"))
+            device_actions = [{
+                **device_result,
+                "success": succeeded,
+                "device": match.category,
+                "action": match.command
+            }]
+            if not succeeded:
+                device_actions[0]["reason"] = device_result.get("error") or "execution_failed"
+
+        response = render_fast_reply(match, context.familiarity_score, allowed, succeeded)
+        try:
+            context.add_assistant_response(response, max_history=self.config.system.max_conversation_turns)
+        except Exception:
+            pass
+
+        self.logger.info(f"⚡ Fast-path intent: {match.device_id} -> {match.command} ({match.confidence}, success={succeeded})")
+        fast_state = {
+            **state,
+            "context": context.to_dict(),
+            "character_response": response,
+            "intent_analysis": intent,
+            "metadata": {
+                "optimized_mode": True,
+                "fast_path": True,
+                "api_calls": 0,
+                "timestamp": datetime.now().isoformat()
+            }
+        }
+        if device_actions is not None:
+            # execute_device_actions skips work that already ran
+            fast_state["device_actions"] = device_actions
+            fast_state["metadata"]["device_actions_timestamp"] = datetime.now().isoformat()
+        return fast_state
+
+    async def process_message_stream(
+        self,
+        user_input: str,
+        user_id: str = None,
+        session_id: str = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a user message, yielding events as each stage completes.
+
+        The character reply is streamed token by token; device execution, TTS
+        and audio caching then run through the same node methods as the graph
+        and are pushed as later events:
+            token          - {"text"}: next piece of the character reply
+            audio          - {"index", "text", "data", "format"}: base64 audio for
+                             sentence `index`, in order (pipelined TTS only)
+            response       - {"response", "intent_analysis", "session_id"}
+            device_actions - {"device_actions"} (only when hardware is involved)
+            done           - same payload as process_message (audio by URL only)
+            error          - {"error", "response", "session_id"}
+        """
+        user_id = user_id or str(uuid.uuid4())
+        session_id = session_id or str(uuid.uuid4())
+
+        if not self.use_optimized_responder:
+            # Task-planner path has no streaming LLM call; emit the whole turn
+            result = await self.process_message(user_input, user_id=user_id, session_id=session_id)
+            yield {"type": "response", "response": result.get("response"), "session_id": session_id}
+            yield {"type": "done", **result}
+            return
+
+        state = AISystemState(
+            user_input=user_input,
+            user_id=user_id,
+            session_id=session_id,
+            context=None,
+            intent_analysis=None,
+            device_actions=None,
+            character_response=None,
+            audio_data=None,
+            audio_generation_result=None,
+            cached_audio_url=None,
+            cloud_audio_url=None,
+            final_response=None,
+            error=None,
+            metadata={}
+        )
+
+        # Sentences are synthesized while the reply is still streaming, so the
+        # first audio depends on the first sentence rather than the whole reply
+        pipeline = self._create_tts_pipeline()
+
+        try:
+            context = await self._load_context(state)
+            if not context:
+                state = {**state, "error": "Failed to load context"}
+            else:
+                try:
+                    context.add_user_message(user_input, max_history=self.config.system.max_conversation_turns)
+                except Exception:
+                    pass
+
+                async for event in self._stream_unified_turn(state, context):
+                    if event["type"] == "token":
+                        yield event
+                        if pipeline:
+                            pipeline.feed(event.get("text") or "")
+                            for chunk in pipeline.ready_chunks():
+                                yield self._audio_event(chunk)
+                    elif event["type"] == "state":
+                        state = event["state"]
+
+                if not state.get("error"):
+                    state["metadata"]["streamed"] = True
+                    yield {
+                        "type": "response",
+                        "response": state["character_response"],
+                        "intent_analysis": state["intent_analysis"],
+                        "session_id": session_id
+                    }
+
+            if not state.get("error") and self._should_execute_devices(state) == "execute":
+                state = await self._execute_device_actions_node(state)
+                if not state.get("error"):
+                    yield {
+                        "type": "device_actions",
+                        "device_actions": self._filter_device_actions(state.get("device_actions"))
+                    }
+
+            if not state.get("error") and pipeline:
+                async for chunk in pipeline.chunks():
+                    yield self._audio_event(chunk)
+                state = await self._pipelined_audio_state(state, pipeline)
+            elif not state.get("error"):
+                state = await self._generate_audio_node(state)
+            if not state.get("error"):
+                state = await self._cache_audio_node(state)
+                state = await self._finalize_response_node(state)
+        except Exception as e:
+            self.logger.error(f"Streaming workflow failed: {e}")
+            state = {**state, "error": str(e)}
+        finally:
+            if pipeline:
+                pipeline.cancel()
+
+        if state.get("error"):
+            state = await self._handle_error_node(state)
+            yield {"type": "error", **json.loads(state["final_response"])}
+            return
+
+        final_response = json.loads(state.get("final_response") or "{}")
+        yield {"type": "done", **final_response}
+
+    async def _inline_audio(self, state: AISystemState) -> Optional[Dict[str, Any]]:
+        """Base64 payload for clients that asked for inline audio"""
+        handle = state.get("audio_data")
+        if not handle:
+            return None
+        audio_result = state.get("audio_generation_result") or {}
+        return {
+            "data": await handle.to_base64(),
+            "format": f"base64_{handle.format}",
+            "voice": audio_result.get("voice") or getattr(self.agora_tts, "default_voice", None),
+            "timestamp": audio_result.get("timestamp") or datetime.now().isoformat()
+        }
+
+    def _create_tts_pipeline(self) -> Optional[TTSSentencePipeline]:
+        """Per-reply sentence pipeline, or None when TTS or pipelining is off"""
+        tts_config = self.config.tts
+        if not self.agora_tts.enabled or not getattr(tts_config, "pipelined_streaming", False):
+            return None
+        return TTSSentencePipeline(
+            self.agora_tts,
+            voice=self.agora_tts._resolve_voice(self.tool_executor.tts_default_voice),  # noqa: SLF001 - matches execute_agora_tts
+            audio_format=self.tool_executor.tts_format,
+            max_parallel=tts_config.pipeline_max_parallel,
+            max_chars=tts_config.sentence_max_chars
+        )
+
+    def _audio_event(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "type": "audio",
+            "index": chunk["index"],
+            "text": chunk["text"],
+            "data": base64.b64encode(chunk["audio"]).decode(),
+            "format": self.tool_executor.tts_format or "mp3"
+        }
+
+    async def _pipelined_audio_state(self, state: AISystemState, pipeline: TTSSentencePipeline) -> AISystemState:
+        """Store the joined sentence audio so _cache_audio_node can publish it like a single clip
+
+        Per-sentence streams only join into a valid file for MP3; other formats
+        fall back to one whole-reply synthesis (usually a TTS cache hit later).
+        """
+        extension = self.agora_tts._file_extension(self.agora_tts._output_format(pipeline.audio_format))  # noqa: SLF001
+        if extension not in CONCATENABLE_AUDIO_FORMATS:
+            self.logger.info(f"Pipelined {extension} audio cannot be joined; synthesizing the whole reply")
+            state = await self._generate_audio_node(state)
+            return {
+                **state,
+                "metadata": {
+                    **state.get("metadata", {}),
+                    "audio_pipelined": True,
+                    "audio_joined": False
+                }
+            }
+
+        audio = pipeline.audio
+        failed = pipeline.failed_sentences
+        handle = None
+        if audio:
+            stored = None
+            if not failed:
+                # A partial clip must not be cached under the full reply's key
+                stored = await self.agora_tts.store_audio(
+                    state["character_response"],
+                    audio,
+                    voice=pipeline.voice,
+                    audio_format=pipeline.audio_format
+                )
+            # Without the TTS cache the bytes stay in memory until _cache_audio_node
+            handle = AudioHandle.from_file(stored.path, stored.url, extension) if stored else AudioHandle.from_bytes(audio, extension)
+
+        if handle:
+            audio_result = {
+                "success": True,
+                "audio_data": handle,
+                "audio_path": handle.path,
+                "audio_url": handle.url,
+                "text": state["character_response"],
+                "voice": pipeline.voice,
+                "format": extension,
+                "sentences": len(pipeline.sentences),
+                "failed_sentences": failed,
+                "partial": bool(failed),
+                "timestamp": datetime.now().isoformat()
+            }
+            if failed:
+                self.logger.warning(f"Pipelined audio is missing sentences {failed}")
+        else:
+            audio_result = {"success": False, "error": "TTS synthesis failed"}
+        return {
+            **state,
+            "audio_data": handle,
+            "audio_generation_result": audio_result,
+            "metadata": {
+                **state.get("metadata", {}),
+                "audio_generation_timestamp": datetime.now().isoformat(),
+                "audio_enabled": handle is not None,
+                "audio_pipelined": True,
+                "audio_joined": handle is not None,
+                "audio_partial": bool(handle and failed)
+            }
+        }
+
+    def get_checkpoint_stats(self) -> Optional[Dict[str, Any]]:
+        """Size/eviction counters of the workflow checkpointer"""
+        get_stats = getattr(self.memory, "get_stats", None)
+        return get_stats() if get_stats else None
+
+    async def close(self):
+        """Release the checkpointer's resources (SQLite connection)"""
+        aclose = getattr(self.memory, "aclose", None)
+        if aclose:
+            await aclose()
+
     async def get_workflow_state(self, session_id: str) -> Optional[Dict]:
         """Get the current workflow state for a session"""
         if not LANGGRAPH_AVAILABLE:
@@ -767,41 +1222,50 @@ class LangGraphHomeAISystem:
     async def _cache_audio_node(self, state: AISystemState) -> AISystemState:
         """Cache audio to disk and optionally upload to temporary cloud, producing shareable URLs."""
         try:
-            audio_b64 = state.get("audio_data")
-            if not audio_b64:
+            handle = state.get("audio_data")
+            if not handle:
                 return {**state, "cached_audio_url": None, "cloud_audio_url": None}
 
-            hint = (state.get("session_id") or "speech")
-            _, local_url = save_base64_mp3_to_cache(audio_b64, filename_hint=hint)
+            if not handle.on_disk:
+                # Single asynchronous write; the in-memory bytes are released after it
+                handle = await handle.persist(filename_hint=state.get("session_id") or "speech")
+                audio_result = state.get("audio_generation_result") or {}
+                state = {
+                    **state,
+                    "audio_data": handle,
+                    "audio_generation_result": {
+                        **audio_result, "audio_data": handle, "audio_path": handle.path, "audio_url": handle.url
+                    }
+                }
+            abs_path, local_url = handle.path, handle.url
+
+            # Temporary cloud upload runs in the background; the cloud URL is
+            # published via /audio/uploads/{upload_id} and websocket events
+            upload_id = None
+            if getattr(self.config.system, "temp_upload_enabled", False):
+                try:
+                    upload = get_shared_audio_uploader(self.config).submit(
+                        abs_path,
+                        local_url=local_url,
+                        user_id=state.get("user_id"),
+                        session_id=state.get("session_id")
+                    )
+                    upload_id = upload.upload_id
+                except Exception as e:
+                    self.logger.warning(f"Audio upload not queued: {e}")
 
-            cloud_url = None
+            # Compose an absolute local URL if PUBLIC_BASE_URL is set
             try:
-                from pathlib import Path
-                from urllib.parse import unquote
-                from ..utils.audio_cache import CACHE_DIR
-                fname = unquote(local_url.rsplit("/", 1)[-1])
-                abs_path = str(Path(CACHE_DIR) / fname)
-                preferred_host = None
-                try:
-                    # Use configured temp upload host if enabled
-                    if self.config.system.temp_upload_enabled:
-                        preferred_host = self.config.system.temp_upload_host
-                except Exception:
-                    preferred_host = None
-                cloud_url = try_upload_temp_cloud(abs_path, preferred_host=preferred_host)
+                absolute_local = make_absolute_url(local_url, getattr(self.config.system, 'public_base_url', None))
             except Exception:
-                cloud_url = None
-
-            # If no cloud URL, try composing an absolute local URL if PUBLIC_BASE_URL is set
-            if not cloud_url:
-                try:
-                    absolute_local = make_absolute_url(local_url, getattr(self.config.system, 'public_base_url', None))
-                except Exception:
-                    absolute_local = None
-            else:
                 absolute_local = None
 
-            return {**state, "cached_audio_url": absolute_local or local_url, "cloud_audio_url": cloud_url}
+            return {
+                **state,
+                "cached_audio_url": absolute_local or local_url,
+                "cloud_audio_url": None,
+                "metadata": {**state.get("metadata", {}), "audio_upload_id": upload_id}
+            }
         except Exception as e:
             self.logger.error(f"Audio caching failed: {e}")
             return {**state, "cached_audio_url": None, "cloud_audio_url": None}
@@ -24,6 +24,7 @@ from ..core.unified_responder import UnifiedResponder
 from ..core.device_controller import DeviceController
 from ..core.context_manager import ContextManager, SystemContext
 from ..services.database_service import DatabaseService
+from ..services.async_database_service import AsyncDatabaseService
 from ..utils.config import Config
 
 
@@ -45,8 +46,15 @@ class OptimizedHomeAISystem:
         # Initialize components
         self.unified_responder = UnifiedResponder(config)
         self.device_controller = DeviceController(config)
-        self.context_manager = ContextManager(max_turns=config.system.max_conversation_turns)
         self.db_service = DatabaseService(config)
+        self.async_db = AsyncDatabaseService(config, self.db_service)
+        self.context_manager = ContextManager(
+            max_turns=config.system.max_conversation_turns,
+            max_sessions=config.system.max_active_conversations,
+            idle_timeout_minutes=config.system.conversation_timeout_minutes,
+            db_service=self.db_service,
+            async_db=self.async_db
+        )
         
         # Langfuse setup
         self.langfuse_enabled = False
@@ -94,13 +102,12 @@ class OptimizedHomeAISystem:
         if not session_id:
             session_id = str(uuid.uuid4())
         
-        context = self.context_manager.get_context()
-        if not context.session_id:
-            context = self.context_manager.create_session(session_id)
+        context = await self.context_manager.get_context_async(session_id, user_id)
+        context.user_id = user_id or ""
         
         # Ensure user exists in database
         if user_id:
-            self.db_service.get_or_create_user(user_id)
+            await self.async_db.get_or_create_user(user_id)
         
         # Update context with user input
         context.user_input = user_input
@@ -108,13 +115,13 @@ class OptimizedHomeAISystem:
         
         # CRITICAL: Load user familiarity from database
         if user_id:
-            context.familiarity_score = self.db_service.get_user_familiarity(user_id)
+            context.familiarity_score = await self.async_db.get_user_familiarity(user_id)
             self.logger.info(f"📊 User familiarity loaded: {context.familiarity_score}/100")
             
             # Update Langfuse metadata
             if self.langfuse_enabled and self.langfuse:
                 try:
-                    user_data = self.db_service.get_user_metadata(user_id)
+                    user_data = await self.async_db.get_user_metadata(user_id)
                     self.langfuse.update_current_trace(
                         metadata={
                             "user_interaction_count": user_data.get("interaction_count", 0),
@@ -220,17 +227,20 @@ class OptimizedHomeAISystem:
         """Handle post-response operations in background"""
         
         try:
-            # Save message to database
+            # Queue database writes (committed in batches by the write-behind queue)
             if user_id and session_id:
                 # Get or create conversation
-                conversation = self.db_service.get_or_create_conversation(
+                await self.async_db.queue_write(
+                    "conversation_turn",
                     user_id=user_id,
                     conversation_id=session_id
                 )
                 
                 # Save message
-                self.db_service.save_message(
-                    conversation_id=conversation.id,
+                await self.async_db.queue_write(
+                    "message",
+                    conversation_id=session_id,
+                    user_id=user_id,
                     user_input=user_input,
                     assistant_response=final_response,
                     tone_used=context.conversation_tone,
@@ -240,13 +250,16 @@ class OptimizedHomeAISystem:
                 )
                 
                 # Increment user interaction count
-                self.db_service.increment_user_interaction(user_id)
+                await self.async_db.queue_write("user_interaction", user_id=user_id)
                 
-                # Log device interaction if any
-                if device_result and intent.get("involves_hardware"):
-                    self.db_service.log_device_interaction(
+                # Log device interaction if an existing device was acted on
+                # (device_id is a foreign key, the intent's device name is not)
+                device_id = ((device_result or {}).get("execution") or {}).get("device_id")
+                if device_id and intent.get("involves_hardware"):
+                    await self.async_db.queue_write(
+                        "device_interaction",
                         user_id=user_id,
-                        device_id=intent.get("device", "unknown"),
+                        device_id=device_id,
                         action=intent.get("action", "unknown"),
                         parameters=intent.get("parameters", {}),
                         result=device_result,
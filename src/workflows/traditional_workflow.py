@@ -36,6 +36,7 @@ except ImportError:
 
 from ..utils.config import Config, load_config
 from ..services.database_service import DatabaseService
+from ..services.async_database_service import AsyncDatabaseService
 from ..core.context_manager import ContextManager, SystemContext
 from ..core.intent_analyzer import IntentAnalyzer
 from ..core.device_controller import DeviceController
@@ -65,12 +66,19 @@ class HomeAISystem:
         logging.basicConfig(level=getattr(logging, self.config.system.log_level))
         self.logger = logging.getLogger(__name__)
         
-        # Initialize context manager
-        self.context_manager = ContextManager()
-        
         # Initialize database service
         self.db_service = DatabaseService(self.config)
         self.db_service.initialize_default_data()
+        self.async_db = AsyncDatabaseService(self.config, self.db_service)
+        
+        # Initialize context manager
+        self.context_manager = ContextManager(
+            max_turns=self.config.system.max_conversation_turns,
+            max_sessions=self.config.system.max_active_conversations,
+            idle_timeout_minutes=self.config.system.conversation_timeout_minutes,
+            db_service=self.db_service,
+            async_db=self.async_db
+        )
         
         # Initialize components
         self.intent_analyzer = IntentAnalyzer(self.config)
@@ -155,9 +163,8 @@ class HomeAISystem:
         if not session_id:
             session_id = str(uuid.uuid4())
         
-        context = self.context_manager.get_context()
-        if not context.session_id:
-            context = self.context_manager.create_session(session_id)
+        context = await self.context_manager.get_context_async(session_id, user_id)
+        context.user_id = user_id or ""
         
         # Setup Langfuse session and user tracking
         self._setup_langfuse_session(session_id, user_id)
@@ -193,13 +200,13 @@ class HomeAISystem:
         
         # Get user familiarity from database
         if user_id:
-            context.familiarity_score = self.db_service.get_user_familiarity(user_id)
+            context.familiarity_score = await self.async_db.get_user_familiarity(user_id)
             
             # Update Langfuse with user metadata
             if self.langfuse_enabled and self.langfuse:
                 try:
                     # Get user data safely within proper session context
-                    user_data = self.db_service.get_user_metadata(user_id)
+                    user_data = await self.async_db.get_user_metadata(user_id)
                     self.langfuse.update_current_trace(
                         metadata={
                             "user_interaction_count": user_data.get("interaction_count", 0),
@@ -267,7 +274,7 @@ class HomeAISystem:
             elif intent.get("requires_memory"):
                 # Retrieve memories if needed
                 self.logger.info("Retrieving memories")
-                memories = self.db_service.search_user_memories(
+                memories = await self.async_db.search_user_memories(
                     user_id=user_id or session_id,
                     query=intent.get("memory_query", user_input),
                     limit=5
@@ -340,8 +347,10 @@ class HomeAISystem:
                         )
                 
                 # Save message - use session_id directly to avoid SQLAlchemy session issues
-                self.db_service.save_message(
+                await self.async_db.queue_write(
+                    "message",
                     conversation_id=session_id,
+                    user_id=user_id,
                     user_input=user_input,
                     assistant_response=final_response,
                     intent_detected=intent,
@@ -350,7 +359,7 @@ class HomeAISystem:
                 
                 # Update user interaction count for familiarity
                 try:
-                    self.db_service.increment_user_interaction(user_id)
+                    await self.async_db.queue_write("user_interaction", user_id=user_id)
                 except Exception as e:
                     self.logger.warning(f"Failed to increment user interaction count: {e}")
             
@@ -367,7 +376,7 @@ class HomeAISystem:
             )
             
             # Save context for persistence (async, non-blocking)
-            await self.context_manager.save_context_async(f"contexts/{session_id}.json")
+            await self.context_manager.save_context_async(f"contexts/{session_id}.json", session_id)
                 
         except Exception as save_error:
             # Log database/session errors but don't let them affect the user response
@@ -377,25 +386,25 @@ class HomeAISystem:
         """Cleanup resources"""
         try:
             # Save any active contexts
-            if self.context_manager.context.session_id:
-                self.context_manager.save_context(
-                    f"contexts/{self.context_manager.context.session_id}.json"
-                )
+            for session_id in self.context_manager.session_ids():
+                self.context_manager.save_context(f"contexts/{session_id}.json", session_id)
             
             # Cleanup database connections
             self.db_service.cleanup_expired_conversations()
             
-            # End Langfuse session and flush
-            if self.session_manager and self.context_manager.context.session_id:
-                self.session_manager.end_session(
-                    session_id=self.context_manager.context.session_id,
-                    final_metadata={
-                        "session_ended": True,
-                        "session_duration_minutes": (datetime.now() - self.context_manager.context.timestamp).total_seconds() / 60,
-                        "final_message_count": self.context_manager.context.message_count,
-                        "final_familiarity_score": self.context_manager.context.familiarity_score
-                    }
-                )
+            # End Langfuse sessions and flush
+            if self.session_manager:
+                for session_id in self.context_manager.session_ids():
+                    context = self.context_manager.get_context(session_id)
+                    self.session_manager.end_session(
+                        session_id=session_id,
+                        final_metadata={
+                            "session_ended": True,
+                            "session_duration_minutes": (datetime.now() - context.timestamp).total_seconds() / 60,
+                            "final_message_count": context.message_count,
+                            "final_familiarity_score": context.familiarity_score
+                        }
+                    )
                 
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
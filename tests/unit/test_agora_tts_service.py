@@ -0,0 +1,40 @@
+"""
+Unit tests for AgoraTTSService connection pooling
+"""
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+
+from src.services.agora_tts_service import AgoraTTSService, close_shared_tts_sessions
+from src.utils.config import OpenAITTSConfig, TTSConfig
+
+
+class TestTTSSessionPool:
+    """Test suite for the shared aiohttp session"""
+
+    @pytest.fixture
+    def config(self):
+        config = MagicMock()
+        config.tts = TTSConfig(provider="openai", connection_limit_per_host=4)
+        config.openai_tts = OpenAITTSConfig(api_key="test-key")
+        return config
+
+    def test_services_share_one_session_until_shutdown(self, config):
+        """Sessions are created lazily, reused across services and closed on shutdown"""
+        async def run():
+            first = AgoraTTSService(config)
+            second = AgoraTTSService(config)
+            session = first._get_session()
+            shared = second._get_session() is session
+            limit_per_host = session.connector.limit_per_host
+            await close_shared_tts_sessions()
+            recreated = first._get_session()
+            await close_shared_tts_sessions()
+            return session, shared, limit_per_host, recreated
+
+        session, shared, limit_per_host, recreated = asyncio.run(run())
+
+        assert shared
+        assert limit_per_host == 4
+        assert session.closed
+        assert recreated is not session
@@ -0,0 +1,102 @@
+"""
+Unit tests for AsyncDatabaseService
+"""
+import asyncio
+
+import pytest
+
+from src.models.database import (
+    dispose_shared_async_database_managers, dispose_shared_database_managers, to_async_url
+)
+from src.services.async_database_service import AsyncDatabaseService
+from src.services.database_service import DatabaseService
+from src.utils.config import DatabaseConfig
+
+
+class TestAsyncDatabaseService:
+    """Test suite for the async request-path database service"""
+
+    @pytest.fixture
+    def sync_service(self, test_config, tmp_path):
+        test_config.database = DatabaseConfig(url=f"sqlite:///{tmp_path / 'async.db'}")
+        service = DatabaseService(test_config)
+        service.create_device({
+            "id": "light_1", "name": "客厅灯", "device_type": "light",
+            "room": "客厅", "supported_actions": ["turn_on"], "current_state": {"status": "off"}
+        })
+        yield service
+        dispose_shared_database_managers()
+
+    def test_async_url_mapping(self):
+        """File databases map to async drivers; in-memory SQLite and unknown dialects do not"""
+        assert to_async_url("sqlite:///./hoorii.db") == "sqlite+aiosqlite:///./hoorii.db"
+        assert to_async_url("sqlite:///:memory:") is None
+        assert to_async_url("oracle://db/hoorii") is None
+
+    def test_native_hot_path_matches_sync_service(self, test_config, sync_service):
+        """Writes through the async engine are visible to the sync API and vice versa"""
+        async def run():
+            service = AsyncDatabaseService(test_config, sync_service)
+            try:
+                user = await service.get_or_create_user("alice")
+                turn = await service.record_conversation_turn("alice", "conv-1")
+                again = await service.record_conversation_turn("alice", "conv-1")
+                other = await service.record_conversation_turn("mallory", "conv-1")
+                await service.save_message("conv-1", user_input="你好", assistant_response="嗯。")
+                history = await service.get_session_history("conv-1", "alice")
+                other_history = await service.get_session_history("conv-1", "mallory")
+                await service.save_user_memory("alice", "喜欢猫", keywords=["猫"])
+                memories = await service.search_user_memories("alice", "猫")
+                await service.update_device_state("light_1", {"brightness": 40})
+                device = await service.get_device("light_1")
+                return service, user, turn, again, other, (history, other_history), memories, device
+            finally:
+                await dispose_shared_async_database_managers()
+
+        service, user, turn, again, other, histories, memories, device = asyncio.run(run())
+
+        assert service.native and service.stats["thread_calls"] == 0
+        assert user.familiarity_score == test_config.system.default_familiarity_score
+        assert turn.is_new and not again.is_new and again.message_count == 2
+        # Another user's conversation id is never reused
+        assert other.is_new and other.conversation_id.startswith("conv-1:")
+        # Each user's session history follows their own conversation
+        assert [len(history) for history in histories] == [1, 0]
+        assert [m.content for m in memories] == ["喜欢猫"]
+        assert device.current_state == {"status": "off", "brightness": 40}
+        assert len(sync_service.get_conversation_history("conv-1")) == 1
+        assert sync_service.get_device("light_1").current_state["brightness"] == 40
+
+    def test_falls_back_to_sync_service_without_async_driver(self, test_config, sync_service):
+        """With async disabled the sync methods run in worker threads"""
+        test_config.database.async_enabled = False
+
+        async def run():
+            service = AsyncDatabaseService(test_config, sync_service)
+            await service.get_or_create_user("bob")
+            return service, await service.get_user_metadata("bob")
+
+        service, metadata = asyncio.run(run())
+
+        assert not service.native
+        assert metadata["familiarity_score"] == test_config.system.default_familiarity_score
+        assert service.stats == {"native_calls": 0, "thread_calls": 2, "inline_calls": 0}
+
+    def test_native_interaction_log_refreshes_rollup(self, test_config, sync_service):
+        """Interactions logged through the async engine reach the usage rollup"""
+        test_config.system.device_usage_rollup_enabled = True
+
+        async def run():
+            service = AsyncDatabaseService(test_config, sync_service)
+            try:
+                await service.get_or_create_user("alice")
+                await service.log_device_interaction("alice", "light_1", "turn_on")
+                return service
+            finally:
+                await dispose_shared_async_database_managers()
+
+        service = asyncio.run(run())
+
+        assert service.native
+        stats = sync_service.get_device_usage_stats(days=1)
+        assert [(s["device_id"], s["count"]) for s in stats] == [("light_1", 1)]
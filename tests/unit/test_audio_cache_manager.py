@@ -0,0 +1,64 @@
+"""
+Unit tests for the cached_audio quota/age manager
+"""
+import asyncio
+import os
+import time
+
+from src.utils.audio_cache import AudioCacheManager
+
+
+def write_file(directory, name, size, accessed):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (accessed, accessed))
+    return path
+
+
+class TestAudioCacheManager:
+    """Test suite for AudioCacheManager"""
+
+    def test_scan_then_evict_by_age_and_quota(self, tmp_path):
+        """Expired files go first, then least recently accessed until under quota"""
+        now = time.time()
+        write_file(tmp_path, "old.mp3", 10, now - 7200)
+        write_file(tmp_path, "b.mp3", 10, now - 300)
+        write_file(tmp_path, "a.mp3", 10, now - 600)
+        write_file(tmp_path, "c.mp3", 10, now - 60)
+        (tmp_path / "tts").mkdir()
+        write_file(tmp_path / "tts", "kept.mp3", 100, now - 7200)
+
+        manager = AudioCacheManager(tmp_path, max_bytes=15, max_age_seconds=3600)
+        manager.scan()
+        assert manager.get_stats()["bytes"] == 40  # Subdirectories are not indexed
+
+        manager.touch("a.mp3")
+        assert manager.evict(now=now) == 3
+
+        stats = manager.get_stats()
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["a.mp3", "tts"]
+        assert stats["evicted_age"] == 1 and stats["evicted_quota"] == 2
+        assert stats["bytes"] == 10 and stats["bytes_evicted"] == 30
+        assert (tmp_path / "tts" / "kept.mp3").exists()
+
+    def test_background_sweep_runs_when_quota_exceeded(self, tmp_path):
+        """register() past the quota wakes the sweeper instead of waiting for the interval"""
+        async def scenario():
+            manager = AudioCacheManager(tmp_path, max_bytes=15, sweep_interval_seconds=3600)
+            await manager.start()
+            first = write_file(tmp_path, "first.mp3", 10, time.time())
+            manager.register(first, 10)
+            second = write_file(tmp_path, "second.mp3", 10, time.time())
+            manager.register(second, 10)
+            for _ in range(50):
+                if not first.exists():
+                    break
+                await asyncio.sleep(0.01)
+            stats = manager.get_stats()
+            await manager.stop()
+            return first, second, stats
+
+        first, second, stats = asyncio.run(scenario())
+
+        assert not first.exists() and second.exists()
+        assert stats["running"] and stats["evicted_quota"] == 1
@@ -0,0 +1,52 @@
+"""
+Unit tests for AudioHandle
+"""
+import asyncio
+import base64
+from pathlib import Path
+
+import src.utils.audio_cache as audio_cache
+from src.utils.audio_handle import AudioHandle
+from src.utils.tts_cache import TTSAudioCache
+
+
+class TestAudioHandle:
+    """Test suite for AudioHandle and async audio writes"""
+
+    def test_persist_writes_once_and_releases_bytes(self, tmp_path, monkeypatch):
+        """In-memory audio becomes a disk-backed handle with a /cached_audio URL"""
+        monkeypatch.setattr(audio_cache, "CACHE_DIR", tmp_path)
+        handle = AudioHandle.from_bytes(b"mp3-bytes")
+
+        persisted = asyncio.run(handle.persist(filename_hint="session"))
+
+        assert persisted.data is None and persisted.on_disk
+        assert Path(persisted.path).read_bytes() == b"mp3-bytes"
+        assert persisted.url.startswith("/cached_audio/session_")
+        assert asyncio.run(persisted.persist()) is persisted
+        assert list(tmp_path.iterdir()) == [Path(persisted.path)]
+
+    def test_base64_only_on_request(self, tmp_path):
+        """Both memory and file handles encode identically; to_dict never carries bytes"""
+        path = tmp_path / "clip.mp3"
+        path.write_bytes(b"\xff\xfbaudio")
+        expected = base64.b64encode(b"\xff\xfbaudio").decode()
+
+        from_file = AudioHandle.from_file(path, "/cached_audio/clip.mp3")
+
+        assert asyncio.run(AudioHandle.from_bytes(b"\xff\xfbaudio").to_base64()) == expected
+        assert asyncio.run(from_file.to_base64()) == expected
+        assert from_file.to_dict() == {
+            "format": "mp3", "path": str(path), "url": "/cached_audio/clip.mp3", "size": 7
+        }
+
+    def test_cache_async_put_matches_put(self, tmp_path):
+        """put_async stores the same entry (and counters) as put"""
+        cache = TTSAudioCache(tmp_path / "tts")
+
+        stored = asyncio.run(cache.put_async("k", memoryview(b"abc")))
+
+        assert Path(stored.path).read_bytes() == b"abc"
+        assert cache.get_bytes("k") == b"abc"
+        assert cache.get_stats()["stores"] == 1
+        assert not any(p.name.endswith(".tmp") for p in (tmp_path / "tts").iterdir())
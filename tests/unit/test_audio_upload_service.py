@@ -0,0 +1,121 @@
+"""
+Unit tests for the background audio upload service
+"""
+import asyncio
+
+from aiohttp import web
+
+from src.services.audio_upload_service import (
+    AudioUploadError,
+    AudioUploader,
+    AudioUploadManager,
+    CatboxUploader,
+)
+
+
+class FlakyUploader(AudioUploader):
+    """Fails the first `failures` calls per file, tracks concurrency"""
+
+    name = "flaky"
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = {}
+        self.active = 0
+        self.max_active = 0
+
+    async def upload(self, file_path):
+        self.calls[file_path] = self.calls.get(file_path, 0) + 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.calls[file_path] <= self.failures:
+                raise AudioUploadError("temporary failure")
+            return f"https://files.example/{file_path}"
+        finally:
+            self.active -= 1
+
+
+class TestAudioUploadManager:
+    """Test suite for AudioUploadManager and CatboxUploader"""
+
+    def test_submit_returns_immediately_and_retries(self):
+        """Submission is non-blocking; a failed attempt is retried and listeners see the result"""
+        async def scenario():
+            manager = AudioUploadManager(FlakyUploader(failures=1, delay=0.01), backoff_base_seconds=0)
+            finished = []
+            manager.add_listener(finished.append)
+
+            status = manager.submit("a.mp3", local_url="/cached_audio/a.mp3", user_id="u1")
+            queued_state = status.status
+            await manager.join()
+            await manager.close()
+            return manager, status, queued_state, finished
+
+        manager, status, queued_state, finished = asyncio.run(scenario())
+
+        assert queued_state == "pending"
+        assert status.status == "done" and status.attempts == 2
+        assert status.cloud_url == "https://files.example/a.mp3"
+        assert finished == [status]
+        assert manager.get_status(status.upload_id) is status
+        assert manager.get_stats()["retries"] == 1
+
+    def test_bounded_workers_and_queue(self):
+        """At most `workers` uploads run at once; a full queue rejects instead of growing"""
+        async def scenario():
+            uploader = FlakyUploader(failures=5, delay=0.01)
+            manager = AudioUploadManager(uploader, workers=2, queue_size=3, max_attempts=2, backoff_base_seconds=0)
+            statuses = [manager.submit(f"{i}.mp3") for i in range(6)]
+            await manager.join()
+            await manager.close()
+            return uploader, manager, statuses
+
+        uploader, manager, statuses = asyncio.run(scenario())
+
+        assert uploader.max_active == 2
+        # Workers have not started yet, so only queue_size uploads are accepted
+        assert [s.error == "upload queue full" for s in statuses] == [False] * 3 + [True] * 3
+        assert all(s.status == "failed" for s in statuses)
+        assert manager.get_stats()["failed"] == 3 and manager.get_stats()["rejected"] == 3
+
+    def test_catbox_uploader_against_stand_in_server(self, tmp_path):
+        """The default uploader speaks catbox's API; a local server stands in for it"""
+        audio_file = tmp_path / "clip.mp3"
+        audio_file.write_bytes(b"\xff\xfb" + b"\x00" * 2048)
+
+        async def scenario():
+            received = {}
+
+            async def api(request):
+                form = await request.post()
+                received["reqtype"] = form["reqtype"]
+                received["size"] = len(form["fileToUpload"].file.read())
+                return web.Response(text=f"{base_url}/files/clip.mp3\n")
+
+            async def hosted(request):
+                return web.Response(body=b"\x00" * received["size"])
+
+            app = web.Application()
+            app.router.add_post("/user/api.php", api)
+            app.router.add_route("*", "/files/clip.mp3", hosted)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+            uploader = CatboxUploader(host=base_url)
+            try:
+                url = await uploader.upload(str(audio_file))
+            finally:
+                await uploader.close()
+                await runner.cleanup()
+            return base_url, url, received
+
+        base_url, url, received = asyncio.run(scenario())
+
+        assert url == f"{base_url}/files/clip.mp3"
+        assert received == {"reqtype": "fileupload", "size": 2050}
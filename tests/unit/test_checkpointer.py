@@ -0,0 +1,129 @@
+"""
+Unit tests for the bounded LangGraph checkpointers
+"""
+import asyncio
+import json
+import pytest
+from typing import Optional, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+
+from src.workflows.checkpointer import (
+    BoundedMemorySaver, SQLITE_CHECKPOINT_AVAILABLE, strip_large_fields
+)
+
+
+class _State(TypedDict):
+    user_input: str
+    audio_data: Optional[str]
+    final_response: Optional[str]
+
+
+def _build_graph(checkpointer):
+    async def speak(state):
+        audio = "A" * 10000
+        return {
+            "audio_data": audio,
+            "final_response": json.dumps({"response": state["user_input"], "audio": {"audio_data": audio}})
+        }
+
+    graph = StateGraph(_State)
+    graph.add_node("speak", speak)
+    graph.add_edge(START, "speak")
+    graph.add_edge("speak", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def _run_turns(app, thread_ids, turns=1):
+    async def run():
+        results = []
+        for _ in range(turns):
+            for thread_id in thread_ids:
+                config = {"configurable": {"thread_id": thread_id}}
+                results.append(await app.ainvoke({"user_input": "你好"}, config))
+        return results
+
+    return asyncio.run(run())
+
+
+class TestBoundedCheckpointer:
+    """Test suite for BoundedMemorySaver and the SQLite variant"""
+
+    def test_strip_large_fields_handles_nested_and_json(self):
+        """Stripped keys disappear from dicts, lists and JSON-encoded responses"""
+        state = {
+            "audio_data": "xxx",
+            "audio_generation_result": {"audio_data": "xxx", "voice": "v"},
+            "final_response": json.dumps({"response": "嗯", "audio": {"audio_data": "xxx"}})
+        }
+
+        stripped = strip_large_fields(state, ["audio_data"])
+
+        assert "audio_data" not in stripped
+        assert stripped["audio_generation_result"] == {"voice": "v"}
+        assert json.loads(stripped["final_response"]) == {"response": "嗯", "audio": {}}
+        assert state["audio_data"] == "xxx"
+
+    def test_audio_is_returned_but_not_checkpointed(self):
+        """The invocation still sees the audio; the stored state does not"""
+        saver = BoundedMemorySaver()
+        app = _build_graph(saver)
+
+        result = _run_turns(app, ["s1"])[0]
+        stored = app.get_state({"configurable": {"thread_id": "s1"}}).values
+
+        assert len(result["audio_data"]) == 10000
+        assert stored["user_input"] == "你好"
+        assert stored.get("audio_data") is None
+        assert "A" * 100 not in stored["final_response"]
+        assert all(b"A" * 100 not in blob[1] for blob in saver.blobs.values())
+
+    def test_history_and_threads_are_bounded(self):
+        """Old checkpoints are pruned and least recently used sessions evicted"""
+        saver = BoundedMemorySaver(max_threads=2, max_checkpoints_per_thread=2)
+        app = _build_graph(saver)
+
+        _run_turns(app, ["s1", "s2", "s3"], turns=3)
+        stats = saver.get_stats()
+
+        assert stats["threads"] == 2
+        assert stats["checkpoints"] == 4
+        assert stats["threads_evicted"] >= 1
+        assert set(saver.storage) == {"s2", "s3"}
+        assert not [key for key in saver.blobs if key[0] == "s1"]
+        assert app.get_state({"configurable": {"thread_id": "s3"}}).values["user_input"] == "你好"
+
+    def test_idle_threads_expire(self):
+        """Sessions idle past max_age_seconds are dropped on the next write"""
+        saver = BoundedMemorySaver(max_age_seconds=0)
+        app = _build_graph(saver)
+
+        _run_turns(app, ["s1", "s2"])
+
+        assert set(saver.storage) == {"s2"}
+
+    @pytest.mark.skipif(not SQLITE_CHECKPOINT_AVAILABLE, reason="langgraph-checkpoint-sqlite not installed")
+    def test_sqlite_saver_strips_and_bounds(self, tmp_path):
+        """The SQLite backend applies the same limits"""
+        import aiosqlite
+        from src.workflows.checkpointer import BoundedSqliteSaver
+
+        async def run():
+            saver = BoundedSqliteSaver(
+                aiosqlite.connect(str(tmp_path / "checkpoints.sqlite")),
+                max_threads=2, max_checkpoints_per_thread=2
+            )
+            app = _build_graph(saver)
+            for _ in range(3):
+                for thread_id in ("s1", "s2", "s3"):
+                    await app.ainvoke({"user_input": "你好"}, {"configurable": {"thread_id": thread_id}})
+            state = await app.aget_state({"configurable": {"thread_id": "s3"}})
+            cursor = await saver.conn.execute("SELECT thread_id, COUNT(*) FROM checkpoints GROUP BY thread_id")
+            counts = dict(await cursor.fetchall())
+            await saver.aclose()
+            return state.values, counts
+
+        values, counts = asyncio.run(run())
+
+        assert values.get("audio_data") is None
+        assert counts == {"s2": 2, "s3": 2}
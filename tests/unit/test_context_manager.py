@@ -0,0 +1,136 @@
+"""
+Unit tests for ContextManager session store
+"""
+import asyncio
+
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.core.context_manager import ContextManager, SystemContext
+
+
+class TestContextManager:
+    """Test suite for the per-session ContextManager"""
+
+    def test_sessions_are_isolated(self):
+        """Interleaved sessions keep their own history"""
+        manager = ContextManager(max_sessions=10)
+
+        alice = manager.get_session("alice")
+        alice.add_user_message("开灯")
+        bob = manager.get_session("bob")
+        bob.add_user_message("关灯")
+
+        assert manager.get_session("alice") is alice
+        assert [m["content"] for m in alice.conversation_history] == ["开灯"]
+        assert [m["content"] for m in bob.conversation_history] == ["关灯"]
+        assert manager.stats["hits"] == 1
+
+    def test_lru_eviction(self):
+        """Least recently used session is evicted when over capacity"""
+        manager = ContextManager(max_sessions=2)
+
+        manager.get_session("s1")
+        manager.get_session("s2")
+        manager.get_session("s1")
+        manager.get_session("s3")
+
+        assert manager.has_session("s1")
+        assert not manager.has_session("s2")
+        assert manager.has_session("s3")
+        assert manager.stats["evicted_lru"] == 1
+
+    def test_idle_eviction(self):
+        """Sessions idle past the timeout are evicted"""
+        manager = ContextManager(idle_timeout_minutes=1)
+
+        with patch("src.core.context_manager.time.monotonic", return_value=1000.0):
+            manager.get_session("old")
+        with patch("src.core.context_manager.time.monotonic", return_value=1100.0):
+            evicted = manager.cleanup_expired_sessions()
+
+        assert evicted == 1
+        assert manager.active_session_count() == 0
+
+    def test_rehydrates_from_message_table(self):
+        """An evicted session is rebuilt from stored messages"""
+        message = MagicMock(
+            user_input="打开客厅灯",
+            assistant_response="......好。",
+            intent_detected={"device": "lights"},
+            timestamp=datetime(2025, 1, 1, 12, 0)
+        )
+        db_service = MagicMock()
+        db_service.get_session_history.return_value = [message]
+        manager = ContextManager(max_sessions=1, db_service=db_service)
+
+        context = manager.get_session("conv-1")
+
+        assert [m["role"] for m in context.conversation_history] == ["user", "assistant"]
+        assert context.message_count == 2
+        assert context.previous_intents == [{"device": "lights"}]
+        assert manager.stats["rehydrated"] == 1
+
+    def test_async_rehydration_uses_async_service(self):
+        """get_context_async queries through the async service, never the sync one"""
+        message = MagicMock(
+            user_input="打开客厅灯", assistant_response=None,
+            intent_detected=None, timestamp=None
+        )
+        db_service = MagicMock()
+        async_db = MagicMock()
+        async_db.get_session_history = AsyncMock(return_value=[message])
+        manager = ContextManager(max_turns=5, db_service=db_service, async_db=async_db)
+
+        context = asyncio.run(manager.get_context_async("conv-1"))
+
+        assert [m["content"] for m in context.conversation_history] == ["打开客厅灯"]
+        async_db.get_session_history.assert_awaited_once_with("conv-1", None, limit=5)
+        db_service.get_session_history.assert_not_called()
+        assert manager.get_session("conv-1") is context
+
+    def test_update_context_targets_named_session(self):
+        """update_context writes into the session named by session_id"""
+        manager = ContextManager()
+        first = manager.get_session("first")
+        manager.get_session("second")
+
+        manager.update_context(session_id="first", familiarity_score=80)
+
+        assert first.familiarity_score == 80
+        assert manager.get_context("second").familiarity_score == 0
+
+    def test_session_id_is_required(self):
+        """There is no process-wide fallback context"""
+        manager = ContextManager()
+        manager.get_session("first")
+
+        with pytest.raises(ValueError):
+            manager.get_context("")
+        with pytest.raises(ValueError):
+            manager.update_context(None, familiarity_score=80)
+
+    def test_history_window_trims_by_tokens_and_folds_summary(self):
+        """Long old turns are trimmed newest-to-oldest and folded into the cached summary once"""
+        context = SystemContext()
+        context.add_user_message("很长的问题" * 100)
+        context.add_assistant_response("很长的回答" * 100)
+        context.add_user_message("打开客厅灯")
+        context.add_assistant_response("好的")
+        context.add_user_message("调暗一点")
+        assert context.conversation_history[0]["tokens"] == 500
+
+        window = context.get_history_window(max_turns=20, token_budget=100)
+        assert [m["content"] for m in window.messages] == ["打开客厅灯", "好的", "调暗一点"]
+        assert window.trimmed == 2 and window.summary is None
+
+        context.get_history_window(max_turns=20, token_budget=300, summary_tokens=150)
+        messages = context.get_conversation_messages_for_llm(max_turns=20, token_budget=300, summary_tokens=150)
+        assert len(context.history_summary_lines) == 2  # Folded once despite two calls
+        assert messages[0]["role"] == "user" and messages[0]["content"].startswith("[早前对话摘要]")
+        assert messages[-1]["content"] == "调暗一点"
+
+        # Without a budget the legacy turn-count behaviour is unchanged
+        assert len(context.get_conversation_messages_for_llm(max_turns=1)) == 2
+
@@ -0,0 +1,49 @@
+"""
+Unit tests for the hot-path indexes and their Alembic migration
+"""
+import importlib.util
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect
+
+from src.models.database import Base
+
+
+MIGRATIONS = Path(__file__).resolve().parents[2] / "migrations" / "versions"
+
+
+def load_migrations():
+    for path in sorted(MIGRATIONS.glob("*.py")):
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        yield module
+
+
+class TestDatabaseIndexes:
+    """Test suite for the composite indexes declared on the models"""
+
+    def test_migration_matches_model_indexes(self):
+        """The migrations create exactly the secondary indexes the models declare"""
+        declared = {
+            (index.name, table.name, tuple(column.name for column in index.columns))
+            for table in Base.metadata.sorted_tables
+            for index in table.indexes
+            if not index.unique
+        }
+        migrated = {
+            (name, table, tuple(columns))
+            for migration in load_migrations()
+            for name, table, columns in getattr(migration, "INDEXES", [])
+        }
+
+        assert migrated == declared
+
+    def test_new_databases_get_indexes(self, tmp_path):
+        """create_all builds the indexes on a fresh database"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'indexes.db'}")
+        Base.metadata.create_all(engine)
+        indexes = {index["name"] for index in inspect(engine).get_indexes("messages")}
+        engine.dispose()
+
+        assert "idx_message_conversation_time" in indexes
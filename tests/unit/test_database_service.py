@@ -0,0 +1,121 @@
+"""
+Unit tests for the shared database engine registry and DatabaseService
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models import database
+from src.models.database import Conversation, MeteredQueuePool, dispose_shared_database_managers
+from src.core.context_manager import ContextManager
+from src.services.database_service import DatabaseService
+from src.utils.config import DatabaseConfig
+
+
+class TestSharedDatabaseEngine:
+    """Test suite for the process-wide DatabaseManager registry"""
+
+    @pytest.fixture
+    def config(self, test_config, tmp_path):
+        test_config.database = DatabaseConfig(
+            url=f"sqlite:///{tmp_path / 'test.db'}",
+            pool_size=3,
+            max_overflow=2
+        )
+        yield test_config
+        dispose_shared_database_managers()
+
+    def test_services_share_one_engine(self, config):
+        """Every DatabaseService for the same settings reuses one engine"""
+        first = DatabaseService(config)
+        second = DatabaseService(config)
+
+        assert first.db_manager is second.db_manager
+        assert len(database._DATABASE_MANAGERS) == 1
+
+    def test_pool_honors_config_and_reports_metrics(self, config):
+        """pool_size/max_overflow reach the pool and checkouts are counted"""
+        service = DatabaseService(config)
+        assert isinstance(service.db_manager.engine.pool, MeteredQueuePool)
+
+        service.get_or_create_user("pool_user")
+        status = service.get_pool_status()
+
+        assert status["pool_size"] == 3
+        assert status["max_overflow"] == 2
+        assert status["checked_out"] == 0
+        assert status["checkouts"] >= 1
+        assert status["checkouts"] == status["checkins"]
+        assert status["wait_time_total_ms"] >= 0
+
+    def test_memory_sqlite_skips_pool_options(self, config):
+        """In-memory SQLite keeps its default pool"""
+        config.database = DatabaseConfig(url="sqlite:///:memory:")
+        service = DatabaseService(config)
+
+        status = service.get_pool_status()
+
+        assert status["pool_class"] != "MeteredQueuePool"
+        assert "pool_size" not in status
+
+
+class TestConversationTurns:
+    """Test suite for DatabaseService.record_conversation_turn"""
+
+    @pytest.fixture
+    def service(self, test_config, tmp_path):
+        test_config.database = DatabaseConfig(url=f"sqlite:///{tmp_path / 'turns.db'}")
+        yield DatabaseService(test_config)
+        dispose_shared_database_managers()
+
+    def test_counts_turns_on_conversation_row(self, service):
+        """The first turn creates user and conversation; later turns increment the column"""
+        first = service.record_conversation_turn("turn_user", "conv-1")
+        second = service.record_conversation_turn("turn_user", "conv-1")
+
+        assert first.is_new and not second.is_new
+        assert first.conversation_id == second.conversation_id == "conv-1"
+        assert (first.message_count, second.message_count) == (1, 2)
+        assert second.familiarity_score == service.config.system.default_familiarity_score
+
+    def test_reuses_expired_conversation_id(self, service):
+        """An expired conversation is reactivated instead of inserted twice"""
+        service.record_conversation_turn("turn_user", "conv-2")
+        service.end_conversation("conv-2")
+
+        info = service.record_conversation_turn("turn_user", "conv-2")
+
+        assert info.message_count == 2
+
+    def test_other_users_and_expired_conversations_are_not_reused(self, service):
+        """A turn never counts on another user's conversation or an expired one"""
+        service.record_conversation_turn("owner", "conv-3")
+
+        intruder = service.record_conversation_turn("intruder", "conv-3")
+
+        assert intruder.is_new and intruder.conversation_id != "conv-3"
+        session = service.get_session()
+        try:
+            owned = session.get(Conversation, "conv-3")
+            assert (owned.user_id, owned.message_count) == ("owner", 1)
+            owned.last_activity = datetime.utcnow() - timedelta(days=1)
+            session.commit()
+        finally:
+            session.close()
+
+        resumed = service.record_conversation_turn("owner", "conv-3")
+
+        assert resumed.is_new and resumed.conversation_id not in ("conv-3", intruder.conversation_id)
+
+    def test_evicted_session_rehydrates_from_derived_conversation(self, service):
+        """Turns stored under a fresh id derived from the session id are found again"""
+        service.record_conversation_turn("owner", "shared-session")
+        turn = service.record_conversation_turn("guest", "shared-session")
+        service.save_message(turn.conversation_id, user_input="打开客厅灯", assistant_response="......好。")
+
+        assert turn.conversation_id.startswith("shared-session:")
+        manager = ContextManager(db_service=service)
+        context = manager.get_context("shared-session", user_id="guest")
+
+        assert [m["content"] for m in context.conversation_history] == ["打开客厅灯", "......好。"]
+        assert service.get_session_history("shared-session", "owner") == []
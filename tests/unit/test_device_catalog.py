@@ -0,0 +1,111 @@
+"""
+Unit tests for the cached device catalog
+"""
+import asyncio
+import json
+
+import pytest
+
+from src.core.device_catalog import DeviceCatalog, DeviceSpecIndex
+from src.models.database import dispose_shared_database_managers
+from src.services.database_service import DatabaseService
+from src.utils.config import DatabaseConfig
+
+
+SPECS = {
+    "devices": {
+        "dimmable_light": {
+            "device_type_id": "57D56F4D-3302-41F7-AB34-5365AA180E81",
+            "category": "light",
+            "parameters": {"brightness": {}, "hue": {}, "saturation": {}},
+            "supported_commands": ["turn_on", "turn_off", "set_brightness"]
+        }
+    }
+}
+
+
+class TestDeviceCatalog:
+    """Test suite for DeviceSpecIndex and DeviceCatalog"""
+
+    @pytest.fixture
+    def db_service(self, test_config, tmp_path):
+        test_config.database = DatabaseConfig(url=f"sqlite:///{tmp_path / 'catalog.db'}")
+        service = DatabaseService(test_config)
+        service.create_device({
+            "id": "light_1", "name": "客厅灯", "device_type": "57D56F4D-3302-41F7-AB34-5365AA180E81",
+            "room": "客厅", "supported_actions": ["turn_on"], "current_state": {"status": "off"}
+        })
+        yield service
+        dispose_shared_database_managers()
+
+    def test_spec_index_by_name_and_type_id(self):
+        """Both keys resolve to the same spec; capabilities are computed once per type"""
+        index = DeviceSpecIndex(SPECS)
+
+        assert index.get("dimmable_light") is index.get("57D56F4D-3302-41F7-AB34-5365AA180E81")
+        assert index.capabilities("dimmable_light")["has_color"] is True
+        assert index.capabilities("dimmable_light") is index.capabilities("dimmable_light")
+        assert index.capabilities("speaker") == {
+            "can_dim": False, "has_temperature": False, "has_volume": True,
+            "has_color": False, "has_position": False
+        }
+
+    def test_snapshot_cached_until_device_write(self, db_service):
+        """Repeated lookups reuse one snapshot; each device write bumps the version"""
+        catalog = DeviceCatalog(db_service, DeviceSpecIndex(SPECS))
+        first = catalog.snapshot()
+
+        assert catalog.snapshot() is first
+        assert json.loads(first.entries[0].line)["caps"] == ["dim", "color"]
+
+        db_service.update_device_state("light_1", {"status": "on"})
+        second = catalog.snapshot()
+        assert second is not first
+        assert second.devices["light_1"]["current_state"] == {"status": "on"}
+
+        db_service.delete_device("light_1")
+        assert catalog.snapshot().devices == {}
+        assert catalog.get_stats()["rebuilds"] == 3 and catalog.get_stats()["hits"] == 1
+
+    def test_context_ranked_by_relevance_within_budget(self, db_service):
+        """Room/type/name matches and the last used device rank first; the budget cuts the rest"""
+        db_service.bulk_create_devices([
+            {"id": f"lamp_{i}", "name": f"台灯{i}", "device_type": "light", "room": "书房"} for i in range(20)
+        ] + [
+            {"id": "bedroom_curtain", "name": "卧室窗帘", "device_type": "curtain", "room": "bedroom"},
+            {"id": "tv_1", "name": "电视", "device_type": "tv", "room": "客厅"},
+        ])
+        snapshot = DeviceCatalog(db_service, DeviceSpecIndex(SPECS)).snapshot()
+        line_tokens = max(entry.tokens for entry in snapshot.entries)
+
+        context = snapshot.select_context(
+            "把房间的窗帘拉上", intent={"device": "curtains"},
+            recent_device_ids=["tv_1"], token_budget=line_tokens * 3
+        )
+        assert context.device_ids[:2] == ("bedroom_curtain", "tv_1")
+        assert context.omitted == len(snapshot.entries) - len(context.device_ids) > 0
+        assert f"另有 {context.omitted} 个" in context.text
+        assert '"spec"' not in context.text
+
+        # The top match is kept even when a single line exceeds the budget
+        assert snapshot.select_context("打开客厅灯", token_budget=1).device_ids == ("light_1",)
+
+    def test_max_age_bounds_out_of_process_writes(self, db_service):
+        """Without a version bump the snapshot is still rebuilt after max_age_seconds"""
+        catalog = DeviceCatalog(db_service, DeviceSpecIndex(SPECS), max_age_seconds=0)
+        first = catalog.snapshot()
+
+        assert catalog.snapshot() is not first
+
+    def test_snapshot_async_without_async_service(self, db_service):
+        """The async path queries off the loop and shares the cached snapshot"""
+        catalog = DeviceCatalog(db_service, DeviceSpecIndex(SPECS))
+
+        async def run():
+            first = await catalog.snapshot_async()
+            return first, await catalog.snapshot_async()
+
+        first, second = asyncio.run(run())
+        assert second is first and catalog.snapshot() is first
+        assert list(first.devices) == ["light_1"]
+        assert catalog.get_stats()["rebuilds"] == 1 and catalog.get_stats()["hits"] == 2
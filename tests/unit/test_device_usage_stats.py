@@ -0,0 +1,89 @@
+"""
+Unit tests for SQL-side device usage analytics and the hourly rollup
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.database import DeviceInteraction, DeviceUsageHourly, dispose_shared_database_managers
+from src.services.database_service import DatabaseService
+from src.utils.config import DatabaseConfig
+
+
+class TestDeviceUsageStats:
+    """Test suite for get_device_usage_stats and refresh_device_usage_rollup"""
+
+    @pytest.fixture
+    def db_service(self, test_config, tmp_path):
+        test_config.database = DatabaseConfig(url=f"sqlite:///{tmp_path / 'usage.db'}")
+        yield DatabaseService(test_config)
+        dispose_shared_database_managers()
+
+    def add_interactions(self, db_service, rows):
+        session = db_service.get_session()
+        try:
+            session.add_all(
+                DeviceInteraction(user_id=user_id, device_id=device_id, action=action, success=success, timestamp=timestamp)
+                for user_id, device_id, action, success, timestamp in rows
+            )
+            session.commit()
+        finally:
+            session.close()
+
+    def test_group_by_and_rollup_agree(self, db_service):
+        """Counts, success rates and last use match between the scan and the rollup"""
+        now = datetime.utcnow()
+        self.add_interactions(db_service, [
+            ("alice", "light_1", "turn_on", True, now - timedelta(hours=30)),
+            ("alice", "light_1", "turn_on", False, now - timedelta(hours=2)),
+            ("bob", "light_1", "turn_on", True, now - timedelta(minutes=5)),
+            ("bob", "ac_1", "set_temperature", True, now - timedelta(days=20)),
+        ])
+
+        scanned = db_service.get_device_usage_stats(days=7, use_rollup=False)
+        db_service.refresh_device_usage_rollup()
+        rolled_up = db_service.get_device_usage_stats(days=7, use_rollup=True)
+
+        assert scanned == rolled_up == [{
+            "device_id": "light_1",
+            "action": "turn_on",
+            "count": 3,
+            "success_rate": 2 / 3,
+            "last_used": (now - timedelta(minutes=5)).isoformat(),
+        }]
+        # The rollup has no user dimension, so per-user stats scan
+        by_user = db_service.get_device_usage_stats(user_id="alice", days=30, use_rollup=True)
+        assert [(s["device_id"], s["count"]) for s in by_user] == [("light_1", 2)]
+
+    def test_rollup_refresh_is_incremental(self, db_service):
+        """Later refreshes only rebuild the newest hours; older hours are kept as rolled up"""
+        now = datetime.utcnow()
+        self.add_interactions(db_service, [
+            ("alice", "light_1", "turn_on", True, now - timedelta(days=3)),
+            ("alice", "light_1", "turn_on", True, now),
+        ])
+        assert db_service.refresh_device_usage_rollup() == 2
+
+        self.add_interactions(db_service, [("alice", "light_1", "turn_off", True, now)])
+        assert db_service.refresh_device_usage_rollup() == 2
+
+        session = db_service.get_session()
+        try:
+            assert session.query(DeviceUsageHourly).count() == 3
+        finally:
+            session.close()
+        stats = db_service.get_device_usage_stats(days=7, use_rollup=True)
+        assert [(s["action"], s["count"]) for s in stats] == [("turn_off", 1), ("turn_on", 2)]
+
+    def test_interaction_writes_refresh_rollup(self, test_config, db_service):
+        """With the rollup enabled, logged and batched interactions are rolled up on write"""
+        test_config.system.device_usage_rollup_enabled = True
+        db_service.log_device_interaction("alice", "light_1", "turn_on")
+        db_service.apply_write_batch([
+            ("device_interaction", {"user_id": "bob", "device_id": "light_1", "action": "turn_on", "success": False}),
+        ])
+        # Re-running over hours already rolled up updates them in place
+        db_service.refresh_device_usage_rollup()
+
+        stats = db_service.get_device_usage_stats(days=1)
+        assert [(s["action"], s["count"], s["success_rate"]) for s in stats] == [("turn_on", 2, 0.5)]
@@ -0,0 +1,132 @@
+"""
+Unit tests for the rule-based fast intent recognizer
+"""
+import asyncio
+import threading
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from src.core.device_catalog import DEVICE_SPECS_PATH, DeviceCatalog, DeviceSpecIndex
+from src.core.fast_intent import FastIntentRecognizer, render_fast_reply
+
+
+def _device(device_id, name, device_type, room, actions):
+    device = MagicMock()
+    device.id = device_id
+    device.name = name
+    device.device_type = device_type
+    device.room = room
+    device.supported_actions = actions
+    device.current_state = {}
+    return device
+
+
+class TestFastIntentRecognizer:
+    """Test suite for FastIntentRecognizer"""
+
+    @pytest.fixture
+    def recognizer(self):
+        db_service = MagicMock()
+        db_service.get_all_devices.return_value = [
+            _device("living_room_lights", "客厅灯", "light", "living_room",
+                    ["turn_on", "turn_off", "set_brightness"]),
+            _device("bedroom_lights", "卧室灯", "light", "bedroom",
+                    ["turn_on", "turn_off", "set_brightness"]),
+            _device("living_room_curtains", "客厅窗帘", "curtain", "living_room",
+                    ["open_curtain", "close_curtain", "set_position"]),
+            _device("living_room_speaker", "客厅音响", "speaker", "living_room",
+                    ["turn_on", "turn_off", "set_volume"]),
+        ]
+        db_service.device_version = 0
+        return FastIntentRecognizer(DeviceCatalog(db_service, DeviceSpecIndex({})))
+
+    def test_device_name_match(self, recognizer):
+        """An exact device name with a verb is a confident match"""
+        match = recognizer.recognize("请帮我打开客厅灯")
+
+        assert match.device_id == "living_room_lights"
+        assert match.command == "turn_on"
+        assert match.confidence >= 0.9
+
+    def test_single_device_of_category(self, recognizer):
+        """Category keywords resolve when only one device fits"""
+        match = recognizer.recognize("关窗帘")
+
+        assert match.device_id == "living_room_curtains"
+        assert match.command == "close_curtain"
+        assert match.to_device_command()["action_type"] == "control"
+
+    def test_parameter_with_value(self, recognizer):
+        """Parameter keywords and numbers become a set command"""
+        match = recognizer.recognize("把卧室灯亮度调到30")
+
+        assert match.device_id == "bedroom_lights"
+        assert match.command == "set_brightness"
+        assert match.parameters == {"brightness": 30}
+
+    def test_ambiguous_or_complex_input_is_not_confident(self, recognizer):
+        """Ambiguous, referential or compound requests are left to the LLM"""
+        ambiguous = recognizer.recognize("开灯")
+        compound = recognizer.recognize("打开客厅灯然后放点音乐")
+
+        assert ambiguous is None or ambiguous.confidence < 0.9
+        assert recognizer.recognize("把它关了") is None
+        assert compound is None or compound.confidence < 0.9
+
+    def test_reply_respects_familiarity(self, recognizer):
+        """Templated replies refuse below the hardware threshold"""
+        match = recognizer.recognize("打开客厅灯")
+
+        assert "客厅灯" in render_fast_reply(match, familiarity_score=80, allowed=True)
+        assert render_fast_reply(match, familiarity_score=20, allowed=False) == "......不行。"
+
+    def test_failed_command_uses_failure_reply(self, recognizer):
+        """The success template is only used when the command actually ran"""
+        match = recognizer.recognize("打开客厅灯")
+
+        reply = render_fast_reply(match, familiarity_score=80, allowed=True, succeeded=False)
+
+        assert "打开了" not in reply
+        assert "客厅灯" in reply
+
+    def test_async_refresh_runs_off_the_event_loop(self, recognizer):
+        """recognize_async reloads a stale catalog in a worker thread"""
+        db_service = recognizer.catalog.db_service
+        devices = db_service.get_all_devices.return_value
+        threads = []
+
+        def get_all_devices(**kwargs):
+            threads.append(threading.get_ident())
+            return devices
+
+        db_service.get_all_devices.side_effect = get_all_devices
+
+        async def run():
+            return threading.get_ident(), await recognizer.recognize_async("打开客厅灯")
+
+        loop_thread, match = asyncio.run(run())
+
+        assert match.device_id == "living_room_lights"
+        assert threads and threads[0] != loop_thread
+
+    def test_shares_the_catalog_snapshot(self, recognizer):
+        """Match entries follow the catalog version instead of a second device cache"""
+        db_service = recognizer.catalog.db_service
+        recognizer.recognize("打开客厅灯")
+        recognizer.recognize("关窗帘")
+        assert db_service.get_all_devices.call_count == 1
+
+        db_service.get_all_devices.return_value = [
+            _device("study_lamp", "台灯", "light", "study", ["turn_on", "turn_off"])
+        ]
+        db_service.device_version = 1
+
+        assert recognizer.recognize("打开台灯").device_id == "study_lamp"
+        assert recognizer.recognize("关窗帘") is None
+        assert recognizer.catalog.get_stats()["rebuilds"] == 2
+
+    def test_specs_path_does_not_depend_on_cwd(self):
+        """Device specifications are found relative to the package"""
+        assert DEVICE_SPECS_PATH.is_absolute()
+        assert DEVICE_SPECS_PATH.parent.parent == Path(__file__).resolve().parents[2]
@@ -0,0 +1,59 @@
+"""
+Unit tests for the incremental JSON parser
+"""
+import json
+import random
+import pytest
+
+from src.utils.incremental_json import IncrementalJSONParser, DELTA, VALUE
+
+
+class TestIncrementalJSONParser:
+    """Test suite for IncrementalJSONParser"""
+
+    @pytest.fixture
+    def payload(self):
+        return {
+            "intent": {
+                "involves_hardware": True,
+                "device": "lights",
+                "parameters": {"note": "a}\"[b"},
+                "steps": [1, 2, {"x": None}]
+            },
+            "response": "......好。\n\"灯\"开了 😀 \\ /",
+            "confidence": 0.9,
+            "cached": False
+        }
+
+    @pytest.mark.parametrize("dump", [
+        lambda obj: json.dumps(obj, ensure_ascii=False),
+        lambda obj: json.dumps(obj),
+        lambda obj: "```json\n" + json.dumps(obj, indent=2) + "\n```",
+    ])
+    def test_random_chunking_matches_json_loads(self, payload, dump):
+        """Any chunk split yields the same fields as json.loads"""
+        text = dump(payload)
+        rng = random.Random(0)
+        for _ in range(50):
+            parser = IncrementalJSONParser()
+            events = []
+            i = 0
+            while i < len(text):
+                step = rng.randint(1, 7)
+                events += parser.feed(text[i:i + step])
+                i += step
+
+            assert parser.done
+            assert parser.result == payload
+            assert "".join(v for kind, key, v in events if kind == DELTA) == payload["response"]
+            assert [key for kind, key, _ in events if kind == VALUE] == list(payload)
+
+    def test_intent_available_before_response_finishes(self):
+        """A closed object field is emitted while a later string is still open"""
+        parser = IncrementalJSONParser()
+
+        events = parser.feed('{"intent": {"device": "tv"}, "response": "......开')
+
+        assert (VALUE, "intent", {"device": "tv"}) in events
+        assert (DELTA, "response", "......开") in events
+        assert not parser.done
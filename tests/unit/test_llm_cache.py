@@ -0,0 +1,114 @@
+"""
+Unit tests for the LLM response cache
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.utils.config import LLMCacheConfig
+from src.utils.llm_cache import (
+    CachedLLMClient, MemoryLLMCache, SQLiteLLMCache, make_cache_key
+)
+
+
+class TestLLMCache:
+    """Test suite for cache backends and CachedLLMClient"""
+
+    @pytest.fixture
+    def inner_client(self):
+        client = MagicMock()
+        client.default_model = "test-model"
+        client.generate = AsyncMock(side_effect=lambda **kwargs: f"reply-{client.generate.await_count}")
+        return client
+
+    @pytest.fixture
+    def cached_client(self, inner_client):
+        config = LLMCacheConfig(max_entries=8, ttl_seconds=60, max_temperature=0.4)
+        return CachedLLMClient(inner_client, MemoryLLMCache(config.max_entries), config)
+
+    def test_key_ignores_whitespace_only_differences(self):
+        """Formatting-only prompt changes share a key; content changes do not"""
+        base = make_cache_key("m", "system  prompt\n", [{"role": "user", "content": "开灯"}], 0.1)
+        spaced = make_cache_key("m", " system prompt", [{"role": "user", "content": " 开灯 "}], 0.1)
+        other = make_cache_key("m", "system prompt", [{"role": "user", "content": "关灯"}], 0.1)
+
+        assert base == spaced
+        assert base != other
+        assert base != make_cache_key("m", "system prompt", [{"role": "user", "content": "开灯"}], 0.3)
+
+    def test_low_temperature_calls_hit_cache(self, cached_client, inner_client):
+        """Identical deterministic calls reach the provider once"""
+        async def run():
+            messages = [{"role": "user", "content": "开灯"}]
+            first = await cached_client.generate("sys", messages, temperature=0.1)
+            second = await cached_client.generate("sys", messages, temperature=0.1)
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        assert first == second
+        assert inner_client.generate.await_count == 1
+        assert cached_client.cache.stats["hits"] == 1
+        assert cached_client.cache.stats["misses"] == 1
+
+    def test_opt_out_and_high_temperature_bypass_cache(self, cached_client, inner_client):
+        """use_cache=False and creative temperatures always call the provider"""
+        async def run():
+            messages = [{"role": "user", "content": "好热"}]
+            await cached_client.generate("sys", messages, temperature=0.1, use_cache=False)
+            await cached_client.generate("sys", messages, temperature=0.1, use_cache=False)
+            await cached_client.generate("sys", messages, temperature=0.8)
+            await cached_client.generate("sys", messages, temperature=0.8)
+
+        asyncio.run(run())
+
+        assert inner_client.generate.await_count == 4
+        assert len(cached_client.cache) == 0
+        for call in inner_client.generate.await_args_list:
+            assert "use_cache" not in call.kwargs
+
+    def test_malformed_json_is_not_cached(self, cached_client, inner_client):
+        """Truncated JSON is returned to the caller but never replayed from the cache"""
+        replies = iter(['{"intent": {"device": "lights"', '```json\n{"response": "好"}\n```'])
+        inner_client.generate = AsyncMock(side_effect=lambda **kwargs: next(replies))
+
+        async def run():
+            messages = [{"role": "user", "content": "开灯"}]
+            return [await cached_client.generate("sys", messages, temperature=0.1) for _ in range(3)]
+
+        truncated, complete, cached = asyncio.run(run())
+
+        assert truncated.startswith('{"intent"')
+        assert cached == complete
+        assert inner_client.generate.await_count == 2
+        assert cached_client.cache.stats["stores"] == 1
+
+    def test_memory_cache_ttl_and_lru(self):
+        """Entries expire after their TTL and the least recently used is evicted"""
+        cache = MemoryLLMCache(max_entries=2)
+        with patch("src.utils.llm_cache.time.time", return_value=1000.0):
+            cache.set("a", "A", ttl_seconds=10)
+            cache.set("b", "B", ttl_seconds=100)
+            assert cache.get("a") == "A"
+            cache.set("c", "C", ttl_seconds=100)
+
+        assert cache.stats["evictions"] == 1
+        with patch("src.utils.llm_cache.time.time", return_value=1050.0):
+            assert cache.get("b") is None  # evicted as least recently used
+            assert cache.get("a") is None  # expired
+            assert cache.get("c") == "C"
+        assert cache.stats["expired"] == 1
+
+    def test_sqlite_cache_persists_and_bounds_size(self, tmp_path):
+        """The SQLite backend survives reopening and keeps at most max_entries"""
+        path = tmp_path / "llm_cache.sqlite"
+        cache = SQLiteLLMCache(str(path), max_entries=2)
+        cache.set("a", "A", ttl_seconds=60)
+        cache.set("b", "B", ttl_seconds=60)
+        cache.set("c", "C", ttl_seconds=60)
+
+        reopened = SQLiteLLMCache(str(path), max_entries=2)
+
+        assert len(reopened) == 2
+        assert reopened.get("c") == "C"
+        assert reopened.get("a") is None
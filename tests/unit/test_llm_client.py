@@ -0,0 +1,98 @@
+"""
+Unit tests for the LLM client abstraction
+"""
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.utils import llm_client
+from src.utils.llm_client import AnthropicLLMClient
+from src.utils.config import AnthropicConfig
+
+
+class TestAnthropicLLMClient:
+    """Test suite for AnthropicLLMClient"""
+
+    @pytest.fixture
+    def config(self, test_config):
+        test_config.anthropic = AnthropicConfig(api_key="test-api-key", max_concurrent_requests=8)
+        return test_config
+
+    @pytest.fixture
+    def fake_async_client(self):
+        """Async client whose messages.create sleeps instead of calling the API"""
+        async def create(**kwargs):
+            await asyncio.sleep(0.2)
+            response = MagicMock()
+            response.content = [MagicMock(text=kwargs["messages"][-1]["content"])]
+            return response
+
+        client = MagicMock()
+        client.messages.create = create
+        return client
+
+    def test_generate_runs_requests_concurrently(self, config, fake_async_client):
+        """N concurrent calls should take about as long as one call"""
+        async def run():
+            with patch('anthropic.Anthropic'), \
+                    patch('anthropic.AsyncAnthropic', return_value=fake_async_client):
+                clients = [AnthropicLLMClient(config) for _ in range(5)]
+                start = time.perf_counter()
+                results = await asyncio.gather(*[
+                    client.generate("system", [{"role": "user", "content": f"msg {i}"}])
+                    for i, client in enumerate(clients)
+                ])
+                return results, time.perf_counter() - start
+
+        results, elapsed = asyncio.run(run())
+
+        assert results == [f"msg {i}" for i in range(5)]
+        assert elapsed < 0.6
+
+    def test_concurrency_cap_is_shared_across_clients(self, config, fake_async_client):
+        """The semaphore is process-wide, not per client instance"""
+        config.anthropic.max_concurrent_requests = 1
+
+        async def run():
+            with patch('anthropic.Anthropic'), \
+                    patch('anthropic.AsyncAnthropic', return_value=fake_async_client):
+                clients = [AnthropicLLMClient(config) for _ in range(3)]
+                start = time.perf_counter()
+                await asyncio.gather(*[
+                    client.generate("system", [{"role": "user", "content": "hi"}])
+                    for client in clients
+                ])
+                pools = dict(llm_client._ANTHROPIC_ASYNC_POOLS[asyncio.get_running_loop()])
+                return time.perf_counter() - start, pools
+
+        elapsed, pools = asyncio.run(run())
+
+        assert len(pools) == 1
+        assert elapsed >= 0.55
+
+
+class TestGeminiLLMClient:
+    """Test suite for GeminiLLMClient model reuse"""
+
+    @pytest.fixture
+    def config(self, test_config):
+        from src.utils.config import GeminiConfig
+        test_config.gemini = GeminiConfig(api_key="test-api-key", model_cache_size=2)
+        return test_config
+
+    def test_models_are_shared_and_bounded(self, config):
+        """Same system instruction reuses one GenerativeModel across clients"""
+        llm_client._GEMINI_MODEL_CACHE.clear()
+        first = llm_client.GeminiLLMClient(config)
+        second = llm_client.GeminiLLMClient(config)
+
+        model = first._get_model("prompt A")
+
+        assert second._get_model("prompt A") is model
+        assert first._get_model("prompt B") is not model
+        assert first._get_generation_config(100, 0.1) is second._get_generation_config(100, 0.1)
+
+        first._get_model("prompt C")
+        assert len(llm_client._GEMINI_MODEL_CACHE) == 2
+        assert first._get_model("prompt A") is not model
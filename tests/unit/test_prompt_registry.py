@@ -0,0 +1,71 @@
+"""
+Unit tests for the prompt template registry
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from src.utils.config import AnthropicConfig
+from src.utils.llm_client import AnthropicLLMClient
+from src.utils.prompt_registry import PromptRegistry, SystemPrompt
+
+
+class TestPromptRegistry:
+    """Test suite for PromptRegistry and SystemPrompt"""
+
+    def test_file_and_template_loaded_once(self, tmp_path):
+        """Files are read once; the static prefix is compiled once and only the suffix varies"""
+        prompt_file = tmp_path / "character.txt"
+        prompt_file.write_text("你是凌波丽。", encoding="utf-8")
+        registry = PromptRegistry()
+        builds = []
+
+        def build():
+            builds.append(1)
+            return registry.load_file(str(prompt_file)) + "\n规则"
+
+        first = registry.template("character", build).render("\n状态: A")
+        prompt_file.write_text("changed", encoding="utf-8")
+        second = registry.template("character", build).render("\n状态: B")
+
+        assert len(builds) == 1
+        assert first == "你是凌波丽。\n规则\n状态: A"
+        assert first.static == second.static == "你是凌波丽。\n规则"
+        assert second.dynamic == "\n状态: B"
+        stats = registry.get_stats()
+        assert stats["file_misses"] == 1 and stats["template_misses"] == 1 and stats["template_hits"] == 1
+
+    def test_anthropic_client_sends_cacheable_prefix(self, test_config):
+        """A SystemPrompt becomes a cache_control block; plain strings are sent unchanged"""
+        test_config.anthropic = AnthropicConfig(api_key="test-api-key")
+        sent = []
+
+        async def create(**kwargs):
+            sent.append(kwargs["system"])
+            response = MagicMock()
+            response.content = [MagicMock(text="ok")]
+            response.usage = SimpleNamespace(input_tokens=20, cache_read_input_tokens=1500, cache_creation_input_tokens=0)
+            return response
+
+        fake_async_client = MagicMock()
+        fake_async_client.messages.create = create
+        registry = PromptRegistry()
+
+        async def run():
+            with patch('anthropic.Anthropic'), \
+                    patch('anthropic.AsyncAnthropic', return_value=fake_async_client), \
+                    patch('src.utils.llm_client.get_prompt_registry', return_value=registry):
+                client = AnthropicLLMClient(test_config)
+                await client.generate(SystemPrompt("static", "dynamic"), [{"role": "user", "content": "hi"}])
+                await client.generate("plain", [{"role": "user", "content": "hi"}])
+
+        asyncio.run(run())
+
+        assert sent[0] == [
+            {"type": "text", "text": "static", "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": "dynamic"},
+        ]
+        assert sent[1] == "plain"
+        stats = registry.get_stats()
+        assert stats["provider_requests"] == 2 and stats["provider_cache_hits"] == 2
+        assert stats["provider_cache_read_tokens"] == 3000
@@ -0,0 +1,121 @@
+"""
+Unit tests for the content-addressed TTS audio cache
+"""
+import asyncio
+import base64
+import logging
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.core.tool_executor import ToolExecutor
+from src.services.agora_tts_service import AgoraTTSService
+from src.services.tts_pipeline import TTSSentencePipeline
+from src.utils.config import OpenAITTSConfig, TTSConfig
+from src.utils.tts_cache import TTSAudioCache, make_tts_cache_key
+
+
+class TestTTSAudioCache:
+    """Test suite for TTSAudioCache and AgoraTTSService caching"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return TTSAudioCache(tmp_path / "tts", memory_max_bytes=10, disk_max_bytes=20)
+
+    @pytest.fixture
+    def service(self, tmp_path):
+        config = MagicMock()
+        config.tts = TTSConfig(provider="openai")
+        config.openai_tts = OpenAITTSConfig(api_key="test-key")
+        service = AgoraTTSService(config)
+        service.audio_cache = TTSAudioCache(tmp_path / "tts")
+        service._synthesize_formatted = AsyncMock(return_value=b"mp3-bytes")
+        return service
+
+    def test_key_covers_voice_and_format(self):
+        """Whitespace is normalized; anything that changes the audio changes the key"""
+        base = make_tts_cache_key("......好。", "openai", "alloy", "m", "mp3")
+
+        assert base == make_tts_cache_key(" ......好。 ", "openai", "alloy", "m", "mp3")
+        assert base != make_tts_cache_key("......好。", "openai", "nova", "m", "mp3")
+        assert base != make_tts_cache_key("......好。", "openai", "alloy", "m", "wav")
+        assert base != make_tts_cache_key("......好。", "openai", "alloy", "m", "mp3", {"speed": 1.2})
+
+    def test_size_bounded_lru_on_both_tiers(self, cache):
+        """Byte limits evict the least recently used entries"""
+        cache.put("a", b"x" * 8)
+        cache.put("b", b"y" * 8)
+        assert cache.get_file("a") is not None  # refresh "a"
+        cache.put("c", b"z" * 8)
+
+        stats = cache.get_stats()
+        assert cache.get_file("b") is None
+        assert cache.get_bytes("a") == b"x" * 8
+        assert stats["disk_bytes"] <= 20 and stats["memory_bytes"] <= 10
+        assert stats["disk_evictions"] == 1
+
+    def test_index_survives_restart(self, cache, tmp_path):
+        """Files written by an earlier process are found again"""
+        cache.put("a", b"abc")
+
+        reopened = TTSAudioCache(tmp_path / "tts")
+
+        assert reopened.get_bytes("a") == b"abc"
+        assert reopened.get_file("a").url == "/cached_audio/tts/a.mp3"
+
+    def test_repeated_line_is_synthesized_once(self, service):
+        """The second request for the same line returns the cached file without audio bytes"""
+        async def run():
+            first = await service.synthesize_to_cache("......好。")
+            second = await service.synthesize_to_cache("......好。")
+            other_voice = await service.synthesize_to_cache("......好。", voice="nova")
+            return first, second, other_voice
+
+        first, second, other_voice = asyncio.run(run())
+
+        assert first.audio == b"mp3-bytes" and not first.cache_hit
+        assert second.cache_hit and second.audio is None
+        assert second.url == first.url
+        assert other_voice.key != first.key
+        assert service._synthesize_formatted.await_count == 2
+        assert service.audio_cache.get_stats()["hit_rate"] > 0
+
+    def test_cache_hit_still_delivers_audio(self, service):
+        """A cached line returned by execute_agora_tts carries the same audio as a fresh one"""
+        executor = object.__new__(ToolExecutor)
+        executor.logger = logging.getLogger(__name__)
+        executor.agora_tts = service
+        executor.tts_provider = "openai"
+        executor.tts_default_voice = None
+        executor.tts_format = "mp3"
+
+        async def run():
+            first = await executor.execute_agora_tts("......好。")
+            second = await executor.execute_agora_tts("......好。")
+            return first, second, await first["audio_data"].to_base64(), await second["audio_data"].to_base64()
+
+        first, second, first_audio, second_audio = asyncio.run(run())
+
+        assert second["cache_hit"] and not first["cache_hit"]
+        assert first_audio == second_audio == base64.b64encode(b"mp3-bytes").decode()
+        assert service._synthesize_formatted.await_count == 1
+
+    def test_truncated_stream_fails_its_sentence_and_is_not_cached(self, service):
+        """A provider error after the first piece marks the sentence failed; nothing is stored"""
+        async def broken_stream(formatted_text, voice, audio_format):
+            yield b"partial"
+            raise RuntimeError("connection reset")
+
+        service._stream_formatted = broken_stream
+
+        async def run():
+            pipeline = TTSSentencePipeline(service)
+            pipeline.feed("灯开了。")
+            pipeline.close()
+            chunks = [chunk async for chunk in pipeline.chunks()]
+            return pipeline, chunks
+
+        pipeline, chunks = asyncio.run(run())
+
+        assert [c["audio"] for c in chunks] == [b"partial"]
+        assert pipeline.failed_sentences == [0]
+        assert service.audio_cache.get_stats()["disk_entries"] == 0
@@ -0,0 +1,114 @@
+"""
+Unit tests for sentence splitting and the pipelined TTS
+"""
+import asyncio
+
+from src.services.tts_pipeline import TTSSentencePipeline
+from src.utils.text_formatting import SentenceSplitter, split_tts_sentences
+
+
+class FakeStreamingTTS:
+    """stream_speech stand-in: per-sentence delay, two pieces per sentence"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.active = 0
+        self.max_active = 0
+        self.finished = []
+
+    async def stream_speech(self, text, voice=None, audio_format=None):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(text, 0.01))
+            yield f"{text}|a".encode()
+            yield f"{text}|b".encode()
+        finally:
+            self.active -= 1
+            self.finished.append(text)
+
+
+class TestSentenceSplitting:
+    """Test suite for SentenceSplitter"""
+
+    def test_splits_on_sentences_and_ellipses(self):
+        """Ellipses are boundaries; a leading ellipsis stays with its sentence"""
+        assert split_tts_sentences("......好。\n\"灯\"开了。") == ["......好。", "\"灯\"开了。"]
+        assert split_tts_sentences("我......不知道。你呢？嗯。") == ["我......", "不知道。", "你呢？", "嗯。"]
+
+    def test_incremental_matches_whole_text(self):
+        """Feeding token by token yields the same sentences as splitting at once"""
+        text = "好的，灯已经打开了。还有别的吗？……嗯"
+        splitter = SentenceSplitter()
+        incremental = []
+        for char in text:
+            incremental.extend(splitter.feed(char))
+        incremental.extend(splitter.flush())
+
+        assert incremental == split_tts_sentences(text)
+
+    def test_long_runs_cut_at_soft_break(self):
+        """Runs past max_chars are cut at a comma"""
+        chunks = split_tts_sentences("一二三四五，六七八九十，一二三四五", max_chars=8)
+
+        assert chunks[0] == "一二三四五，"
+        assert "".join(chunks) == "一二三四五，六七八九十，一二三四五"
+
+
+class TestTTSSentencePipeline:
+    """Test suite for TTSSentencePipeline ordering and parallelism"""
+
+    def test_in_order_with_bounded_parallelism(self):
+        """A slow first sentence still comes out first; at most max_parallel run at once"""
+        async def scenario():
+            tts = FakeStreamingTTS({"一。": 0.05, "二。": 0.0, "三。": 0.0, "四。": 0.0})
+            pipeline = TTSSentencePipeline(tts, max_parallel=2)
+            pipeline.feed("一。二。三。四。")
+            chunks = [chunk async for chunk in pipeline.chunks()]
+            return tts, pipeline, chunks
+
+        tts, pipeline, chunks = asyncio.run(scenario())
+
+        assert [c["index"] for c in chunks] == [0, 0, 1, 1, 2, 2, 3, 3]
+        assert chunks[0]["audio"] == "一。|a".encode()
+        assert tts.max_active == 2
+        assert tts.finished.index("二。") < tts.finished.index("一。")
+        assert pipeline.audio == b"".join(c["audio"] for c in chunks)
+        assert pipeline.failed_sentences == []
+
+    def test_first_sentence_ready_before_reply_finishes(self):
+        """Audio for the first sentence is available while later text is still arriving"""
+        async def scenario():
+            tts = FakeStreamingTTS({"第一句。": 0.0})
+            pipeline = TTSSentencePipeline(tts)
+            pipeline.feed("第一句。第二")
+            await asyncio.sleep(0.02)
+            early = pipeline.ready_chunks()
+            pipeline.feed("句。")
+            rest = [chunk async for chunk in pipeline.chunks()]
+            return early, rest
+
+        early, rest = asyncio.run(scenario())
+
+        assert [c["text"] for c in early] == ["第一句。", "第一句。"]
+        assert [c["text"] for c in rest] == ["第二句。", "第二句。"]
+
+    def test_failed_sentence_is_reported(self):
+        """A sentence whose stream breaks after some audio still counts as failed"""
+        class BrokenTTS(FakeStreamingTTS):
+            async def stream_speech(self, text, voice=None, audio_format=None):
+                yield f"{text}|a".encode()
+                if text == "二。":
+                    raise RuntimeError("provider error")
+                yield f"{text}|b".encode()
+
+        async def scenario():
+            pipeline = TTSSentencePipeline(BrokenTTS({}))
+            pipeline.feed("一。二。三。")
+            chunks = [chunk async for chunk in pipeline.chunks()]
+            return pipeline, chunks
+
+        pipeline, chunks = asyncio.run(scenario())
+
+        assert [c["index"] for c in chunks] == [0, 0, 1, 2, 2]
+        assert pipeline.failed_sentences == [1]
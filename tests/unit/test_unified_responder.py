@@ -0,0 +1,93 @@
+"""
+Unit tests for UnifiedResponder
+"""
+import asyncio
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.core.unified_responder import UnifiedResponder
+from src.core.context_manager import SystemContext
+
+
+def _chunks(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestUnifiedResponderStreaming:
+    """Test suite for UnifiedResponder.stream_and_respond"""
+
+    @pytest.fixture
+    def payload(self):
+        return json.dumps({
+            "intent": {
+                "involves_hardware": True,
+                "device": "lights",
+                "action": "turn_on",
+                "parameters": {},
+                "confidence": 0.9,
+                "familiarity_check": "passed"
+            },
+            "response": "......好。\n\"灯\"开了。"
+        }, ensure_ascii=False)
+
+    @pytest.fixture
+    def responder(self, test_config, payload):
+        llm_client = MagicMock()
+
+        async def generate_stream(**kwargs):
+            for chunk in _chunks(payload):
+                await asyncio.sleep(0)
+                yield chunk
+
+        llm_client.generate_stream = generate_stream
+        with patch('src.core.unified_responder.create_llm_client', return_value=llm_client):
+            return UnifiedResponder(test_config)
+
+    @pytest.fixture
+    def context(self):
+        return SystemContext(user_input="开灯", familiarity_score=70)
+
+    def test_streams_response_tokens_then_result(self, responder, context):
+        """Token events rebuild the reply before the final result event"""
+        async def run():
+            return [event async for event in responder.stream_and_respond("开灯", context)]
+
+        events = asyncio.run(run())
+        tokens = [e["text"] for e in events if e["type"] == "token"]
+        result = events[-1]
+
+        assert len(tokens) > 1
+        assert "".join(tokens) == "......好。\n\"灯\"开了。"
+        assert result["type"] == "result"
+        assert result["success"] is True
+        assert result["response"] == "".join(tokens)
+        assert result["intent"]["device"] == "lights"
+        assert context.previous_intents[-1]["action"] == "turn_on"
+
+    def test_intent_event_precedes_reply_tokens(self, responder, context):
+        """The intent is surfaced as soon as its object closes"""
+        async def run():
+            return [event async for event in responder.stream_and_respond("开灯", context)]
+
+        types = [e["type"] for e in asyncio.run(run())]
+
+        assert types.count("intent") == 1
+        assert types.index("intent") < types.index("token")
+
+    def test_stream_error_yields_error_result(self, responder, context):
+        """A failing stream still ends with an in-character result event"""
+        async def broken_stream(**kwargs):
+            raise RuntimeError("boom")
+            yield  # pragma: no cover
+
+        responder.llm_client.generate_stream = broken_stream
+
+        async def run():
+            return [event async for event in responder.stream_and_respond("开灯", context)]
+
+        events = asyncio.run(run())
+
+        assert [e["type"] for e in events] == ["result"]
+        assert events[0]["success"] is False
+        assert events[0]["error"] == "boom"
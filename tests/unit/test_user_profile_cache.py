@@ -0,0 +1,87 @@
+"""
+Unit tests for the user profile read-through cache
+"""
+import asyncio
+import time
+
+import pytest
+
+from src.models.database import dispose_shared_database_managers
+from src.services.async_database_service import AsyncDatabaseService
+from src.services.database_service import DatabaseService
+from src.services.user_profile_cache import UserProfileCache
+from src.utils.config import DatabaseConfig
+
+
+class TestUserProfileCache:
+    """Test suite for UserProfileCache and its DatabaseService integration"""
+
+    @pytest.fixture
+    def db_service(self, test_config, tmp_path):
+        test_config.database = DatabaseConfig(url=f"sqlite:///{tmp_path / 'users.db'}", async_enabled=False)
+        service = DatabaseService(test_config)
+        service.get_or_create_user("alice")
+        yield service
+        dispose_shared_database_managers()
+
+    def test_lookups_read_through_once(self, test_config, db_service):
+        """Repeated sync and async lookups in a turn cost one SELECT"""
+        async def turn():
+            async_db = AsyncDatabaseService(test_config, db_service)
+            return [await async_db.get_user_familiarity("alice") for _ in range(3)]
+
+        scores = asyncio.run(turn())
+        metadata = db_service.get_user_metadata("alice")
+
+        assert scores == [test_config.system.default_familiarity_score] * 3
+        assert metadata["interaction_count"] == 0
+        stats = db_service.user_cache.get_stats()
+        assert stats["misses"] == 1 and stats["hits"] == 3
+
+    def test_user_writes_invalidate(self, test_config, db_service):
+        """update_user_familiarity, update_user and delete_user are visible at once"""
+        assert db_service.get_user_familiarity("alice") == test_config.system.default_familiarity_score
+
+        db_service.update_user_familiarity("alice", 70)
+        assert db_service.get_user_familiarity("alice") == 70
+
+        db_service.update_user("alice", familiarity_score=80)
+        assert db_service.get_user_familiarity("alice") == 80
+
+        db_service.delete_user("alice", soft_delete=False)
+        assert db_service.get_user_metadata("alice") == {}
+
+    def test_ttl_and_racing_invalidation(self):
+        """Expired entries miss; a read that raced an invalidation is not stored"""
+        cache = UserProfileCache(ttl_seconds=0.01)
+        cache.set("alice", {"familiarity_score": 40}, cache.generation)
+        assert cache.get("alice") == {"familiarity_score": 40}
+
+        stale_generation = cache.generation
+        cache.invalidate("alice")
+        cache.set("alice", {"familiarity_score": 10}, stale_generation)
+        assert cache.get("alice") is None
+        cache.set("alice", {"familiarity_score": 40}, cache.generation)
+        assert cache.get("alice") == {"familiarity_score": 40}
+
+        time.sleep(0.02)
+        assert cache.get("alice") is None
+        assert cache.get_stats()["expired"] == 1
+
+    def test_invalidation_is_per_user(self):
+        """Writes to other users do not discard a read; trimmed history falls back conservatively"""
+        cache = UserProfileCache(max_entries=1)
+        generation = cache.generation
+
+        cache.invalidate("bob")
+        cache.set("alice", {"familiarity_score": 40}, generation)
+        assert cache.get("alice") == {"familiarity_score": 40}
+
+        cache.invalidate("carol")  # trims bob's invalidation record
+        cache.set("bob", {"familiarity_score": 10}, generation)
+        assert cache.get("bob") is None
+
+        generation = cache.generation
+        cache.invalidate()
+        cache.set("alice", {"familiarity_score": 50}, generation)
+        assert cache.get("alice") is None
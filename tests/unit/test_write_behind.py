@@ -0,0 +1,123 @@
+"""
+Unit tests for the write-behind persistence queue
+"""
+import asyncio
+
+import pytest
+
+from src.models.database import Conversation, DeviceInteraction, dispose_shared_database_managers
+from src.services.async_database_service import AsyncDatabaseService
+from src.services.database_service import DatabaseService
+from src.services.write_behind import WriteBehindQueue, close_shared_write_behind_queues
+from src.utils.config import DatabaseConfig
+
+
+class TestWriteBehindQueue:
+    """Test suite for WriteBehindQueue and DatabaseService.apply_write_batch"""
+
+    @pytest.fixture
+    def sync_service(self, test_config, tmp_path):
+        test_config.database = DatabaseConfig(
+            url=f"sqlite:///{tmp_path / 'write_behind.db'}",
+            async_enabled=False,
+            write_behind_batch_size=10,
+            write_behind_flush_interval=60
+        )
+        yield DatabaseService(test_config)
+        dispose_shared_database_managers()
+
+    def test_turn_writes_batched_into_one_transaction(self, test_config, sync_service):
+        """Writes from concurrent turns are committed together on shutdown flush"""
+        async def turn(service, user_id):
+            await service.queue_write("conversation_turn", user_id=user_id, conversation_id=f"{user_id}-conv")
+            await service.queue_write("message", conversation_id=f"{user_id}-conv", user_input="你好")
+            await service.queue_write("user_interaction", user_id=user_id)
+            await service.queue_write(
+                "device_interaction", user_id=user_id, device_id="light_1", action="turn_on"
+            )
+
+        async def run():
+            service = AsyncDatabaseService(test_config, sync_service)
+            await asyncio.gather(turn(service, "alice"), turn(service, "alice"), turn(service, "bob"))
+            stats_before = service.write_queue().get_stats()
+            await close_shared_write_behind_queues()
+            return stats_before, service.stats["thread_calls"]
+
+        stats_before, thread_calls = asyncio.run(run())
+
+        assert stats_before["pending"] == 12 and stats_before["written"] == 0
+        # 12 writes, batch size 10: two transactions instead of twelve
+        assert thread_calls == 2
+        alice = sync_service.get_user_metadata("alice")
+        assert alice["interaction_count"] == 2
+        assert len(sync_service.get_conversation_history("alice-conv")) == 2
+        session = sync_service.get_session()
+        try:
+            assert session.get(Conversation, "alice-conv").message_count == 2
+            assert session.query(DeviceInteraction).count() == 3
+        finally:
+            session.close()
+
+    def test_backpressure_and_retry(self):
+        """A full queue is flushed by the producer; writes of a failed batch are retried"""
+        batches = []
+        failures = [RuntimeError("db down")] * 3
+
+        async def apply_batch(writes):
+            if failures:
+                raise failures.pop()
+            batches.append(len(writes))
+
+        async def run():
+            queue = WriteBehindQueue(apply_batch, batch_size=2, flush_interval=60, max_pending=4, max_attempts=2)
+            for i in range(5):
+                await queue.put("user_interaction", user_id=f"user-{i}")
+            await queue.close()
+            return queue.get_stats()
+
+        stats = asyncio.run(run())
+
+        # The failed batch is bisected; both halves fail and are requeued
+        assert stats["backpressure_flushes"] == 2
+        assert stats["failed_batches"] == 3 and stats["dropped"] == 0
+        assert sum(batches) == stats["written"] == 5
+        assert stats["pending"] == 0
+
+    def test_failing_write_does_not_sink_its_batch(self):
+        """Only the write that keeps failing is dropped; the rest of its batch is committed"""
+        written = []
+
+        async def apply_batch(writes):
+            if any(payload["user_id"] == "ghost" for _, payload in writes):
+                raise RuntimeError("FOREIGN KEY constraint failed")
+            written.extend(payload["user_id"] for _, payload in writes)
+
+        async def run():
+            queue = WriteBehindQueue(apply_batch, batch_size=10, flush_interval=60, max_attempts=2)
+            for user_id in ("a", "b", "ghost", "c", "d"):
+                await queue.put("user_interaction", user_id=user_id)
+            await queue.close()
+            return queue.get_stats()
+
+        stats = asyncio.run(run())
+
+        assert sorted(written) == ["a", "b", "c", "d"]
+        assert stats["written"] == 4 and stats["dropped"] == 1 and stats["pending"] == 0
+
+    def test_turn_never_joins_another_users_conversation(self, sync_service):
+        """A taken conversation id starts a fresh conversation; the turn's message follows it"""
+        sync_service.apply_write_batch([("conversation_turn", {"user_id": "alice", "conversation_id": "shared"})])
+        sync_service.apply_write_batch([
+            ("conversation_turn", {"user_id": "bob", "conversation_id": "shared"}),
+            ("message", {"user_id": "bob", "conversation_id": "shared", "user_input": "关灯"}),
+        ])
+
+        session = sync_service.get_session()
+        try:
+            bob_conversation = session.query(Conversation).filter_by(user_id="bob").one()
+            assert bob_conversation.id != "shared"
+            assert session.get(Conversation, "shared").message_count == 1
+        finally:
+            session.close()
+        assert sync_service.get_conversation_history("shared") == []
+        assert [m.user_input for m in sync_service.get_conversation_history(bob_conversation.id)] == ["关灯"]